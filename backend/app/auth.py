@@ -2,6 +2,7 @@
 ReklamAI v2.0 — Auth Service
 JWT token creation, password hashing, and user verification.
 """
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
@@ -11,6 +12,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app import clock
 from app.config import get_settings
 from app.database import get_db
 from app.models import User
@@ -59,17 +61,70 @@ async def get_current_user(
     Извлекает текущего пользователя из JWT токена.
     Используется как зависимость в роутах.
     """
-    payload = decode_token(credentials.credentials)
-    user_id = payload.get("sub")
+    # The request's own (lazy) session: one pooled connection per request, shared with the route
+    return await user_from_token(db, credentials.credentials)
+
+
+async def get_current_user_id(user: User = Depends(get_current_user)) -> str:
+    """Id проверенного активного пользователя — для роутов, которым нужен только id."""
+    return user.id
+
+
+def user_id_from_token(token: str) -> str:
+    """Проверяет подпись и срок JWT и возвращает id пользователя — без запроса к БД."""
+    user_id = decode_token(token).get("sub")
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь не найден в токене",
         )
+    return user_id
+
+
+class ActiveUsers:
+    """
+    Ids recently loaded as existing and active (per worker, bounded LRU).
+    Routes that answer from memory check it instead of the DB, so a deleted
+    or deactivated user is locked out within `active_user_ttl_seconds`.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._verified: OrderedDict[str, float] = OrderedDict()
+
+    def is_active(self, user_id: str) -> bool:
+        verified_at = self._verified.get(user_id)
+        return verified_at is not None and clock.monotonic() - verified_at < self.ttl_seconds
+
+    def mark(self, user_id: str) -> None:
+        self._verified[user_id] = clock.monotonic()
+        self._verified.move_to_end(user_id)
+        while len(self._verified) > self.max_entries:
+            self._verified.popitem(last=False)
+
+    def forget(self, user_id: str) -> None:
+        self._verified.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._verified.clear()
+
+
+active_users = ActiveUsers(settings.active_user_ttl_seconds, settings.active_user_max_entries)
+
+
+async def user_from_token(db: AsyncSession, token: str) -> User:
+    """Проверяет JWT и загружает активного пользователя."""
+    user_id = user_id_from_token(token)
 
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
 
+    if not user or not user.is_active:
+        active_users.forget(user_id)
+    else:
+        active_users.mark(user_id)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,3 +138,13 @@ async def get_current_user(
         )
 
     return user
+
+
+async def require_admin(user: User = Depends(get_current_user)) -> User:
+    """Зависимость для админских роутов."""
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Требуются права администратора",
+        )
+    return user
@@ -0,0 +1,171 @@
+"""
+ReklamAI v2.0 — Model & Preset Catalog
+Process-local snapshot of the active AIModel and Preset rows, indexed by slug
+and category. These tables only change on deploy or admin edits, so the
+public listings and /api/generate read the snapshot and make no DB round trips.
+
+The snapshot is (re)loaded on startup, lazily on first use, after
+`catalog_changed()` (which also NOTIFYs other workers via app/pubsub.py),
+and after `catalog_max_age_seconds` as a safety net for a missed NOTIFY.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app import clock
+from app.config import get_settings
+from app.database import async_session
+from app.http_cache import PrecomputedBody
+from app.metrics import metrics
+from app.models import AIModel, Preset
+from app.pubsub import pubsub
+from app.schemas import AIModelResponse, PresetResponse
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+CATALOG_CHANNEL = "reklamai_catalog"
+
+_models_json = TypeAdapter(list[AIModelResponse])
+_presets_json = TypeAdapter(list[PresetResponse])
+EMPTY_LIST_BODY = PrecomputedBody.render(b"[]")
+
+
+def _by_category(items: tuple) -> dict[str, tuple]:
+    grouped: dict[str, list] = {}
+    for item in items:
+        grouped.setdefault(item.category, []).append(item)
+    return {category: tuple(group) for category, group in grouped.items()}
+
+
+def _render(adapter: TypeAdapter, items: tuple, by_category: dict) -> dict[str | None, PrecomputedBody]:
+    """JSON bodies for the unfiltered list (key None) and every category filter."""
+    rendered = {None: PrecomputedBody.render(adapter.dump_json(list(items)))}
+    for category, group in by_category.items():
+        rendered[category] = PrecomputedBody.render(adapter.dump_json(list(group)))
+    return rendered
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of the catalog; lists are ordered by name."""
+    version: int
+    models: tuple[AIModelResponse, ...] = ()
+    presets: tuple[PresetResponse, ...] = ()
+    models_by_slug: dict[str, AIModelResponse] = field(default_factory=dict)
+    presets_by_slug: dict[str, PresetResponse] = field(default_factory=dict)
+    models_by_category: dict[str, tuple[AIModelResponse, ...]] = field(default_factory=dict)
+    presets_by_category: dict[str, tuple[PresetResponse, ...]] = field(default_factory=dict)
+    # Response bodies of /api/models and /api/presets per category filter
+    models_bodies: dict[str | None, PrecomputedBody] = field(default_factory=dict)
+    presets_bodies: dict[str | None, PrecomputedBody] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, version: int, models: list, presets: list) -> "CatalogSnapshot":
+        models = tuple(AIModelResponse.model_validate(m) for m in models)
+        presets = tuple(PresetResponse.model_validate(p) for p in presets)
+        models_by_category = _by_category(models)
+        presets_by_category = _by_category(presets)
+        return cls(
+            version=version,
+            models=models,
+            presets=presets,
+            models_by_slug={m.slug: m for m in models},
+            presets_by_slug={p.slug: p for p in presets},
+            models_by_category=models_by_category,
+            presets_by_category=presets_by_category,
+            models_bodies=_render(_models_json, models, models_by_category),
+            presets_bodies=_render(_presets_json, presets, presets_by_category),
+        )
+
+    def list_models(self, category: str | None = None) -> tuple[AIModelResponse, ...]:
+        return self.models_by_category.get(category, ()) if category else self.models
+
+    def list_presets(self, category: str | None = None) -> tuple[PresetResponse, ...]:
+        return self.presets_by_category.get(category, ()) if category else self.presets
+
+    def models_body(self, category: str | None = None) -> PrecomputedBody:
+        return self.models_bodies.get(category or None, EMPTY_LIST_BODY)
+
+    def presets_body(self, category: str | None = None) -> PrecomputedBody:
+        return self.presets_bodies.get(category or None, EMPTY_LIST_BODY)
+
+
+class Catalog:
+    def __init__(self, session_factory=async_session):
+        self._session_factory = session_factory
+        self._snapshot: CatalogSnapshot | None = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        """Mark the snapshot stale; the next read reloads it."""
+        self._stale = True
+
+    def clear(self) -> None:
+        """Drop the snapshot entirely (tests)."""
+        self._snapshot = None
+        self._stale = True
+
+    def _expired(self) -> bool:
+        max_age = settings.catalog_max_age_seconds
+        return bool(max_age) and clock.monotonic() - self._loaded_at > max_age
+
+    async def reload(self) -> CatalogSnapshot:
+        async with self._lock:
+            return await self._load()
+
+    async def _load(self) -> CatalogSnapshot:
+        async with self._session_factory() as db:
+            models = (await db.execute(
+                select(AIModel).where(AIModel.is_active == True).order_by(AIModel.name)  # noqa: E712
+            )).scalars().all()
+            presets = (await db.execute(
+                select(Preset).where(Preset.is_active == True).order_by(Preset.name)  # noqa: E712
+            )).scalars().all()
+        self._version += 1
+        self._snapshot = CatalogSnapshot.build(self._version, models, presets)
+        self._loaded_at = clock.monotonic()
+        self._stale = False
+        metrics.inc("catalog_reloads")
+        logger.info(
+            f"[CATALOG] v{self._version}: {len(self._snapshot.models)} models, "
+            f"{len(self._snapshot.presets)} presets"
+        )
+        return self._snapshot
+
+    async def current(self) -> CatalogSnapshot:
+        """The current snapshot, reloading first if it is missing, stale or expired."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and not self._expired():
+            return snapshot
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            if self._snapshot is not None and not self._stale and not self._expired():
+                return self._snapshot
+            return await self._load()
+
+    async def model(self, slug: str | None) -> AIModelResponse | None:
+        if not slug:
+            return None
+        return (await self.current()).models_by_slug.get(slug)
+
+
+async def catalog_changed() -> None:
+    """Call after editing models or presets: refreshes every worker's snapshot."""
+    await pubsub.publish(CATALOG_CHANNEL, {"at": clock.utcnow().isoformat()})
+
+
+# Singleton
+catalog = Catalog()
+pubsub.subscribe(CATALOG_CHANNEL, lambda _data: catalog.invalidate())
+pubsub.on_gap(catalog.invalidate)
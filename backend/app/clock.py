@@ -0,0 +1,34 @@
+"""
+ReklamAI v2.0 — Clock
+Single time source for the generation pipeline (timestamps, leases, lane
+budgets). Production uses the system clock; the simulator swaps in a
+virtual clock so hours of pipeline time run in seconds.
+"""
+import time
+from datetime import datetime, timezone
+
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+
+_clock = SystemClock()
+
+
+def utcnow() -> datetime:
+    return _clock.now()
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def use_clock(clock) -> object:
+    """Install ``clock`` (anything with now() / monotonic()); returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
@@ -28,11 +28,97 @@ class Settings(BaseSettings):
     jwt_secret: str = "super-secret-jwt-key-change-me"
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 60 * 24 * 7  # 7 days
+    active_user_ttl_seconds: int = 60  # DB-free fast paths re-check a user this often
+    active_user_max_entries: int = 20000  # per worker
 
     # ── KIE.ai ──
     kie_api_key: str = ""
     kie_base_url: str = "https://api.kie.ai"
 
+    # ── Scheduling (fair-share admission of provider work) ──
+    max_running_per_user: int = 2
+    max_running_global: int = 20
+    admission_poll_seconds: int = 5  # first wait for a slot, doubled up to the max below
+    admission_max_wait_seconds: int = 120
+    admission_max_attempts: int = 120  # slot checks per run, across dispatch attempts (~4 h)
+    admission_lease_minutes: int = 15  # running slots expire after this long
+
+    # ── Batch generation ──
+    batch_max_variants: int = 50  # POST /api/generate/batch
+
+    # ── Capacity lanes (keyed by AIModel.category or config["capacity_group"]) ──
+    lane_concurrency: dict[str, int] = {"image": 8, "video": 6, "voice": 3, "text": 3}
+    lane_rate_per_minute: dict[str, int] = {"image": 60, "video": 20, "voice": 30, "text": 60}
+    lane_default_concurrency: int = 2
+    lane_default_rate_per_minute: int = 20
+    lane_backoff_seconds: int = 30  # pause after a provider 429 without Retry-After
+    dispatch_max_attempts: int = 5  # createTask attempts (429s) per generation
+
+    # ── Reconciler (stuck generations / expired reservations) ──
+    reconcile_cron: str = "*/5 * * * *"
+    reconcile_stale_minutes: int = 15  # non-terminal this long → re-check
+    reconcile_queue_deadline_minutes: int = 240  # never dispatched → expire + refund
+    reconcile_max_age_minutes: int = 120  # still running at KIE → fail + refund
+    reconcile_batch_size: int = 200
+
+    # ── Status stream (SSE) ──
+    stream_keepalive_seconds: int = 15
+    stream_retry_ms: int = 3000  # client reconnect delay
+    status_batch_max_ids: int = 300  # GET/POST /api/generations/status
+    status_since_margin_seconds: int = 60  # > the longest write transaction; see _bulk_status
+
+    # ── Idempotency keys (POST /api/generate) ──
+    idempotency_ttl_hours: int = 24
+    idempotency_purge_cron: str = "15 * * * *"
+
+    # ── Result cache (opt-in per model: AIModel.config["result_cache"]) ──
+    result_cache_ttl_hours: int = 72  # default when the model rule sets no ttl_hours
+    result_cache_max_entries: int = 10000
+    result_cache_prune_cron: str = "45 * * * *"
+
+    # ── History export (GET /api/generations/export) ──
+    export_batch_rows: int = 1000  # rows per server-side cursor fetch / streamed chunk
+
+    # ── Similar prompts (per-user MinHash index) ──
+    similarity_index_max_users: int = 500  # in-memory user indexes kept (LRU)
+    similarity_default_min_score: float = 0.5
+
+    # ── Terminal generation responses (GET /api/generations/{id}) ──
+    terminal_cache_max_entries: int = 20000  # per worker
+    terminal_cache_max_age: int = 31536000  # private Cache-Control, seconds
+
+    # ── Completion estimates (per-model latency sketches, see app/latency.py) ──
+    eta_min_samples: int = 20  # succeeded runs of a model before it gets estimates
+    eta_seed_rows: int = 500  # latest runs loaded on a worker's first estimate
+    eta_retry_min_seconds: int = 2  # Retry-After bounds for pollers
+    eta_retry_max_seconds: int = 60
+    eta_retry_default_seconds: int = 5  # no estimate yet / overdue
+
+    # ── Recent generations (page one of GET /api/generations, per worker) ──
+    recent_generations_size: int = 20  # largest page served from memory
+    recent_generations_max_users: int = 5000  # LRU
+
+    # ── Generation counters (per-user list totals) ──
+    counters_repair_cron: str = "30 3 * * *"  # nightly rebuild from the generations table
+
+    # ── Catalog (in-memory models / presets) ──
+    catalog_max_age_seconds: int = 300  # reload even without a NOTIFY; 0 = never
+    catalog_http_max_age: int = 60  # Cache-Control of /api/models, /api/presets
+    catalog_http_stale_while_revalidate: int = 600
+
+    # ── Webhook inbox (fast-ack KIE callbacks, see app/webhook_inbox.py) ──
+    webhook_inbox_max_rows: int = 50000  # above this /webhook/kie answers 503 + Retry-After
+    webhook_inbox_batch_size: int = 200  # callbacks applied per transaction
+    webhook_inbox_poll_seconds: float = 1.0  # also picks up rows accepted by other workers
+    webhook_inbox_retry_after_seconds: int = 30
+    webhook_inbox_unmatched_attempts: int = 8  # unknown task_id: retries before the row is dropped
+    webhook_inbox_unmatched_retry_seconds: float = 5.0  # first retry delay, doubled each attempt (~20 min window)
+
+    # ── Pub/sub (cross-worker LISTEN/NOTIFY, see app/pubsub.py) ──
+    pubsub_health_check_seconds: float = 30.0  # idle LISTEN connection is pinged this often
+    pubsub_reconnect_min_seconds: float = 1.0  # first reconnect delay, doubled per failure
+    pubsub_reconnect_max_seconds: float = 30.0
+
     # ── Webhook ──
     webhook_secret: str = ""  # Shared secret for webhook signature verification
 
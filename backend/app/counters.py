@@ -0,0 +1,82 @@
+"""
+ReklamAI v2.0 — Generation Counters
+Per-user, per-status generation counts, maintained in the same transaction
+as every generation insert and status transition (see app/lifecycle.py), so
+list pages read `total` from a handful of rows instead of COUNT(*).
+
+`rebuild_generation_counters` recomputes them from the generations table and
+corrects any drift (rows written outside the lifecycle helpers, manual edits).
+"""
+import logging
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import dialect_insert
+from app.models import Generation, GenerationCounter
+
+logger = logging.getLogger("uvicorn")
+
+
+async def bump_counter(db: AsyncSession, user_id: str, status: str, delta: int) -> None:
+    """Add ``delta`` to the user's counter for ``status`` (upsert, row-locked until commit)."""
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(GenerationCounter)
+        .values(user_id=user_id, status=status, count=delta)
+        .on_conflict_do_update(
+            index_elements=["user_id", "status"],
+            set_={"count": GenerationCounter.count + delta},
+        )
+    )
+
+
+async def count_generations(db: AsyncSession, user_id: str, status: str | None = None) -> int:
+    """Number of the user's generations, optionally of one status."""
+    query = select(func.coalesce(func.sum(GenerationCounter.count), 0)).where(
+        GenerationCounter.user_id == user_id
+    )
+    if status:
+        query = query.where(GenerationCounter.status == status)
+    return int((await db.execute(query)).scalar_one())
+
+
+async def rebuild_generation_counters(session_factory: async_sessionmaker) -> dict:
+    """Recompute every counter from the generations table; returns {checked, corrected}."""
+    async with session_factory() as db:
+        if db.bind.dialect.name == "postgresql":
+            # Hold off concurrent bumps so none is lost between the scan and the rewrite
+            await db.execute(text("LOCK TABLE generation_counters IN SHARE ROW EXCLUSIVE MODE"))
+
+        actual = {
+            (user_id, status): count
+            for user_id, status, count in (await db.execute(
+                select(Generation.user_id, Generation.status, func.count())
+                .group_by(Generation.user_id, Generation.status)
+            )).all()
+        }
+        stored = {
+            (c.user_id, c.status): c
+            for c in (await db.execute(select(GenerationCounter))).scalars().all()
+        }
+
+        corrected = 0
+        for key, counter in stored.items():
+            if key not in actual:
+                await db.execute(delete(GenerationCounter).where(
+                    GenerationCounter.user_id == counter.user_id,
+                    GenerationCounter.status == counter.status,
+                ))
+                corrected += bool(counter.count)
+            elif counter.count != actual[key]:
+                counter.count = actual[key]
+                corrected += 1
+        for (user_id, status), count in actual.items():
+            if (user_id, status) not in stored:
+                db.add(GenerationCounter(user_id=user_id, status=status, count=count))
+                corrected += 1
+        await db.commit()
+
+    stats = {"checked": len(actual), "corrected": corrected}
+    logger.info(f"[COUNTERS] Rebuilt generation counters: {stats}")
+    return stats
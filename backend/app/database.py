@@ -2,10 +2,19 @@
 ReklamAI v2.0 — Database Connection
 Async SQLAlchemy engine + session factory.
 Supports PostgreSQL (production) and SQLite (local dev/testing).
+
+Request sessions (`get_db`) are lazy: requests answered from in-memory
+caches never open one. Pool occupancy is exported at /metrics:
+`db_pool_checked_out`, `db_pool_checkouts_total`, `db_pool_hold_seconds` and
+`db_request_sessions_total{used=...}`.
 """
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import get_settings
+from app.metrics import metrics
 
 
 settings = get_settings()
@@ -29,15 +38,74 @@ async_session = async_sessionmaker(
 )
 
 
+# ── Pool occupancy ──
+_checked_out = 0
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(_dbapi_conn, record, _proxy):
+    global _checked_out
+    _checked_out += 1
+    record.info["checked_out_at"] = time.perf_counter()
+    metrics.inc("db_pool_checkouts")
+    metrics.set_gauge("db_pool_checked_out", _checked_out)
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(_dbapi_conn, record):
+    global _checked_out
+    started = record.info.pop("checked_out_at", None)
+    if started is None:
+        return
+    _checked_out -= 1
+    metrics.observe("db_pool_hold_seconds", time.perf_counter() - started)
+    metrics.set_gauge("db_pool_checked_out", _checked_out)
+
+
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
     pass
 
 
+def dialect_insert(session: AsyncSession):
+    """`insert` construct with ON CONFLICT support for the session's dialect."""
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class LazySession:
+    """
+    Stand-in for a request's AsyncSession: the real session is created on the
+    first attribute access, and it checks out a connection on its first
+    statement as usual. An untouched LazySession costs nothing to close.
+    """
+
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: AsyncSession | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
 async def get_db() -> AsyncSession:
-    """FastAPI dependency — yields a DB session."""
-    async with async_session() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    """FastAPI dependency — yields a DB session, opened on first use."""
+    session = LazySession(async_session)
+    try:
+        yield session
+    finally:
+        metrics.inc("db_request_sessions", used=str(session.started).lower())
+        await session.close()
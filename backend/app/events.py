@@ -0,0 +1,123 @@
+"""
+ReklamAI v2.0 — Generation Status Events
+Writers (generate route, webhook, Inngest pipeline, reconciler) call
+`publish_generation` after committing a status or progress change. The event
+goes through app/pubsub.py, so every worker's `GenerationStreams` hub gets it
+and forwards it to that user's open SSE connections. The same call writes the
+new state through to this worker's recent-generations ring (app/recent.py);
+other workers' rings are invalidated by the event. If a worker may have missed
+events, its open streams are ended (clients reconnect and resync) and its ring
+is cleared.
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.config import get_settings
+from app.metrics import metrics
+from app.models import Generation
+from app.pubsub import pubsub
+from app.recent import recent_generations
+from app.schemas import GenerationStatus
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+GENERATION_CHANNEL = "reklamai_generations"
+
+
+def status_event(gen: Generation) -> dict:
+    """Compact event for ``gen``; ``user_id`` is used for routing only."""
+    return {
+        "user_id": gen.user_id,
+        **GenerationStatus.model_validate(gen).model_dump(mode="json"),
+    }
+
+
+async def publish_generation(*gens: Generation) -> None:
+    """Announce the committed state of ``gens`` to every worker's stream hub."""
+    for gen in gens:
+        recent_generations.write(gen)
+        await pubsub.publish(GENERATION_CHANNEL, status_event(gen))
+
+
+class GenerationStreams:
+    """Per-user fan-out of generation events to open stream connections."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._queues: dict[str, set[asyncio.Queue]] = {}
+
+    def open(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.setdefault(user_id, set()).add(queue)
+        metrics.set_gauge("generation_streams_open", self.connections)
+        return queue
+
+    def close(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._queues.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+        metrics.set_gauge("generation_streams_open", self.connections)
+
+    @property
+    def connections(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def dispatch(self, event: dict) -> None:
+        for queue in self._queues.get(event.get("user_id"), ()):
+            if queue.full():
+                # Slow consumer: drop the oldest event, the newest state matters most
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def reset(self) -> None:
+        """End every open stream; clients reconnect and get the current state again."""
+        for queues in self._queues.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+def sse(event: dict, name: str = "generation") -> str:
+    data = {k: v for k, v in event.items() if k != "user_id"}
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream_events(
+    user_id: str,
+    initial: list[dict],
+    is_disconnected: Callable[[], Awaitable[bool]],
+) -> AsyncIterator[str]:
+    """
+    SSE body for one connection: the current state of ``initial`` first, then
+    live events, with a comment line every `stream_keepalive_seconds`.
+    """
+    queue = streams.open(user_id)
+    try:
+        yield f"retry: {settings.stream_retry_ms}\n\n"
+        for event in initial:
+            yield sse(event)
+        while not await is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.stream_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return  # events may have been missed (see GenerationStreams.reset)
+            yield sse(event)
+    finally:
+        streams.close(user_id, queue)
+
+
+# Singleton
+streams = GenerationStreams()
+pubsub.subscribe(GENERATION_CHANNEL, streams.dispatch)
+pubsub.subscribe(GENERATION_CHANNEL, recent_generations.on_event)
+pubsub.on_gap(streams.reset)
+pubsub.on_gap(recent_generations.clear)
@@ -0,0 +1,81 @@
+"""
+ReklamAI v2.0 — Generation History Export
+Streams a user's whole history as NDJSON or CSV for reporting
+(GET /api/generations/export).
+
+Rows come from a server-side cursor (`AsyncSession.stream` with
+`yield_per`, a named cursor on asyncpg) and are encoded one partition at a
+time, so memory stays constant whatever the history size. The export opens
+its own session for the lifetime of the response body.
+"""
+import csv
+import io
+from typing import AsyncIterator
+
+from sqlalchemy import Select, desc, select
+
+from app.config import get_settings
+from app.database import async_session
+from app.metrics import metrics
+from app.models import Generation
+from app.schemas import GenerationExportRow
+from app.serialization import JsonView
+
+settings = get_settings()
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_FIELDS = tuple(GenerationExportRow.model_fields)
+export_row_json = JsonView(GenerationExportRow)
+# Spreadsheet apps evaluate cells starting with these: prefix them so a prompt stays text
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_query(conditions: list) -> Select:
+    columns = [getattr(Generation, f) for f in EXPORT_FIELDS]
+    return (
+        select(*columns)
+        .where(*conditions)
+        .order_by(desc(Generation.created_at), desc(Generation.id))
+        .execution_options(yield_per=settings.export_batch_rows)
+    )
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = " ".join(value)
+    if isinstance(value, str):
+        return "'" + value if value.startswith(_FORMULA_PREFIXES) else value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_cell(v) for v in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return b"".join(export_row_json.dump(row) + b"\n" for row in rows)
+
+
+async def export_body(query: Select, fmt: str) -> AsyncIterator[bytes]:
+    """Encoded export of ``query`` in ``fmt``, one chunk per fetched partition."""
+    encode = _csv_chunk if fmt == "csv" else _ndjson_chunk
+    if fmt == "csv":
+        yield _csv_chunk([EXPORT_FIELDS])
+    exported = 0
+    async with async_session() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield encode(rows)
+    metrics.inc("generation_exports", format=fmt)
+    metrics.inc("generation_export_rows", exported, format=fmt)
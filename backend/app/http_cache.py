@@ -0,0 +1,124 @@
+"""
+ReklamAI v2.0 — Precomputed HTTP Responses
+Response bodies rendered once, with a strong ETag and gzip / brotli variants,
+served with `If-None-Match` → 304 and `Accept-Encoding` negotiation.
+
+Brotli is optional: without the `brotli` package only gzip and identity are offered.
+"""
+import gzip
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover — optional dependency
+    brotli = None
+
+# Bodies this small are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+
+@dataclass(frozen=True)
+class PrecomputedBody:
+    """One representation set: identity bytes plus precompressed variants."""
+    body: bytes
+    etag: str  # opaque tag without quotes; variants append -gzip / -br
+    gzip: bytes | None = None
+    br: bytes | None = None
+    media_type: str = "application/json"
+
+    @classmethod
+    def render(
+        cls, body: bytes, media_type: str = "application/json", compress: bool = True,
+    ) -> "PrecomputedBody":
+        """``compress=False`` for one-off bodies: ETag only, no variants."""
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if not compress or len(body) < MIN_COMPRESS_BYTES:
+            return cls(body=body, etag=etag, media_type=media_type)
+        return cls(
+            body=body,
+            etag=etag,
+            gzip=gzip.compress(body, compresslevel=9, mtime=0),
+            br=brotli.compress(body, quality=11) if brotli else None,
+            media_type=media_type,
+        )
+
+    def variant(self, accept_encoding: str) -> tuple[bytes, str | None, str]:
+        """Pick (body, content-encoding, etag) for an Accept-Encoding header."""
+        accepted = _accepted_encodings(accept_encoding)
+        if self.br is not None and "br" in accepted:
+            return self.br, "br", f'"{self.etag}-br"'
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip", f'"{self.etag}-gzip"'
+        return self.body, None, f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """True if If-None-Match names any representation of this body."""
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            tag = tag.removeprefix("W/").strip('"')
+            if tag in (self.etag, f"{self.etag}-gzip", f"{self.etag}-br"):
+                return True
+        return False
+
+
+class BodyCache:
+    """Bounded LRU of rendered bodies for responses that never change once cached."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, PrecomputedBody] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> PrecomputedBody | None:
+        rendered = self._entries.get(key)
+        if rendered is not None:
+            self._entries.move_to_end(key)
+        return rendered
+
+    def put(self, key: Hashable, rendered: PrecomputedBody) -> None:
+        self._entries[key] = rendered
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def precomputed_response(request: Request, rendered: PrecomputedBody, cache_control: str) -> Response:
+    """Serve ``rendered`` for ``request``: 304 on a matching ETag, else the best encoding."""
+    body, encoding, etag = rendered.variant(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and rendered.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=rendered.media_type, headers=headers)
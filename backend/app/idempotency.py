@@ -0,0 +1,86 @@
+"""
+ReklamAI v2.0 — Idempotency Keys
+`POST /api/generate` accepts an `Idempotency-Key` header. The first request
+claims (user_id, key) in the same transaction that reserves credits and
+inserts the generation; a retry with the same key finds the claim and gets
+the original generation back without touching credits or the queue.
+
+Concurrent duplicates serialize on the primary key: on PostgreSQL the
+second INSERT waits for the first transaction and then sees the conflict.
+Keys expire after `idempotency_ttl_hours` and are purged by a cron.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import clock
+from app.config import get_settings
+from app.database import dialect_insert
+from app.models import IdempotencyKey
+from app.schemas import GenerateRequest
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(req: GenerateRequest) -> str:
+    """sha256 of the canonical request body; a key may only be replayed for the same body."""
+    canonical = json.dumps(req.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def find_key(db: AsyncSession, user_id: str, key: str) -> IdempotencyKey | None:
+    """The live (unexpired) claim of ``key``, if any."""
+    return (await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > clock.utcnow(),
+        )
+    )).scalar_one_or_none()
+
+
+async def claim_key(
+    db: AsyncSession, user_id: str, key: str, fingerprint: str, generation_id: str,
+) -> bool:
+    """
+    Claim ``key`` for ``generation_id`` (uncommitted). False when another request
+    holds a live claim; an expired claim is taken over.
+    """
+    now = clock.utcnow()
+    values = {
+        "fingerprint": fingerprint,
+        "generation_id": generation_id,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=settings.idempotency_ttl_hours),
+    }
+    insert = dialect_insert(db)
+    claimed = await db.execute(
+        insert(IdempotencyKey)
+        .values(user_id=user_id, key=key, **values)
+        .on_conflict_do_update(
+            index_elements=["user_id", "key"],
+            set_=values,
+            where=IdempotencyKey.expires_at <= now,
+        )
+        .returning(IdempotencyKey.generation_id)
+    )
+    return claimed.scalar_one_or_none() is not None
+
+
+async def purge_expired_keys(session_factory: async_sessionmaker) -> dict:
+    """Delete expired claims; returns {deleted}."""
+    async with session_factory() as db:
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= clock.utcnow())
+        )
+        await db.commit()
+    stats = {"deleted": result.rowcount or 0}
+    logger.info(f"[IDEMPOTENCY] Purged expired keys: {stats}")
+    return stats
@@ -2,13 +2,13 @@
 ReklamAI v2.0 — Inngest Client
 Background task processing for video/image generation using Inngest.
 """
+import json
 import logging
-import httpx
 import inngest
 import inngest.fast_api
-from datetime import datetime, timezone
 
 from app.config import get_settings
+from app.metrics import metrics
 
 settings = get_settings()
 logger = logging.getLogger("uvicorn")
@@ -23,204 +23,408 @@ inngest_client = inngest.Inngest(
 )
 
 
+# ── Compact step outputs ──
+# Every step output is memoized in the Inngest run state and sent back on each
+# replay, so steps return only the fields the next step needs — never raw
+# provider payloads.
+def compact_create_result(data: dict) -> dict:
+    """Reduce a KIE createTask response to {task_id, error}."""
+    task_id = data.get("taskId") or data.get("task_id") or data.get("id")
+    if not task_id and isinstance(data.get("data"), dict):
+        task_id = data["data"].get("taskId") or data["data"].get("id")
+    return {
+        "task_id": task_id or "",
+        "error": data.get("msg") if data.get("code") != 200 else None,
+    }
+
+
+def compact_task_status(response: dict) -> dict:
+    """
+    Reduce a KIE recordInfo response to {state, result_url, result_urls, error}.
+    ``state`` is one of processing | succeeded | failed; result fields are only
+    included once the task is terminal.
+    """
+    kie_data = response.get("data") or {}
+    # KIE uses 'state' string: 'generating', 'success', 'fail'
+    kie_state = kie_data.get("state")
+    if kie_state == "success":
+        state = "succeeded"
+    elif kie_state in ("fail", "cancel"):
+        state = "failed"
+    else:
+        return {"state": "processing"}
+
+    # Extract result URL from resultJson (it's a stringified JSON)
+    result_url = ""
+    result_urls = []
+    result_json_str = kie_data.get("resultJson")
+    if result_json_str:
+        try:
+            result_data = json.loads(result_json_str)
+            result_urls = result_data.get("resultUrls") or []
+            if result_urls:
+                result_url = result_urls[0]
+        except (ValueError, TypeError, AttributeError):
+            pass
+
+    # Fallbacks
+    if not result_url:
+        result_url = kie_data.get("resultUrl") or kie_data.get("url") or ""
+    if not result_urls and result_url:
+        result_urls = [result_url]
+
+    return {
+        "state": state,
+        "result_url": result_url,
+        "result_urls": result_urls,
+        "error": (kie_data.get("failMsg") or kie_data.get("error")) if state == "failed" else None,
+    }
+
+
+class StepStateMeter:
+    """
+    Measures the serialized size of step outputs held in a run's state.
+    Inngest replays the function from the top on every step, so the total seen
+    by one invocation equals the state the executor ships back to us.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.steps = 0
+
+    def add(self, output) -> None:
+        self.steps += 1
+        self.bytes += len(json.dumps(output, separators=(",", ":"), default=str))
+
+    async def run(self, step, step_id: str, handler):
+        output = await step.run(step_id, handler)
+        self.add(output)
+        return output
+
+    def report(self, fn_id: str) -> dict:
+        metrics.observe("inngest_step_state_bytes", self.bytes, fn=fn_id)
+        return {"step_state_bytes": self.bytes, "steps": self.steps}
+
+
+# ── Step budget ──
+# Inngest caps a run at 1,000 steps, and every memoized step is sent back on
+# each replay, so the worst case of process-generation is checked at import.
+INNGEST_MAX_STEPS = 1000
+POLL_ATTEMPTS = 60
+
+
+def pipeline_step_budget() -> int:
+    """Most steps one process-generation run can take."""
+    admission = 2 * settings.admission_max_attempts  # admit + wait-slot
+    dispatch = 3 * settings.dispatch_max_attempts  # call-kie-api + release-slot + wait-lane
+    polling = 2 * POLL_ATTEMPTS  # wait-10s + check-kie-status
+    return admission + dispatch + polling + 3  # fail-undispatched | save-task-id, update-db
+
+
+if pipeline_step_budget() > INNGEST_MAX_STEPS:
+    raise ValueError(
+        f"process-generation may take {pipeline_step_budget()} steps (limit {INNGEST_MAX_STEPS}): "
+        "lower ADMISSION_MAX_ATTEMPTS or DISPATCH_MAX_ATTEMPTS"
+    )
+
+
 # ── Generation Function ──
-@inngest_client.create_function(
-    fn_id="process-generation",
-    trigger=inngest.TriggerEvent(event="reklamai/generation.requested"),
-    retries=3,
-)
-async def process_generation_fn(
-    ctx: inngest.Context,
-) -> dict:
-    step = ctx.step
+async def run_generation_pipeline(step, data: dict, kie=None) -> dict:
+    """
+    Body of process-generation. ``step`` is anything with Inngest's
+    ``run(step_id, handler)`` / ``sleep(step_id, duration)`` contract — the
+    real SDK step in production, an in-memory executor in app/simulation.py.
+    ``kie`` defaults to the shared KIE client.
+    """
+    if kie is None:
+        from app.kie_client import kie_client as kie
+    meter = StepStateMeter()
     logger.info("[INNGEST] Starting process_generation_fn")
     try:
-        logger.info(f"[INNGEST] Event data keys: {list(ctx.event.data.keys())}")
-        generation_id = ctx.event.data["generation_id"]
-        payload = ctx.event.data.get("payload", {})
+        logger.info(f"[INNGEST] Event data keys: {list(data.keys())}")
+        generation_id = data["generation_id"]
+        payload = data.get("payload", {})
 
         logger.info(f"[INNGEST] Processing generation {generation_id}")
 
-        # Step 1: Send to KIE.ai
-        async def call_kie() -> dict:
-            kie_base = settings.kie_base_url
-            kie_key = settings.kie_api_key
-            headers = {
-                "Authorization": f"Bearer {kie_key}",
-                "Content-Type": "application/json",
-            }
+        # Step 0: Wait for a fair-share slot in the generation's capacity lane
+        from datetime import timedelta
 
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        f"{kie_base}/api/v1/jobs/createTask",
-                        json=payload,
-                        headers=headers,
-                    )
+        async def admit() -> dict:
+            from app.database import async_session
+            from app.scheduler import try_admit
+            async with async_session() as db:
+                return await try_admit(db, generation_id)
 
-                if response.status_code != 200:
-                    logger.error(f"[INNGEST] KIE API Error: {response.status_code} — {response.text}")
-                    return {"error": f"HTTP {response.status_code}", "raw": response.text}
+        # Slot checks left for the whole run (shared by every dispatch attempt)
+        admit_budget = [settings.admission_max_attempts]
 
-                data = response.json()
-                logger.info(f"[INNGEST] KIE response: {data}")
-                
-                # Extract task_id
-                task_id = data.get("taskId") or data.get("task_id") or data.get("id")
-                if not task_id and "data" in data and data["data"]:
-                    task_id = data["data"].get("taskId") or data["data"].get("id")
-                
-                return {
-                    "task_id": task_id,
-                    "raw": data,
-                    "error": data.get("msg") if data.get("code") != 200 else None
-                }
+        async def wait_for_slot(suffix: str) -> dict:
+            admit_idx = 0
+            while admit_budget[0] > 0:
+                admit_budget[0] -= 1
+                admission = await meter.run(step, f"admit{suffix}-{admit_idx}", admit)
+                if admission["admitted"] or admission["position"] is None:
+                    return admission
+
+                # Back off exponentially while waiting behind other jobs
+                wait = min(settings.admission_poll_seconds * 2 ** admit_idx, settings.admission_max_wait_seconds)
+                await step.sleep(f"wait-slot{suffix}-{admit_idx}", timedelta(seconds=wait))
+                admit_idx += 1
+            raise Exception("Generation was not admitted in time")
+
+        # Step 1: Send to KIE.ai
+        async def call_kie() -> dict:
+            from app.kie_client import KIERateLimited
+            try:
+                data = await kie.submit_task(payload)
+            except KIERateLimited as e:
+                # Back off only this lane; the job goes back to its queue
+                from app.lanes import lanes
+                delay = e.retry_after or settings.lane_backoff_seconds
+                lanes.pause(admission["lane"], delay)
+                logger.warning(f"[INNGEST] KIE 429 — pausing lane {admission['lane']} for {delay}s")
+                return {"task_id": "", "error": "HTTP 429", "retry_after": delay}
             except Exception as e:
                 logger.error(f"[INNGEST] KIE Call Exception: {e}")
-                return {"error": str(e)}
+                return {"task_id": "", "error": str(e)}
+
+            logger.info(f"[INNGEST] KIE response: {data}")
+            return compact_create_result(data)
+
+        async def release_slot() -> dict:
+            from app.database import async_session
+            from app.scheduler import release_admission
+            async with async_session() as db:
+                await release_admission(db, generation_id)
+            return {"released": True}
+
+        async def fail_undispatched(error: str) -> dict:
+            from app.database import async_session
+            from app.models import Generation
+            from app.lifecycle import mark_failed
+            from app.events import publish_generation
+            from app.scheduler import ACTIVE_STATUSES
+            from sqlalchemy import select
+            async with async_session() as db:
+                result = await db.execute(
+                    select(Generation).where(Generation.id == generation_id).with_for_update()
+                )
+                gen = result.scalar_one_or_none()
+                if not gen or gen.status not in ACTIVE_STATUSES or gen.provider_task_id:
+                    return {"failed": False}
+                # A terminal row no longer counts as running, so this also frees its slot
+                await mark_failed(db, gen, error)
+                await db.commit()
+                await publish_generation(gen)
+                return {"failed": True}
+
+        try:
+            kie_result = {}
+            for dispatch_idx in range(settings.dispatch_max_attempts):
+                suffix = f"-retry{dispatch_idx}" if dispatch_idx else ""
+                admission = await wait_for_slot(suffix)
+                if not admission["admitted"]:
+                    logger.info(f"[INNGEST] Generation {generation_id} no longer queued — skipping")
+                    return {"id": generation_id, "status": "skipped", **meter.report("process-generation")}
 
-        kie_result = await step.run("call-kie-api", call_kie)
-        task_id = kie_result.get("task_id", "")
-        
-        if not task_id:
-            error_msg = kie_result.get("error") or "Unknown KIE Error"
-            raise Exception(f"Failed to create KIE task: {error_msg}")
+                kie_result = await meter.run(step, f"call-kie-api{suffix}", call_kie)
+                if "retry_after" not in kie_result:
+                    break
+                await meter.run(step, f"release-slot{suffix}", release_slot)
+                await step.sleep(f"wait-lane{suffix}", timedelta(seconds=kie_result["retry_after"]))
+
+            task_id = kie_result.get("task_id", "")
+
+            if not task_id:
+                error_msg = kie_result.get("error") or "Unknown KIE Error"
+                raise Exception(f"Failed to create KIE task: {error_msg}")
+        except Exception as e:
+            # Never dispatched: release the slot and refund now, not at the reconciler deadline
+            error = str(e)
+            await meter.run(step, "fail-undispatched", lambda: fail_undispatched(error))
+            raise
 
         # Save provider_task_id to DB so webhook and status can find this generation
         async def save_task_id() -> dict:
             from app.database import async_session
             from app.models import Generation
+            from app.lifecycle import set_status
+            from app.events import publish_generation
+            from app.scheduler import ACTIVE_STATUSES
             from sqlalchemy import select
             async with async_session() as db:
                 result = await db.execute(
-                    select(Generation).where(Generation.id == generation_id)
+                    select(Generation).where(Generation.id == generation_id).with_for_update()
                 )
                 gen = result.scalar_one_or_none()
-                if gen:
-                    gen.provider_task_id = task_id
-                    gen.status = "processing"
-                    await db.commit()
+                if not gen or gen.status not in ACTIVE_STATUSES:
+                    # Expired (and refunded) meanwhile: never bring a settled row back
+                    return {"saved": False}
+                gen.provider_task_id = task_id
+                await set_status(db, gen, "processing")
+                await db.commit()
+                await publish_generation(gen)
                 return {"saved": True}
 
-        await step.run("save-task-id", save_task_id)
+        saved = await meter.run(step, "save-task-id", save_task_id)
+        if not saved["saved"]:
+            logger.warning(f"[INNGEST] Generation {generation_id} settled before dispatch — not polling {task_id}")
+            return {"id": generation_id, "status": "skipped", **meter.report("process-generation")}
 
         # Step 2: Poll for completion
         # Poll up to 60 times (10 minutes)
-        from datetime import timedelta
         final_status = None
-        for poll_idx in range(60):
+        for poll_idx in range(POLL_ATTEMPTS):
             await step.sleep(f"wait-10s-{poll_idx}", timedelta(seconds=10))
             
             # Check status — each step must have a unique name
             async def check_kie() -> dict:
-                from app.kie_client import kie_client
-                return await kie_client.get_task_status(task_id)
+                return compact_task_status(await kie.get_task_status(task_id))
 
-            status_response = await step.run(f"check-kie-status-{poll_idx}", check_kie)
-            
-            kie_data = status_response.get("data", {})
-            # KIE uses 'state' string: 'generating', 'success', 'fail'
-            kie_state = kie_data.get("state")
-            
-            status = "processing"
-            if kie_state == "success":
-                status = "succeeded"
-            elif kie_state in ["fail", "cancel"]:
-                status = "failed"
-            
-            logger.info(f"[INNGEST] Polling task {task_id}: {status} (KIE state: {kie_state})")
-            
-            if status in ["succeeded", "failed"]:
-                # Extract result URL from resultJson (it's a stringified JSON)
-                result_url = ""
-                result_urls = []
-                
-                result_json_str = kie_data.get("resultJson")
-                if result_json_str:
-                    try:
-                        import json
-                        result_data = json.loads(result_json_str)
-                        result_urls = result_data.get("resultUrls") or []
-                        if result_urls:
-                            result_url = result_urls[0]
-                    except:
-                        pass
-                
-                # Fallbacks
-                if not result_url:
-                    result_url = kie_data.get("resultUrl") or kie_data.get("url") or ""
-                if not result_urls and result_url:
-                    result_urls = [result_url]
-                
+            status = await meter.run(step, f"check-kie-status-{poll_idx}", check_kie)
+            logger.info(f"[INNGEST] Polling task {task_id}: {status['state']}")
+
+            if status["state"] in ("succeeded", "failed"):
                 final_status = {
-                    "status": status,
-                    "result_url": result_url,
-                    "result_urls": result_urls,
-                    "error": kie_data.get("failMsg") or kie_data.get("error") if status == "failed" else None
+                    "status": status["state"],
+                    "result_url": status["result_url"],
+                    "result_urls": status["result_urls"],
+                    "error": status["error"],
                 }
                 break
-        
+
         if not final_status:
             raise Exception("Generation timed out after 10 minutes")
 
         # Step 3: Update generation in DB
         async def update_db() -> dict:
             from app.database import async_session
-            from app.models import Generation, CreditAccount, CreditTransaction
+            from app.models import Generation
+            from app.lifecycle import TERMINAL_STATUSES, mark_succeeded, mark_failed
+            from app.events import publish_generation
             from sqlalchemy import select
-            
+
             async with async_session() as db:
                 result = await db.execute(
-                    select(Generation).where(Generation.id == generation_id)
+                    select(Generation).where(Generation.id == generation_id).with_for_update()
                 )
                 gen = result.scalar_one_or_none()
                 
                 if not gen:
                     return {"status": "not_found"}
+                if gen.status in TERMINAL_STATUSES:
+                    # Already finalized by the webhook or the reconciler
+                    return {"id": gen.id, "status": gen.status}
 
-                now = datetime.now(timezone.utc)
                 kie_status = final_status.get("status")
                 
                 if kie_status == "succeeded":
-                    gen.status = "succeeded"
-                    gen.completed_at = now
-                    gen.result_url = final_status.get("result_url") or ""
-                    gen.result_urls = final_status.get("result_urls") or []
-                    gen.provider_response = final_status
-                    gen.credits_final = gen.credits_reserved  # finalize cost
-                    
+                    await mark_succeeded(
+                        db, gen,
+                        result_url=final_status.get("result_url") or "",
+                        result_urls=final_status.get("result_urls") or [],
+                        provider_response=final_status,
+                    )
                 elif kie_status == "failed":
-                    gen.status = "failed"
-                    gen.completed_at = now
-                    gen.error_message = final_status.get("error") or "Unknown error"
-                    gen.provider_response = final_status
-                    
-                    # Refund credits
-                    res = await db.execute(
-                        select(CreditAccount).where(CreditAccount.owner_id == gen.user_id)
+                    await mark_failed(
+                        db, gen,
+                        final_status.get("error") or "Unknown error",
+                        provider_response=final_status,
                     )
-                    account = res.scalar_one_or_none()
-                    if account and gen.credits_reserved > 0:
-                        account.balance += gen.credits_reserved
-                        account.total_spent -= gen.credits_reserved
-                        
-                        refund = CreditTransaction(
-                            account_id=account.id,
-                            amount=gen.credits_reserved,
-                            type="refund",
-                            generation_id=gen.id,
-                        )
-                        db.add(refund)
-                        gen.credits_final = 0
 
                 await db.commit()
+                await publish_generation(gen)
                 return {"id": gen.id, "status": gen.status}
 
-        result = await step.run("update-db", update_db)
-        return result
+        result = await meter.run(step, "update-db", update_db)
+        return {**result, **meter.report("process-generation")}
 
     except Exception as e:
         import traceback
         logger.error(f"[INNGEST] Error processing generation: {e}")
         logger.error(traceback.format_exc())
         raise e
+
+
+@inngest_client.create_function(
+    fn_id="process-generation",
+    trigger=inngest.TriggerEvent(event="reklamai/generation.requested"),
+    retries=3,
+)
+async def process_generation_fn(
+    ctx: inngest.Context,
+) -> dict:
+    return await run_generation_pipeline(ctx.step, ctx.event.data)
+
+
+# ── Reconciler ──
+@inngest_client.create_function(
+    fn_id="reconcile-generations",
+    trigger=inngest.TriggerCron(cron=settings.reconcile_cron),
+    retries=0,
+)
+async def reconcile_generations_fn(
+    ctx: inngest.Context,
+) -> dict:
+    """Settle generations stuck in queued / processing and refund their reservations."""
+    async def reconcile() -> dict:
+        from app.database import async_session
+        from app.reconciler import reconcile_stale_generations
+        return await reconcile_stale_generations(async_session)
+
+    return await ctx.step.run("reconcile", reconcile)
+
+
+# ── Counter repair ──
+@inngest_client.create_function(
+    fn_id="repair-generation-counters",
+    trigger=inngest.TriggerCron(cron=settings.counters_repair_cron),
+    retries=1,
+)
+async def repair_generation_counters_fn(
+    ctx: inngest.Context,
+) -> dict:
+    """Rebuild per-user generation counters from the generations table."""
+    async def repair() -> dict:
+        from app.database import async_session
+        from app.counters import rebuild_generation_counters
+        return await rebuild_generation_counters(async_session)
+
+    return await ctx.step.run("repair", repair)
+
+
+# ── Idempotency key purge ──
+@inngest_client.create_function(
+    fn_id="purge-idempotency-keys",
+    trigger=inngest.TriggerCron(cron=settings.idempotency_purge_cron),
+    retries=1,
+)
+async def purge_idempotency_keys_fn(
+    ctx: inngest.Context,
+) -> dict:
+    """Delete expired Idempotency-Key claims."""
+    async def purge() -> dict:
+        from app.database import async_session
+        from app.idempotency import purge_expired_keys
+        return await purge_expired_keys(async_session)
+
+    return await ctx.step.run("purge", purge)
+
+
+# ── Result cache pruning ──
+@inngest_client.create_function(
+    fn_id="prune-result-cache",
+    trigger=inngest.TriggerCron(cron=settings.result_cache_prune_cron),
+    retries=1,
+)
+async def prune_result_cache_fn(
+    ctx: inngest.Context,
+) -> dict:
+    """Drop expired result-cache entries and evict above the size bound."""
+    async def prune() -> dict:
+        from app.database import async_session
+        from app.result_cache import prune_result_cache
+        return await prune_result_cache(async_session)
+
+    return await ctx.step.run("prune", prune)
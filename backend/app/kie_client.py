@@ -2,6 +2,7 @@
 ReklamAI v2.0 — KIE.ai Client
 Handles communication with the KIE.ai API for AI generation.
 """
+import asyncio
 import httpx
 from typing import Optional
 from app.config import get_settings
@@ -9,6 +10,22 @@ from app.config import get_settings
 settings = get_settings()
 
 
+class KIEError(Exception):
+    """Non-200 answer from KIE.ai."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"KIE API error {status_code}: {detail}")
+        self.status_code = status_code
+
+
+class KIERateLimited(KIEError):
+    """KIE.ai answered 429; ``retry_after`` is in seconds (None if not given)."""
+
+    def __init__(self, detail: str, retry_after: int | None = None):
+        super().__init__(429, detail)
+        self.retry_after = retry_after
+
+
 class KIEClient:
     """Async HTTP client for KIE.ai API."""
 
@@ -55,9 +72,16 @@ class KIEClient:
         # Remove empty values
         payload["input"] = {k: v for k, v in payload["input"].items() if v}
 
+        return await self.submit_task(payload)
+
+    async def submit_task(self, payload: dict) -> dict:
+        """
+        Отправляет готовый payload в createTask.
+        Raises KIERateLimited on 429 and KIEError on any other non-200 answer.
+        """
         import logging
         logger = logging.getLogger("uvicorn")
-        logger.info(f"[KIE] Sending task: model={model_id}")
+        logger.info(f"[KIE] Sending task: model={payload.get('model')}")
 
         async with httpx.AsyncClient(timeout=30.0) as client:
             response = await client.post(
@@ -66,10 +90,14 @@ class KIEClient:
                 headers=self.headers,
             )
 
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            raise KIERateLimited(response.text, int(retry_after) if retry_after.isdigit() else None)
+
         if response.status_code != 200:
             error_detail = response.text
             logger.error(f"[KIE] Error {response.status_code}: {error_detail}")
-            raise Exception(f"KIE API error {response.status_code}: {error_detail}")
+            raise KIEError(response.status_code, error_detail)
 
         data = response.json()
         logger.info(f"[KIE] Task created: {data.get('task_id', data.get('taskId', 'unknown'))}")
@@ -92,6 +120,33 @@ class KIEClient:
 
         return response.json()
 
+    async def get_task_statuses(self, task_ids: list[str], concurrency: int = 10) -> dict[str, dict]:
+        """
+        Проверяет статусы нескольких задач через одно соединение.
+        KIE has no bulk endpoint, so requests are pipelined over a shared
+        client with bounded concurrency. Failed lookups are omitted.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results: dict[str, dict] = {}
+
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            async def fetch(task_id: str):
+                async with semaphore:
+                    try:
+                        response = await client.get(
+                            f"{self.base_url}/api/v1/jobs/recordInfo",
+                            params={"taskId": task_id},
+                            headers=self.headers,
+                        )
+                    except httpx.HTTPError:
+                        return
+                    if response.status_code == 200:
+                        results[task_id] = response.json()
+
+            await asyncio.gather(*(fetch(t) for t in task_ids))
+
+        return results
+
     async def cancel_task(self, task_id: str) -> dict:
         """
         Отменяет задачу в KIE.ai.
@@ -0,0 +1,88 @@
+"""
+ReklamAI v2.0 — Provider Capacity Lanes
+Separates image / video / voice / text work so a backlog in one lane cannot
+delay another. Each lane has its own concurrency limit (enforced by the
+scheduler), its own provider request budget and its own 429 backoff.
+
+Rate budgets and pauses are in-memory per worker process, like the API rate
+limiter; for a multi-worker fleet, divide the budgets by the worker count.
+"""
+from app import clock
+from app.config import get_settings
+from app.metrics import metrics
+
+settings = get_settings()
+
+DEFAULT_LANE = "default"
+
+
+def lane_for_model(ai_model) -> str:
+    """Lane of a model: explicit config["capacity_group"], else its category."""
+    if ai_model is None:
+        return DEFAULT_LANE
+    config = ai_model.config or {}
+    return config.get("capacity_group") or ai_model.category or DEFAULT_LANE
+
+
+def lane_concurrency(lane: str) -> int:
+    return settings.lane_concurrency.get(lane, settings.lane_default_concurrency)
+
+
+def lane_rate_per_minute(lane: str) -> int:
+    return settings.lane_rate_per_minute.get(lane, settings.lane_default_rate_per_minute)
+
+
+class TokenBucket:
+    """Refilling token bucket: ``rate`` tokens per minute, burst up to ``rate``."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(max(rate_per_minute, 1))
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = clock.monotonic()
+
+    def try_take(self) -> bool:
+        now = clock.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LaneGovernor:
+    """Per-lane provider request budget and 429 backpressure."""
+
+    def __init__(self):
+        self._buckets: dict[str, TokenBucket] = {}
+        self._paused_until: dict[str, float] = {}
+
+    def _bucket(self, lane: str) -> TokenBucket:
+        if lane not in self._buckets:
+            self._buckets[lane] = TokenBucket(lane_rate_per_minute(lane))
+        return self._buckets[lane]
+
+    def paused_for(self, lane: str) -> float:
+        """Seconds until the lane may dispatch again (0 if open)."""
+        return max(0.0, self._paused_until.get(lane, 0.0) - clock.monotonic())
+
+    def pause(self, lane: str, seconds: float) -> None:
+        """Stop dispatching to ``lane`` for ``seconds`` (e.g. after a provider 429)."""
+        until = clock.monotonic() + seconds
+        self._paused_until[lane] = max(self._paused_until.get(lane, 0.0), until)
+        metrics.inc("lane_throttled", lane=lane)
+
+    def try_dispatch(self, lane: str) -> bool:
+        """Consume one provider request from the lane budget, unless paused or exhausted."""
+        if self.paused_for(lane) > 0:
+            return False
+        return self._bucket(lane).try_take()
+
+    def reset(self) -> None:
+        self._buckets.clear()
+        self._paused_until.clear()
+
+
+# Singleton
+lanes = LaneGovernor()
@@ -0,0 +1,174 @@
+"""
+ReklamAI v2.0 — Completion Estimates
+Per-model streaming quantile sketches of queue time (created → admitted) and
+run time (admitted → succeeded), used to tell pollers when a generation is
+likely done: `GenerationResponse.estimated_completion_at` and a
+`Retry-After` header on GET /api/generations/{id}.
+
+The sketch is log-bucketed (DDSketch): every quantile is within
+`relative_accuracy` of the true value, memory is a few hundred buckets
+whatever the traffic, and weights are halved every `DECAY_EVERY` samples so
+recent completions dominate. Sketches are per worker: seeded from the latest
+succeeded generations of the model on first use, then fed by
+`lifecycle.mark_succeeded`.
+
+The estimate for a waiting or running generation is the conditional median
+of the phase given the time already spent in it, so an overdue job is not
+promised a completion in the past; an estimate past the 99th percentile is
+dropped.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.clock import utcnow
+from app.config import get_settings
+from app.models import Generation
+
+settings = get_settings()
+
+MIN_SECONDS = 0.1  # shorter phases share the lowest bucket
+DECAY_EVERY = 2000
+OVERDUE = 0.99  # past this share of the distribution there is nothing to estimate
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch over positive values."""
+
+    def __init__(self, relative_accuracy: float = 0.02, max_buckets: int = 1024):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: dict[int, float] = {}
+        self.count = 0.0
+        self._since_decay = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(max(value, MIN_SECONDS)) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0.0) + 1
+        self.count += 1
+        if len(self.buckets) > self.max_buckets:
+            # Collapse the two lowest buckets: only the fastest quantiles lose accuracy
+            low, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(low)
+        self._since_decay += 1
+        if self._since_decay >= DECAY_EVERY:
+            self._since_decay = 0
+            self.buckets = {i: w / 2 for i, w in self.buckets.items() if w > 0.01}
+            self.count = sum(self.buckets.values())
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def cdf(self, value: float) -> float:
+        if not self.count:
+            return 0.0
+        index = self._index(value)
+        return sum(w for i, w in self.buckets.items() if i < index) / self.count
+
+    def conditional_median(self, elapsed: float) -> float | None:
+        """Median of values known to exceed ``elapsed`` (None if overdue)."""
+        p = self.cdf(elapsed)
+        if p >= OVERDUE:
+            return None
+        return max(self.quantile((1 + p) / 2), elapsed)
+
+
+def _utc(value: datetime) -> datetime:
+    # Rows read back may be naive UTC, fresh objects are aware
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _seconds(start: datetime, end: datetime) -> float:
+    return (_utc(end) - _utc(start)).total_seconds()
+
+
+class LatencySketches:
+    """Queue and run time sketches per model slug."""
+
+    def __init__(self, min_samples: int, seed_rows: int):
+        self.min_samples = min_samples
+        self.seed_rows = seed_rows
+        self._models: dict[str, tuple[QuantileSketch, QuantileSketch]] = {}
+
+    def clear(self) -> None:
+        self._models.clear()
+
+    def _add(self, model: tuple[QuantileSketch, QuantileSketch], created_at, started_at, completed_at) -> None:
+        queue, run = model
+        queue.add(_seconds(created_at, started_at))
+        run.add(_seconds(started_at, completed_at))
+
+    def observe(self, gen: Generation) -> None:
+        """Record a succeeded generation (skipped until the model's sketch is seeded)."""
+        model = self._models.get(gen.model_slug or "")
+        if model is None or gen.started_at is None or gen.completed_at is None:
+            return
+        self._add(model, gen.created_at, gen.started_at, gen.completed_at)
+
+    async def _model(self, db: AsyncSession, model_slug: str) -> tuple[QuantileSketch, QuantileSketch]:
+        model = self._models.get(model_slug)
+        if model is not None:
+            return model
+        rows = (await db.execute(
+            select(Generation.created_at, Generation.started_at, Generation.completed_at)
+            .where(
+                Generation.model_slug == model_slug,
+                Generation.status == "succeeded",
+                Generation.started_at.is_not(None),
+                Generation.completed_at.is_not(None),
+            )
+            .order_by(Generation.completed_at.desc())
+            .limit(self.seed_rows)
+        )).all()
+        model = (QuantileSketch(), QuantileSketch())
+        for row in reversed(rows):
+            self._add(model, row.created_at, row.started_at, row.completed_at)
+        self._models[model_slug] = model
+        return model
+
+    async def estimate(self, db: AsyncSession, gen: Generation) -> datetime | None:
+        """Likely completion time of a queued or processing ``gen`` (None without enough data)."""
+        queue, run = await self._model(db, gen.model_slug or "")
+        if run.count < self.min_samples:
+            return None
+        # Anchored on the phase start, not on now: stable between polls, so ETags still match
+        now = utcnow()
+        if gen.started_at is None:
+            start = _utc(gen.created_at)
+            waiting = queue.conditional_median(_seconds(start, now))
+            duration = waiting + run.quantile(0.5) if waiting is not None else None
+        else:
+            start = _utc(gen.started_at)
+            duration = run.conditional_median(_seconds(start, now))
+        if duration is None:
+            return None
+        return (start + timedelta(seconds=duration)).replace(microsecond=0)
+
+
+def retry_after(eta: datetime | None) -> int:
+    """Seconds a poller should wait: until ``eta``, within the configured bounds."""
+    if eta is None:
+        return settings.eta_retry_default_seconds
+    seconds = math.ceil((_utc(eta) - utcnow()).total_seconds())
+    return min(max(seconds, settings.eta_retry_min_seconds), settings.eta_retry_max_seconds)
+
+
+# Singleton
+latency = LatencySketches(settings.eta_min_samples, settings.eta_seed_rows)
@@ -0,0 +1,96 @@
+"""
+ReklamAI v2.0 — Generation Lifecycle
+Status transitions shared by the generate route, the webhook, the Inngest
+pipeline and the reconciler. Every transition goes through `set_status` so
+the per-user counters (app/counters.py) change in the same transaction.
+Callers own the session and commit.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.clock import utcnow
+from app.counters import bump_counter
+from app.latency import latency
+from app.models import Generation, CreditAccount, CreditTransaction
+from app.result_cache import remember
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+async def record_created(db: AsyncSession, gen: Generation) -> None:
+    """Count a newly added generation under its initial status."""
+    await bump_counter(db, gen.user_id, gen.status, 1)
+
+
+async def record_created_batch(db: AsyncSession, gens: list[Generation]) -> None:
+    """Count many new generations with one counter update per (user, status)."""
+    groups: dict[tuple[str, str], int] = {}
+    for gen in gens:
+        key = (gen.user_id, gen.status)
+        groups[key] = groups.get(key, 0) + 1
+    for (user_id, status), count in groups.items():
+        await bump_counter(db, user_id, status, count)
+
+
+async def set_status(db: AsyncSession, gen: Generation, status: str) -> None:
+    """Move ``gen`` to ``status`` and update the owner's counters."""
+    if gen.status == status:
+        return
+    await bump_counter(db, gen.user_id, gen.status, -1)
+    await bump_counter(db, gen.user_id, status, 1)
+    gen.status = status
+
+
+async def refund_reservation(db: AsyncSession, gen: Generation) -> None:
+    """Return the generation's reserved credits to its owner and log the refund."""
+    result = await db.execute(
+        select(CreditAccount).where(CreditAccount.owner_id == gen.user_id)
+    )
+    account = result.scalar_one_or_none()
+    if account and gen.credits_reserved > 0:
+        account.balance += gen.credits_reserved
+        account.total_spent -= gen.credits_reserved
+
+        db.add(CreditTransaction(
+            account_id=account.id,
+            amount=gen.credits_reserved,
+            type="refund",
+            generation_id=gen.id,
+        ))
+    gen.credits_final = 0
+
+
+async def mark_succeeded(
+    db: AsyncSession,
+    gen: Generation,
+    result_url: str = "",
+    result_urls: list | None = None,
+    thumbnail_url: str = "",
+    provider_response: dict | None = None,
+) -> None:
+    await set_status(db, gen, "succeeded")
+    gen.completed_at = utcnow()
+    gen.result_url = result_url or ""
+    gen.result_urls = result_urls or ([result_url] if result_url else [])
+    if thumbnail_url:
+        gen.thumbnail_url = thumbnail_url
+    if provider_response is not None:
+        gen.provider_response = provider_response
+    gen.credits_final = gen.credits_reserved  # finalize cost
+    await remember(db, gen)
+    latency.observe(gen)
+
+
+async def mark_failed(
+    db: AsyncSession,
+    gen: Generation,
+    error: str,
+    provider_response: dict | None = None,
+) -> None:
+    """Fail the generation and refund its reservation."""
+    await set_status(db, gen, "failed")
+    gen.completed_at = utcnow()
+    gen.error_message = error or "Unknown error"
+    if provider_response is not None:
+        gen.provider_response = provider_response
+    await refund_reservation(db, gen)
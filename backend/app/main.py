@@ -5,6 +5,7 @@ FastAPI server entry point. Registers all routers and startup events.
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import get_settings
 from app.database import engine, Base
@@ -13,7 +14,15 @@ from app.routes.generate import router as generate_router
 from app.routes.webhook import router as webhook_router
 from app.routes.boards import router as boards_router
 from app.routes.files import router as files_router
-from app.inngest_client import inngest_client, process_generation_fn
+from app.routes.admin import router as admin_router
+from app.inngest_client import (
+    inngest_client, process_generation_fn, reconcile_generations_fn, repair_generation_counters_fn,
+    purge_idempotency_keys_fn, prune_result_cache_fn,
+)
+from app.metrics import metrics
+from app.catalog import catalog
+from app.pubsub import pubsub
+from app.webhook_inbox import webhook_inbox
 import inngest.fast_api
 
 settings = get_settings()
@@ -33,8 +42,17 @@ async def lifespan(app: FastAPI):
     async with async_session() as db:
         await seed_database(db)
 
+    # Load the model / preset catalog and follow changes from other workers
+    await catalog.reload()
+    await pubsub.start(engine)
+
+    # Apply accepted KIE callbacks (including any left from before a restart)
+    webhook_inbox.start(async_session)
+
     yield
     # Shutdown
+    await webhook_inbox.stop()
+    await pubsub.stop()
     await engine.dispose()
     print("🛑  DB connection closed")
 
@@ -62,9 +80,20 @@ app.include_router(generate_router)
 app.include_router(webhook_router)
 app.include_router(boards_router)
 app.include_router(files_router)
+app.include_router(admin_router)
 
 # ── Inngest ──
-inngest.fast_api.serve(app, inngest_client, [process_generation_fn])
+inngest.fast_api.serve(
+    app,
+    inngest_client,
+    [
+        process_generation_fn,
+        reconcile_generations_fn,
+        repair_generation_counters_fn,
+        purge_idempotency_keys_fn,
+        prune_result_cache_fn,
+    ],
+)
 
 
 # ── Root ──
@@ -81,6 +110,12 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """In-process metrics of this worker (Prometheus text format)."""
+    return metrics.render()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
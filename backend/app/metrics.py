@@ -0,0 +1,79 @@
+"""
+ReklamAI v2.0 — In-Process Metrics
+Minimal counters, gauges and summaries exposed at GET /metrics (Prometheus text format).
+Values are per worker process; scrape every worker or aggregate downstream.
+"""
+import threading
+from collections import defaultdict
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and count/sum/max summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = defaultdict(float)
+        self._gauges: dict[tuple, float] = {}
+        # { key: [count, sum, max] }
+        self._summaries: dict[tuple, list[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            s = self._summaries.setdefault(_key(name, labels), [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += value
+            s[2] = max(s[2], value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(_key(name, labels), 0.0)
+
+    def gauge(self, name: str, **labels) -> float | None:
+        return self._gauges.get(_key(name, labels))
+
+    def summary(self, name: str, **labels) -> dict:
+        count, total, peak = self._summaries.get(_key(name, labels), [0, 0.0, 0.0])
+        return {"count": count, "sum": total, "max": peak}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{name}_total{_fmt_labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+            for (name, labels), (count, total, peak) in sorted(self._summaries.items()):
+                lbl = _fmt_labels(labels)
+                lines.append(f"{name}_count{lbl} {count:g}")
+                lines.append(f"{name}_sum{lbl} {total:g}")
+                lines.append(f"{name}_max{lbl} {peak:g}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton
+metrics = Metrics()
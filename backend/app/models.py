@@ -3,17 +3,17 @@ ReklamAI v2.0 — Database Models (SQLAlchemy ORM)
 Works with both PostgreSQL and SQLite.
 """
 import uuid
-from datetime import datetime, timezone
 from sqlalchemy import (
     Column, String, Integer, Float, Boolean, DateTime, Text,
-    ForeignKey, JSON
+    ForeignKey, JSON, Index, LargeBinary, DDL, event
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
+from app import clock
 from app.database import Base
 
 
 def _utcnow():
-    return datetime.now(timezone.utc)
+    return clock.utcnow()
 
 
 # Use String(36) for UUIDs — works on both SQLite and PostgreSQL
@@ -145,6 +145,14 @@ class Board(Base):
 # ═══════════════════════════════════════════════════════════════
 class Generation(Base):
     __tablename__ = "generations"
+    __table_args__ = (
+        # Scheduler: oldest waiting jobs of a lane
+        Index("ix_generations_lane_status_created", "lane", "status", "created_at"),
+        # Reconciler: stale non-terminal generations
+        Index("ix_generations_status_created", "status", "created_at"),
+        # Bulk status: what changed since the client's last poll
+        Index("ix_generations_user_updated", "user_id", "updated_at"),
+    )
 
     id = Column(GUID, primary_key=True, default=gen_uuid)
     user_id = Column(GUID, ForeignKey("users.id"), nullable=False, index=True)
@@ -159,7 +167,11 @@ class Generation(Base):
     duration = Column(Integer, default=10)
     input_image_url = Column(Text, default="")
     reference_image_url = Column(Text, default="")
-    params = Column(JSON, default=dict)  # extra params (seed, strength, etc.)
+    # Large and never returned by the API: deferred, read with undefer() when needed
+    params = deferred(Column(JSON, default=dict))  # extra params (seed, strength, etc.)
+
+    # Scheduling
+    lane = Column(String(30), default="default")  # capacity lane (see app/lanes.py)
 
     # Status
     status = Column(String(30), default="queued", index=True)
@@ -172,9 +184,15 @@ class Generation(Base):
     thumbnail_url = Column(Text, default="")
     error_message = Column(Text, default="")
 
+    # Similar-prompt index (see app/similarity.py): MinHash of the prompt
+    prompt_signature = deferred(Column(LargeBinary, nullable=True))
+
+    # Result cache (see app/result_cache.py): key of a deterministic request, else ""
+    cache_key = Column(String(64), default="")
+
     # Provider
     provider_task_id = Column(String(200), default="", index=True)
-    provider_response = Column(JSON, default=dict)
+    provider_response = deferred(Column(JSON, default=dict))  # raw webhook / poll body
 
     # Cost
     credits_reserved = Column(Float, default=0.0)
@@ -184,7 +202,111 @@ class Generation(Base):
     created_at = Column(DateTime, default=_utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
 
     # Relations
     user = relationship("User", back_populates="generations")
     model = relationship("AIModel", back_populates="generations")
+
+
+# ═══════════════════════════════════════════════════════════════
+# GENERATION COUNTERS (per user and status, see app/counters.py)
+# ═══════════════════════════════════════════════════════════════
+class GenerationCounter(Base):
+    __tablename__ = "generation_counters"
+
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    status = Column(String(30), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# History pages: a user's newest generations, optionally of one status
+Index("ix_generations_user_created", Generation.user_id, Generation.created_at.desc(), Generation.id.desc())
+Index(
+    "ix_generations_user_status_created",
+    Generation.user_id, Generation.status, Generation.created_at.desc(), Generation.id.desc(),
+)
+# History search: filter by model
+Index(
+    "ix_generations_user_model_created",
+    Generation.user_id, Generation.model_slug, Generation.created_at.desc(), Generation.id.desc(),
+)
+# Completion estimates (app/latency.py): a model's latest successes
+Index(
+    "ix_generations_model_status_completed",
+    Generation.model_slug, Generation.status, Generation.completed_at.desc(),
+)
+
+# Full-text index over prompts (see app/search.py), outside the ORM columns:
+#   PostgreSQL — generated tsvector column + GIN index
+#   SQLite     — external-content FTS5 table kept in sync by triggers
+PG_PROMPT_TSV_DDL = (
+    "ALTER TABLE generations ADD COLUMN IF NOT EXISTS prompt_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(prompt, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_generations_prompt_tsv ON generations USING gin (prompt_tsv)",
+)
+SQLITE_PROMPT_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(prompt, content='generations')",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_ai AFTER INSERT ON generations BEGIN "
+    "INSERT INTO generations_fts(rowid, prompt) VALUES (new.rowid, new.prompt); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_ad AFTER DELETE ON generations BEGIN "
+    "INSERT INTO generations_fts(generations_fts, rowid, prompt) VALUES ('delete', old.rowid, old.prompt); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_au AFTER UPDATE OF prompt ON generations BEGIN "
+    "INSERT INTO generations_fts(generations_fts, rowid, prompt) VALUES ('delete', old.rowid, old.prompt); "
+    "INSERT INTO generations_fts(rowid, prompt) VALUES (new.rowid, new.prompt); END",
+)
+for _ddl in PG_PROMPT_TSV_DDL:
+    event.listen(Generation.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+for _ddl in SQLITE_PROMPT_FTS_DDL:
+    event.listen(Generation.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    Generation.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS generations_fts").execute_if(dialect="sqlite"),
+)
+
+
+# ═══════════════════════════════════════════════════════════════
+# IDEMPOTENCY KEYS (POST /api/generate retries, see app/idempotency.py)
+# ═══════════════════════════════════════════════════════════════
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the canonical request
+    generation_id = Column(GUID, nullable=False)  # written in the same transaction as the generation
+    created_at = Column(DateTime, default=_utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # purge cron
+
+
+# ═══════════════════════════════════════════════════════════════
+# RESULT CACHE (identical deterministic requests, see app/result_cache.py)
+# ═══════════════════════════════════════════════════════════════
+class ResultCacheEntry(Base):
+    __tablename__ = "result_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of the canonical KIE payload
+    model_slug = Column(String(100), default="")
+    result_url = Column(Text, default="")
+    result_urls = Column(JSON, default=list)
+    thumbnail_url = Column(Text, default="")
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=_utcnow)
+    last_hit_at = Column(DateTime, default=_utcnow, index=True)  # LRU eviction
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# ═══════════════════════════════════════════════════════════════
+# WEBHOOK INBOX (accepted KIE callbacks awaiting apply, see app/webhook_inbox.py)
+# ═══════════════════════════════════════════════════════════════
+class WebhookInboxItem(Base):
+    __tablename__ = "webhook_inbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # arrival order
+    task_id = Column(String(200), nullable=False, index=True)
+    status = Column(String(30), default="")
+    body = Column(JSON, default=dict)
+    received_at = Column(DateTime, default=_utcnow)
+    # Callbacks that arrive before their generation has a task id wait and are retried
+    attempts = Column(Integer, nullable=False, default=0)
+    retry_at = Column(DateTime, nullable=True)
@@ -0,0 +1,200 @@
+"""
+ReklamAI v2.0 — Change Notifications
+Process-local publish/subscribe, bridged across workers with PostgreSQL
+LISTEN/NOTIFY. Subscribers of this worker are called directly on publish;
+other workers receive the message through their LISTEN connection.
+
+Each worker holds two connections: one sending NOTIFYs (reopened on the next
+publish after a failure) and one holding LISTEN, which a supervisor task
+health-checks and reconnects with backoff. Messages sent while a worker was
+not listening are lost, so after any gap the `on_gap` callbacks run, letting
+caches that rely on these messages drop what they hold.
+
+On SQLite (dev / tests) there is a single process, so local delivery is all
+there is.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+# Tags our own NOTIFYs so the listener can skip messages it already delivered
+WORKER_ID = uuid.uuid4().hex
+
+
+async def _call(callback: Callable[..., Any], *args: Any) -> None:
+    result = callback(*args)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+class PubSub:
+    def __init__(self):
+        self._subscribers: dict[str, list[Callable[[Any], Any]]] = {}
+        self._gap_callbacks: list[Callable[[], Any]] = []
+        self._engine: AsyncEngine | None = None
+        self._conn = None  # SQLAlchemy AsyncConnection holding LISTEN
+        self._listening: set[str] = set()
+        self._lost: asyncio.Event | None = None
+        self._supervisor: asyncio.Task | None = None
+        self._publisher = None  # SQLAlchemy AsyncConnection sending NOTIFY
+        self._publish_lock: asyncio.Lock | None = None
+
+    def subscribe(self, channel: str, callback: Callable[[Any], Any]) -> None:
+        """Call ``callback(data)`` for every message on ``channel`` (sync or async)."""
+        self._subscribers.setdefault(channel, []).append(callback)
+        if self._conn is not None and channel not in self._listening:
+            asyncio.ensure_future(self._listen(channel))
+
+    def unsubscribe(self, channel: str, callback: Callable[[Any], Any]) -> None:
+        callbacks = self._subscribers.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def on_gap(self, callback: Callable[[], Any]) -> None:
+        """Call ``callback()`` whenever messages from other workers may have been missed."""
+        self._gap_callbacks.append(callback)
+
+    async def publish(self, channel: str, data: Any = None) -> None:
+        """Deliver ``data`` to local subscribers and NOTIFY other workers."""
+        await self._deliver(channel, data)
+        if self._engine is not None and self._engine.dialect.name == "postgresql":
+            message = json.dumps({"origin": WORKER_ID, "data": data}, default=str)
+            async with self._publish_lock:
+                try:
+                    driver = await self._publisher_driver()
+                    # Outside a transaction: asyncpg autocommits, one round trip
+                    await driver.execute("SELECT pg_notify($1, $2)", channel, message)
+                except Exception as e:
+                    logger.error(f"[PUBSUB] NOTIFY {channel} failed: {e}")
+                    await self._close_publisher()
+
+    async def _deliver(self, channel: str, data: Any) -> None:
+        for callback in list(self._subscribers.get(channel, [])):
+            try:
+                await _call(callback, data)
+            except Exception as e:
+                logger.error(f"[PUBSUB] Subscriber of {channel} failed: {e}")
+
+    async def _gap(self) -> None:
+        for callback in list(self._gap_callbacks):
+            try:
+                await _call(callback)
+            except Exception as e:
+                logger.error(f"[PUBSUB] Gap callback failed: {e}")
+
+    # ── Publisher connection ──
+    async def _publisher_driver(self):
+        if self._publisher is None:
+            self._publisher = await self._engine.connect()
+        raw = await self._publisher.get_raw_connection()
+        return raw.driver_connection
+
+    async def _close_publisher(self) -> None:
+        conn, self._publisher = self._publisher, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception:
+                pass  # already broken; the pool discards it
+
+    # ── Cross-worker bridge ──
+    async def start(self, engine: AsyncEngine) -> None:
+        """Remember the engine and, on PostgreSQL, LISTEN on every subscribed channel."""
+        self._engine = engine
+        if engine.dialect.name != "postgresql":
+            return
+        self._publish_lock = asyncio.Lock()
+        await self._connect()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _connect(self) -> None:
+        self._lost = asyncio.Event()
+        self._conn = await self._engine.connect()
+        raw = await self._conn.get_raw_connection()
+        raw.driver_connection.add_termination_listener(lambda _connection: self._lost.set())
+        for channel in list(self._subscribers):
+            await self._listen(channel)
+
+    async def _listen(self, channel: str) -> None:
+        raw = await self._conn.get_raw_connection()
+        await raw.driver_connection.add_listener(channel, self._on_notify)
+        self._listening.add(channel)
+
+    async def _close_listener(self) -> None:
+        conn, self._conn = self._conn, None
+        self._listening.clear()
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    async def _alive(self) -> bool:
+        try:
+            raw = await self._conn.get_raw_connection()
+            await asyncio.wait_for(
+                raw.driver_connection.execute("SELECT 1"), settings.pubsub_health_check_seconds,
+            )
+            return True
+        except Exception:
+            return False
+
+    async def _supervise(self) -> None:
+        """Keep the LISTEN connection up; reconnect with backoff after it drops."""
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), settings.pubsub_health_check_seconds)
+            except asyncio.TimeoutError:
+                if await self._alive():
+                    continue
+            logger.warning("[PUBSUB] LISTEN connection lost, reconnecting")
+            await self._close_listener()
+            await self._gap()
+
+            delay = settings.pubsub_reconnect_min_seconds
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                    break
+                except Exception as e:
+                    logger.error(f"[PUBSUB] LISTEN reconnect failed: {e}")
+                    await self._close_listener()
+                    delay = min(delay * 2, settings.pubsub_reconnect_max_seconds)
+            # Caches refilled while we were deaf may already be stale again
+            await self._gap()
+            logger.info("[PUBSUB] LISTEN connection restored")
+
+    def _on_notify(self, _connection, _pid, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == WORKER_ID:
+            return
+        asyncio.ensure_future(self._deliver(channel, message.get("data")))
+
+    async def stop(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+        self._supervisor = None
+        await self._close_listener()
+        await self._close_publisher()
+        self._engine = None
+
+
+# Singleton
+pubsub = PubSub()
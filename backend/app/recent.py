@@ -0,0 +1,132 @@
+"""
+ReklamAI v2.0 — Recent Generations
+Per-worker write-through cache of each user's newest generations, so page
+one of the history list (no status filter, cursor or offset) is served
+without touching the database.
+
+A user's ring is filled from the list query on the first read, then kept
+current by `publish_generation` (app/events.py), which every writer — the
+generate route, webhook, Inngest pipeline and reconciler — calls after
+committing. The status event that follows reaches every worker through
+app/pubsub.py; a worker whose ring does not already hold exactly that state
+(the write happened elsewhere) drops the user's ring and reloads it on the
+next read.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timezone
+
+from app.config import get_settings
+from app.metrics import metrics
+from app.models import Generation
+from app.schemas import GenerationResponse, GenerationStatus
+
+settings = get_settings()
+
+# Fields carried by a status event, compared against the ring to spot foreign writes
+EVENT_FIELDS = tuple(f for f in GenerationStatus.model_fields if f != "id")
+
+
+def _order(item: GenerationResponse) -> tuple:
+    # Fresh objects carry aware UTC timestamps, rows read back may be naive UTC
+    created_at = item.created_at
+    if created_at.tzinfo:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at, item.id
+
+
+@dataclass
+class _Ring:
+    items: list[GenerationResponse]  # newest first, at most size + 1 (the extra row tells has_more)
+    total: int
+
+
+class RecentGenerations:
+    """Bounded newest-first `GenerationResponse` lists per user, LRU over users."""
+
+    def __init__(self, size: int, max_users: int):
+        self.size = size
+        self.max_users = max_users
+        # Bumped on every write or event, ring or not; each user keeps the stamp of its
+        # latest change (LRU, evicted stamps fold into the floor). A fill read before
+        # its user's latest change may be missing that row and is discarded.
+        self.version = 0
+        self._changed: OrderedDict[str, int] = OrderedDict()
+        self._changed_floor = 0
+        self._users: OrderedDict[str, _Ring] = OrderedDict()
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._changed.clear()
+        self.version += 1
+        self._changed_floor = self.version
+
+    def _touch(self, user_id: str) -> None:
+        self.version += 1
+        self._changed[user_id] = self.version
+        self._changed.move_to_end(user_id)
+        while len(self._changed) > self.max_users:
+            _, stamp = self._changed.popitem(last=False)
+            self._changed_floor = stamp
+
+    def invalidate(self, user_id: str) -> None:
+        self._touch(user_id)
+        if self._users.pop(user_id, None) is not None:
+            metrics.set_gauge("recent_generations_users", len(self._users))
+
+    def page(self, user_id: str, limit: int) -> tuple[list[GenerationResponse], int, bool] | None:
+        """``(items, total, has_more)`` of the first page, or None when not cached."""
+        ring = self._users.get(user_id)
+        if ring is None or limit > self.size:
+            metrics.inc("recent_generations_total", result="miss")
+            return None
+        self._users.move_to_end(user_id)
+        metrics.inc("recent_generations_total", result="hit")
+        return ring.items[:limit], ring.total, len(ring.items) > limit
+
+    def fill(self, user_id: str, rows: list, total: int, version: int) -> None:
+        """Store the newest ``size + 1`` ``rows`` read while ``self.version`` was ``version``."""
+        if self._changed.get(user_id, self._changed_floor) > version:
+            return
+        items = [GenerationResponse.model_validate(row) for row in rows[:self.size + 1]]
+        self._users[user_id] = _Ring(items=items, total=total)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        metrics.set_gauge("recent_generations_users", len(self._users))
+
+    def write(self, gen: Generation) -> None:
+        """Apply the committed state of ``gen`` (insert or status transition)."""
+        self._touch(gen.user_id)
+        ring = self._users.get(gen.user_id)
+        if ring is None:
+            return
+        item = GenerationResponse.model_validate(gen)
+        for i, cached in enumerate(ring.items):
+            if cached.id == item.id:
+                ring.items[i] = item
+                return
+
+        # Not in the ring: new if it sorts inside the window (the ring holds all of it)
+        full = len(ring.items) > self.size
+        if full and _order(item) < _order(ring.items[-1]):
+            return
+        ring.items.append(item)
+        ring.items.sort(key=_order, reverse=True)
+        del ring.items[self.size + 1:]
+        ring.total += 1
+
+    def on_event(self, event: dict) -> None:
+        user_id = event.get("user_id")
+        ring = self._users.get(user_id)
+        if ring is None:
+            self._touch(user_id)
+            return
+        cached = next((item for item in ring.items if item.id == event.get("id")), None)
+        if cached and all(getattr(cached, f) == event.get(f) for f in EVENT_FIELDS):
+            return  # written through on this worker already
+        self.invalidate(user_id)
+
+
+# Singleton
+recent_generations = RecentGenerations(settings.recent_generations_size, settings.recent_generations_max_users)
@@ -0,0 +1,157 @@
+"""
+ReklamAI v2.0 — Stuck-Generation Reconciler
+Finds generations left `queued` / `processing` after their Inngest run died,
+their webhook was lost or the poll loop timed out, and settles them:
+
+- never dispatched (no provider_task_id, no live admission) past the queue deadline → expired + refund
+- dispatched → re-checked with KIE in bulk, then finalized or refunded
+- still running at KIE past the max age since dispatch (started_at) → failed + refund
+
+Stale rows are scanned in keyset batches over (status, created_at) and each
+batch is applied in its own short transaction.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.clock import utcnow
+from app.config import get_settings
+from app.events import publish_generation
+from app.inngest_client import compact_task_status
+from app.lifecycle import mark_succeeded, mark_failed
+from app.models import Generation
+from app.scheduler import ACTIVE_STATUSES
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _stale_batch(
+    db: AsyncSession,
+    cutoff: datetime,
+    after: tuple[datetime, str] | None,
+    limit: int,
+) -> list:
+    query = (
+        select(
+            Generation.id,
+            Generation.provider_task_id,
+            Generation.created_at,
+            Generation.started_at,
+        )
+        .where(
+            Generation.status.in_(ACTIVE_STATUSES),
+            Generation.created_at < cutoff,
+        )
+        .order_by(Generation.created_at, Generation.id)
+        .limit(limit)
+    )
+    if after:
+        created_at, gen_id = after
+        query = query.where(or_(
+            Generation.created_at > created_at,
+            and_(Generation.created_at == created_at, Generation.id > gen_id),
+        ))
+    return (await db.execute(query)).all()
+
+
+def _decide(row, provider_status: dict | None, now: datetime) -> tuple[str, dict] | None:
+    """Return (action, data) for one stale row, or None to leave it alone."""
+    if not row.provider_task_id:
+        # An admitted job may still be inside createTask; only a lapsed lease means its run died
+        lease = timedelta(minutes=settings.admission_lease_minutes)
+        if row.started_at is not None and now - _as_utc(row.started_at) < lease:
+            return None
+        if now - _as_utc(row.created_at) >= timedelta(minutes=settings.reconcile_queue_deadline_minutes):
+            return "fail", {"error": "Expired: generation was never started"}
+        return None
+
+    if provider_status and provider_status["state"] == "succeeded":
+        return "succeed", provider_status
+    if provider_status and provider_status["state"] == "failed":
+        return "fail", {"error": provider_status.get("error") or "Provider reported failure"}
+    # Time spent waiting for admission does not count against the provider
+    dispatched_at = _as_utc(row.started_at or row.created_at)
+    if now - dispatched_at >= timedelta(minutes=settings.reconcile_max_age_minutes):
+        return "fail", {"error": "Timed out waiting for provider result"}
+    return None
+
+
+async def _apply(db: AsyncSession, decisions: dict[str, tuple[str, dict]]) -> dict:
+    """Apply decisions for one batch in a single transaction."""
+    stats = {"succeeded": 0, "failed": 0}
+    settled = []
+    result = await db.execute(
+        select(Generation)
+        .where(Generation.id.in_(decisions.keys()))
+        .with_for_update()
+    )
+    for gen in result.scalars().all():
+        if gen.status not in ACTIVE_STATUSES:
+            continue  # settled by the webhook / pipeline since the scan
+        action, data = decisions[gen.id]
+        if action == "succeed":
+            await mark_succeeded(
+                db, gen,
+                result_url=data.get("result_url") or "",
+                result_urls=data.get("result_urls") or [],
+                provider_response={**data, "source": "reconciler"},
+            )
+            stats["succeeded"] += 1
+        else:
+            await mark_failed(db, gen, data["error"], provider_response={**data, "source": "reconciler"})
+            stats["failed"] += 1
+        settled.append(gen)
+    await db.commit()
+    await publish_generation(*settled)
+    return stats
+
+
+async def reconcile_stale_generations(
+    session_factory: async_sessionmaker,
+    kie=None,
+    now: datetime | None = None,
+) -> dict:
+    """Scan all stale non-terminal generations once and settle what can be settled."""
+    if kie is None:
+        from app.kie_client import kie_client as kie
+    now = now or utcnow()
+    cutoff = now - timedelta(minutes=settings.reconcile_stale_minutes)
+    stats = {"scanned": 0, "succeeded": 0, "failed": 0}
+
+    after = None
+    while True:
+        async with session_factory() as db:
+            rows = await _stale_batch(db, cutoff, after, settings.reconcile_batch_size)
+        if not rows:
+            break
+        after = (rows[-1].created_at, rows[-1].id)
+        stats["scanned"] += len(rows)
+
+        task_ids = [r.provider_task_id for r in rows if r.provider_task_id]
+        statuses = await kie.get_task_statuses(task_ids) if task_ids else {}
+
+        decisions = {}
+        for row in rows:
+            raw = statuses.get(row.provider_task_id)
+            decision = _decide(row, compact_task_status(raw) if raw else None, now)
+            if decision:
+                decisions[row.id] = decision
+
+        if decisions:
+            async with session_factory() as db:
+                applied = await _apply(db, decisions)
+            stats["succeeded"] += applied["succeeded"]
+            stats["failed"] += applied["failed"]
+
+        if len(rows) < settings.reconcile_batch_size:
+            break
+
+    logger.info(f"[RECONCILER] {stats}")
+    return stats
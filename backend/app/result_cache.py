@@ -0,0 +1,116 @@
+"""
+ReklamAI v2.0 — Result Cache
+Presets and templates make many users submit byte-identical requests. When a
+request is deterministic (explicit seed) and its model opts in, the built KIE
+payload is hashed; a fresh cached result for that hash completes the new
+generation at once, without a provider task.
+
+Per-model rule, in AIModel.config:
+
+    "result_cache": true
+    "result_cache": {"ttl_hours": 24}
+
+Entries are written when a keyed generation succeeds (`mark_succeeded`).
+`prune_result_cache` drops expired entries and evicts the least recently
+hit ones above `result_cache_max_entries`.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import clock
+from app.catalog import catalog
+from app.config import get_settings
+from app.database import dialect_insert
+from app.metrics import metrics
+from app.models import Generation, ResultCacheEntry
+from app.schemas import GenerateRequest
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+
+def cache_rule(ai_model) -> dict | None:
+    """The model's result-cache rule, or None when it does not opt in."""
+    rule = ((ai_model and ai_model.config) or {}).get("result_cache")
+    if not rule:
+        return None
+    return rule if isinstance(rule, dict) else {}
+
+
+def result_cache_key(req: GenerateRequest, ai_model, kie_payload: dict) -> str | None:
+    """sha256 of the canonical payload for a cacheable request, else None."""
+    if cache_rule(ai_model) is None or (req.params or {}).get("seed") is None:
+        return None
+    canonical = json.dumps(kie_payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def lookup(db: AsyncSession, key: str) -> ResultCacheEntry | None:
+    """Fresh entry for ``key`` (hit stats updated in the caller's transaction)."""
+    now = clock.utcnow()
+    entry = (await db.execute(
+        select(ResultCacheEntry).where(ResultCacheEntry.key == key, ResultCacheEntry.expires_at > now)
+    )).scalar_one_or_none()
+    if entry:
+        entry.hits += 1
+        entry.last_hit_at = now
+    metrics.inc("result_cache_lookups", outcome="hit" if entry else "miss")
+    return entry
+
+
+async def remember(db: AsyncSession, gen: Generation) -> None:
+    """Store the result of a succeeded keyed generation (rule re-read: the model may have opted out)."""
+    if not gen.cache_key or not gen.result_url:
+        return
+    rule = cache_rule(await catalog.model(gen.model_slug))
+    if rule is None:
+        return
+    now = clock.utcnow()
+    values = {
+        "model_slug": gen.model_slug,
+        "result_url": gen.result_url,
+        "result_urls": gen.result_urls or [gen.result_url],
+        "thumbnail_url": gen.thumbnail_url or "",
+        "created_at": now,
+        "last_hit_at": now,
+        "expires_at": now + timedelta(hours=rule.get("ttl_hours", settings.result_cache_ttl_hours)),
+    }
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(ResultCacheEntry)
+        .values(key=gen.cache_key, hits=0, **values)
+        .on_conflict_do_update(index_elements=["key"], set_=values)
+    )
+
+
+async def prune_result_cache(session_factory: async_sessionmaker) -> dict:
+    """Delete expired entries, then the least recently hit above the size bound."""
+    async with session_factory() as db:
+        expired = (await db.execute(
+            delete(ResultCacheEntry).where(ResultCacheEntry.expires_at <= clock.utcnow())
+        )).rowcount or 0
+
+        evicted = 0
+        entries = (await db.execute(select(func.count()).select_from(ResultCacheEntry))).scalar_one()
+        excess = entries - settings.result_cache_max_entries
+        if excess > 0:
+            oldest = (
+                select(ResultCacheEntry.key)
+                .order_by(ResultCacheEntry.last_hit_at)
+                .limit(excess)
+                .scalar_subquery()
+            )
+            evicted = (await db.execute(
+                delete(ResultCacheEntry).where(ResultCacheEntry.key.in_(oldest))
+            )).rowcount or 0
+        await db.commit()
+
+    stats = {"expired": expired, "evicted": evicted}
+    metrics.set_gauge("result_cache_entries", entries - evicted)
+    logger.info(f"[RESULT_CACHE] Pruned: {stats}")
+    return stats
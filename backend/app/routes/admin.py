@@ -0,0 +1,24 @@
+"""
+ReklamAI v2.0 — Admin Routes
+Operational endpoints for administrators.
+"""
+from fastapi import APIRouter, Depends
+
+from app.models import User
+from app.schemas import CatalogReloadResponse
+from app.auth import require_admin
+from app.catalog import catalog, catalog_changed
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.post("/catalog/reload", response_model=CatalogReloadResponse)
+async def reload_catalog(_admin: User = Depends(require_admin)):
+    """Перечитать модели и пресеты на всех воркерах."""
+    await catalog_changed()
+    snapshot = await catalog.current()
+    return CatalogReloadResponse(
+        version=snapshot.version,
+        models=len(snapshot.models),
+        presets=len(snapshot.presets),
+    )
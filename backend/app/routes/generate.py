@@ -2,33 +2,75 @@
 ReklamAI v2.0 — Generation Routes
 Create, list, and check status of AI generations.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, update, desc, and_, or_
+from sqlalchemy.orm import load_only
 
-from app.database import get_db
-from app.models import User, Generation, CreditAccount, CreditTransaction, AIModel, Preset
+from app import clock
+from app.config import get_settings
+from app.database import get_db, async_session, engine
+from app.events import publish_generation, status_event, stream_events
+from app.http_cache import BodyCache, PrecomputedBody, precomputed_response
+from app.serialization import JsonView
+from app.models import Generation, CreditAccount, CreditTransaction, gen_uuid
 from app.schemas import (
-    GenerateRequest, GenerationResponse, GenerationListResponse,
+    GenerateRequest, GenerateBatchRequest, GenerationBatchResponse,
+    GenerationResponse, GenerationListResponse,
+    GenerationStatus, GenerationStatusRequest, GenerationStatusListResponse,
+    SimilarGeneration, SimilarGenerationsResponse, GenerationSearchResponse,
     CreditBalanceResponse, AIModelResponse, PresetResponse,
 )
-from app.auth import get_current_user
+from app.auth import active_users, get_current_user_id, security, user_from_token, user_id_from_token
+from app.catalog import catalog
 from app.rate_limit import rate_limit_generate
+from app.scheduler import ACTIVE_STATUSES, queue_position
+from app.counters import count_generations
+from app.recent import recent_generations
+from app.latency import latency, retry_after
+from app.lifecycle import TERMINAL_STATUSES, mark_succeeded, record_created, record_created_batch
+from app.result_cache import lookup, result_cache_key
+from app.similarity import signature_bytes, similarity_index
+from app.export import FORMATS as EXPORT_FORMATS, export_body, export_query
+from app.search import SearchFilters, facet_counts, search_conditions
+from app.idempotency import MAX_KEY_LENGTH, claim_key, find_key, request_fingerprint
+from app.lanes import lane_for_model
 from app.inngest_client import inngest_client
 import inngest
 
+settings = get_settings()
 router = APIRouter(prefix="/api", tags=["generation"])
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+def schema_columns(schema, *extra) -> tuple:
+    """Generation columns behind the fields of ``schema`` (plus ``extra``), for slim reads."""
+    names = [f for f in schema.model_fields if f in Generation.__table__.c]
+    return tuple(getattr(Generation, n) for n in names) + extra
+
+
+# Read paths load only what the response needs; heavy JSON stays in the table
+RESPONSE_COLUMNS = schema_columns(GenerationResponse)
+STATUS_COLUMNS = schema_columns(GenerationStatus)
+generation_list_json = JsonView(GenerationListResponse)
+generation_search_json = JsonView(GenerationSearchResponse)
 
 
 # ── Credits ──
 @router.get("/credits", response_model=CreditBalanceResponse)
 async def get_credits(
-    user: User = Depends(get_current_user),
+    user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """Получить баланс кредитов."""
     result = await db.execute(
-        select(CreditAccount).where(CreditAccount.owner_id == user.id)
+        select(CreditAccount).where(CreditAccount.owner_id == user_id)
     )
     account = result.scalar_one_or_none()
     if not account:
@@ -41,59 +83,16 @@ async def get_credits(
 
 
 # ── Generate ──
-@router.post("/generate", response_model=GenerationResponse, status_code=201)
-async def create_generation(
-    req: GenerateRequest,
-    user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-    _rl=Depends(rate_limit_generate),
-):
-    """Создать новую генерацию (фото/видео/голос/текст)."""
-
-    # 1. Estimate cost based on model's price_multiplier
-    estimated_cost = 1.0  # base cost
-    ai_model = None
-    if req.model_slug:
-        model_result = await db.execute(
-            select(AIModel).where(AIModel.slug == req.model_slug)
-        )
-        ai_model = model_result.scalar_one_or_none()
-        if ai_model:
-            estimated_cost = ai_model.price_multiplier
-        else:
-            # Model not found in DB — use fallback
-            estimated_cost = 5.0
-
-    # 2. Lock and check credits (SELECT ... FOR UPDATE prevents race conditions)
-    result = await db.execute(
-        select(CreditAccount)
-        .where(CreditAccount.owner_id == user.id)
-        .with_for_update()
-    )
-    account = result.scalar_one_or_none()
-    if not account:
-        raise HTTPException(status_code=402, detail="Кредитный аккаунт не найден")
-
-    if account.balance < estimated_cost:
-        raise HTTPException(
-            status_code=402,
-            detail=f"Недостаточно кредитов. Нужно: {estimated_cost}, Баланс: {account.balance}",
-        )
+def estimate_cost(req: GenerateRequest, ai_model) -> float:
+    """Cost of one generation based on the model's price_multiplier (callers reject unknown slugs)."""
+    if ai_model:
+        return ai_model.price_multiplier
+    return 1.0  # base cost, no model chosen
 
-    # 3. Reserve credits (row is locked, safe from concurrent writes)
-    account.balance -= estimated_cost
-    account.total_spent += estimated_cost
 
-    tx = CreditTransaction(
-        account_id=account.id,
-        amount=-estimated_cost,
-        type="reserve",
-    )
-    db.add(tx)
-
-    # 3. Create generation record
-    generation = Generation(
-        user_id=user.id,
+def new_generation(req: GenerateRequest, user_id: str, ai_model, cost: float, **extra) -> Generation:
+    return Generation(
+        user_id=user_id,
         prompt=req.prompt,
         negative_prompt=req.negative_prompt,
         preset_slug=req.preset_slug,
@@ -103,29 +102,19 @@ async def create_generation(
         input_image_url=req.input_image_url,
         reference_image_url=req.reference_image_url,
         params=req.params,
+        prompt_signature=signature_bytes(req.prompt),
+        lane=lane_for_model(ai_model),
         status="queued",
-        credits_reserved=estimated_cost,
+        credits_reserved=cost,
+        **extra,
     )
-    db.add(generation)
-    await db.flush()
 
-    # Link transaction to generation
-    tx.generation_id = generation.id
 
-    await db.commit()
-    await db.refresh(generation)
-
-    # 4. Build KIE payload using the model's provider_model_id
+def build_kie_payload(req: GenerateRequest, ai_model) -> dict:
+    """KIE createTask payload, using the model's provider_model_id when known."""
     kie_model_id = req.model_slug or "kling-v2"
-    if req.model_slug:
-        # Try to use the provider_model_id from the DB model
-        if not ai_model:
-            model_result2 = await db.execute(
-                select(AIModel).where(AIModel.slug == req.model_slug)
-            )
-            ai_model = model_result2.scalar_one_or_none()
-        if ai_model and ai_model.provider_model_id:
-            kie_model_id = ai_model.provider_model_id
+    if ai_model and ai_model.provider_model_id:
+        kie_model_id = ai_model.provider_model_id
 
     kie_payload = {
         "model": kie_model_id,
@@ -143,96 +132,578 @@ async def create_generation(
         kie_payload["input"]["image_url"] = req.input_image_url
     if req.reference_image_url:
         kie_payload["input"]["image_reference_url"] = req.reference_image_url
+    if req.params.get("seed") is not None:
+        kie_payload["input"]["seed"] = req.params["seed"]
+    return kie_payload
 
-    await inngest_client.send(inngest.Event(
+
+def generation_event(generation_id: str, kie_payload: dict) -> inngest.Event:
+    return inngest.Event(
         name="reklamai/generation.requested",
         data={
-            "generation_id": generation.id,
+            "generation_id": generation_id,
             "payload": kie_payload,
         },
+    )
+
+
+def event_sender() -> inngest.Inngest:
+    """Where generation events go (a dependency, so the simulator can pass its own executor)."""
+    return inngest_client
+
+
+async def reserve_credits(db: AsyncSession, user_id: str, cost: float) -> str:
+    """
+    Debit ``cost`` from the user's account in one conditional UPDATE ... RETURNING;
+    returns the account id. The row stays locked only from here to the commit.
+    """
+    result = await db.execute(
+        update(CreditAccount)
+        .where(CreditAccount.owner_id == user_id, CreditAccount.balance >= cost)
+        .values(
+            balance=CreditAccount.balance - cost,
+            total_spent=CreditAccount.total_spent + cost,
+        )
+        .returning(CreditAccount.id)
+        .execution_options(synchronize_session=False)
+    )
+    account_id = result.scalar_one_or_none()
+    if account_id is not None:
+        return account_id
+
+    # Nothing updated: tell a missing account from a short balance
+    balance = (await db.execute(
+        select(CreditAccount.balance).where(CreditAccount.owner_id == user_id)
+    )).scalar_one_or_none()
+    if balance is None:
+        raise HTTPException(status_code=402, detail="Кредитный аккаунт не найден")
+    raise HTTPException(
+        status_code=402,
+        detail=f"Недостаточно кредитов. Нужно: {cost}, Баланс: {balance}",
+    )
+
+
+async def generation_response(db: AsyncSession, user_id: str, generation_id: str) -> GenerationResponse | None:
+    """The user's generation as returned by the API (with queue position), or None."""
+    result = await db.execute(
+        select(Generation)
+        # queue_position() also needs the scheduling columns
+        .options(load_only(
+            *RESPONSE_COLUMNS, Generation.user_id, Generation.lane, Generation.started_at,
+        ))
+        .where(
+            Generation.id == generation_id,
+            Generation.user_id == user_id,
+        )
+    )
+    gen = result.scalar_one_or_none()
+    if not gen:
+        return None
+    resp = GenerationResponse.model_validate(gen)
+    resp.queue_position = await queue_position(db, gen)
+    if gen.status in ACTIVE_STATUSES:
+        resp.estimated_completion_at = await latency.estimate(db, gen)
+    return resp
+
+
+async def replay_generation(
+    db: AsyncSession, user_id: str, key: str, fingerprint: str,
+) -> GenerationResponse | None:
+    """Original response for a retried Idempotency-Key, or None if the key is unused."""
+    claim = await find_key(db, user_id, key)
+    if not claim:
+        return None
+    if claim.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key уже использован с другим запросом",
+        )
+    return await generation_response(db, user_id, claim.generation_id)
+
+
+@router.post("/generate", response_model=GenerationResponse, status_code=201)
+async def create_generation(
+    req: GenerateRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+    _rl=Depends(rate_limit_generate),
+    idempotency_key: str | None = Header(default=None),
+    events: inngest.Inngest = Depends(event_sender),
+):
+    """
+    Создать новую генерацию (фото/видео/голос/текст).
+    С заголовком Idempotency-Key повтор запроса возвращает исходную генерацию
+    без повторного списания кредитов.
+    """
+
+    # 0. Retry of an already accepted request?
+    if idempotency_key:
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Слишком длинный Idempotency-Key")
+        fingerprint = request_fingerprint(req)
+        replayed = await replay_generation(db, user_id, idempotency_key, fingerprint)
+        if replayed:
+            return replayed
+
+    # 1. Estimate cost based on model's price_multiplier
+    ai_model = await catalog.model(req.model_slug)
+    if req.model_slug and not ai_model:
+        raise HTTPException(status_code=400, detail=f"Неизвестная модель {req.model_slug}")
+    estimated_cost = estimate_cost(req, ai_model)
+    generation_id = gen_uuid()
+    kie_payload = build_kie_payload(req, ai_model)
+    cache_key = result_cache_key(req, ai_model, kie_payload)
+
+    # 2. Claim the key first: a concurrent duplicate waits here, not on the credit row
+    if idempotency_key and not await claim_key(db, user_id, idempotency_key, fingerprint, generation_id):
+        await db.rollback()
+        replayed = await replay_generation(db, user_id, idempotency_key, fingerprint)
+        if replayed:
+            return replayed
+        raise HTTPException(status_code=409, detail="Запрос с этим Idempotency-Key ещё выполняется")
+
+    # 3. Reserve credits: check and debit in one statement (no read-modify-write race)
+    account_id = await reserve_credits(db, user_id, estimated_cost)
+
+    # 4. Deterministic request of an opted-in model: reuse an identical earlier result
+    cached = await lookup(db, cache_key) if cache_key else None
+
+    # 5. Generation and its ledger row go out in the same flush
+    generation = new_generation(
+        req, user_id, ai_model, estimated_cost,
+        id=generation_id,
+        # A cache hit must not re-store (and so re-extend) its own entry
+        cache_key="" if cached else (cache_key or ""),
+    )
+    db.add(generation)
+    db.add(CreditTransaction(
+        account_id=account_id,
+        amount=-estimated_cost,
+        type="reserve",
+        generation_id=generation.id,
     ))
+    await db.flush()
+    await record_created(db, generation)
+    if cached:
+        # Identical deterministic request already rendered: complete without a provider task
+        await mark_succeeded(
+            db, generation,
+            result_url=cached.result_url,
+            result_urls=cached.result_urls,
+            thumbnail_url=cached.thumbnail_url,
+            provider_response={"source": "result_cache", "cache_key": cache_key},
+        )
+    await db.commit()
+    await publish_generation(generation)
+
+    # 6. Hand the KIE payload (model's provider_model_id) to the pipeline
+    if not cached:
+        await events.send(generation_event(generation.id, kie_payload))
+
+    resp = GenerationResponse.model_validate(generation)
+    resp.queue_position = await queue_position(db, generation)
+    return resp
+
+
+@router.post("/generate/batch", response_model=GenerationBatchResponse, status_code=201)
+async def create_generation_batch(
+    req: GenerateBatchRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+    _rl=Depends(rate_limit_generate),
+    events: inngest.Inngest = Depends(event_sender),
+):
+    """
+    Создать пачку вариантов одной кампании: одна блокировка счёта,
+    одна транзакция, одна отправка событий.
+    """
+    if len(req.variants) > settings.batch_max_variants:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много вариантов (максимум {settings.batch_max_variants})",
+        )
+
+    # 1. Validate every variant against the catalog before touching credits
+    snapshot = await catalog.current()
+    models = []
+    for i, variant in enumerate(req.variants):
+        ai_model = snapshot.models_by_slug.get(variant.model_slug) if variant.model_slug else None
+        if variant.model_slug and not ai_model:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Вариант {i}: неизвестная модель {variant.model_slug}",
+            )
+        models.append(ai_model)
+    costs = [estimate_cost(variant, ai_model) for variant, ai_model in zip(req.variants, models)]
+    total_cost = sum(costs)
+
+    # 2. Reserve the total in one conditional update
+    account_id = await reserve_credits(db, user_id, total_cost)
+
+    # 3. Bulk insert generations and their reserve transactions
+    generations = [
+        new_generation(variant, user_id, ai_model, cost, id=gen_uuid())
+        for variant, ai_model, cost in zip(req.variants, models, costs)
+    ]
+    db.add_all(generations)
+    db.add_all([
+        CreditTransaction(account_id=account_id, amount=-g.credits_reserved, type="reserve", generation_id=g.id)
+        for g in generations
+    ])
+    await db.flush()
+    await record_created_batch(db, generations)
+    await db.commit()
+    await publish_generation(*generations)
+
+    # 4. One Inngest send for all variants
+    await events.send([
+        generation_event(g.id, build_kie_payload(variant, ai_model))
+        for g, variant, ai_model in zip(generations, req.variants, models)
+    ])
+
+    return GenerationBatchResponse(
+        ids=[g.id for g in generations],
+        items=[GenerationResponse.model_validate(g) for g in generations],
+        credits_reserved=total_cost,
+    )
+
+
+# ── Status stream ──
+@router.get("/generations/stream")
+async def stream_generations(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+):
+    """
+    Поток статусов генераций пользователя (Server-Sent Events).
+    Сначала текущее состояние активных генераций, затем изменения.
+    Токен — только в заголовке Authorization, не в URL (URL попадают в логи прокси).
+    """
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    # Short-lived session: the stream stays open for a long time and must not pin a DB connection
+    async with async_session() as db:
+        user = await user_from_token(db, credentials.credentials)
+        result = await db.execute(
+            select(Generation)
+            .options(load_only(*STATUS_COLUMNS, Generation.user_id))
+            .where(Generation.user_id == user.id, Generation.status.in_(ACTIVE_STATUSES))
+            .order_by(desc(Generation.created_at))
+            .limit(100)
+        )
+        initial = [status_event(g) for g in result.scalars().all()]
+
+    return StreamingResponse(
+        stream_events(user.id, initial, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ── Export ──
+@router.get("/generations/export")
+async def export_generations(
+    format: str = "ndjson",
+    status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Выгрузка всей истории генераций (NDJSON или CSV) одним потоковым ответом.
+    Необязательные фильтры: статус и интервал дат создания.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Формат выгрузки: ndjson или csv")
+    filters = SearchFilters(status=status, created_from=created_from, created_to=created_to)
+    query = export_query(search_conditions(engine.dialect.name, user_id, filters))
+    filename = f"reklamai-generations-{clock.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        export_body(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
 
-    return GenerationResponse.model_validate(generation)
+
+# ── Search ──
+@router.get("/generations/search", response_model=GenerationSearchResponse)
+async def search_generations(
+    q: str = "",
+    model_slug: str | None = None,
+    preset_slug: str | None = None,
+    category: str | None = None,
+    status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Поиск по истории: полнотекстовый по промпту (`q`, слова ищутся по префиксу)
+    и фильтры. Страницы — как в списке, через `next_cursor`; `facets` приходят
+    только с первой страницей.
+    """
+    model_slugs = None
+    if category:
+        snapshot = await catalog.current()
+        model_slugs = tuple(m.slug for m in snapshot.models_by_category.get(category, ()))
+    filters = SearchFilters(
+        q=q, model_slug=model_slug, preset_slug=preset_slug, model_slugs=model_slugs,
+        status=status, created_from=created_from, created_to=created_to,
+    )
+    conditions = search_conditions(db.bind.dialect.name, user_id, filters)
+
+    query = select(*RESPONSE_COLUMNS).where(*conditions)
+    if cursor:
+        created_at, gen_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Generation.created_at < created_at,
+            and_(Generation.created_at == created_at, Generation.id < gen_id),
+        ))
+    query = query.order_by(desc(Generation.created_at), desc(Generation.id)).limit(limit + 1)
+    items = (await db.execute(query)).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    return generation_search_json.response({
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]) if has_more and items else None,
+        "facets": None if cursor else await facet_counts(db, conditions),
+    })
+
+
+# ── Similar past results ──
+@router.get("/generations/similar", response_model=SimilarGenerationsResponse)
+async def similar_generations(
+    prompt: str,
+    k: int = Query(default=5, ge=1, le=50),
+    min_score: float | None = Query(default=None, ge=0, le=1),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Похожие промпты среди успешных генераций пользователя (лучшие первыми),
+    чтобы предложить готовый результат до списания кредитов.
+    """
+    if min_score is None:
+        min_score = settings.similarity_default_min_score
+    matches = await similarity_index.search(db, user_id, prompt, k, min_score)
+    if not matches:
+        return SimilarGenerationsResponse(items=[])
+
+    scores = dict(matches)
+    rows = (await db.execute(
+        select(*schema_columns(SimilarGeneration)).where(Generation.id.in_(scores))
+    )).mappings().all()
+    items = [SimilarGeneration(**row, score=round(scores[row["id"]], 3)) for row in rows]
+    items.sort(key=lambda item: -item.score)
+    return SimilarGenerationsResponse(items=items)
+
+
+# ── Bulk status ──
+async def _bulk_status(
+    db: AsyncSession, user_id: str, ids: list[str], since: datetime | None,
+) -> GenerationStatusListResponse:
+    ids = list(dict.fromkeys(i for i in ids if i))
+    if len(ids) > settings.status_batch_max_ids:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {settings.status_batch_max_ids} id за запрос",
+        )
+    # updated_at is stamped at flush, not at commit: a row flushed before now but committed
+    # after this query would fall behind `since` for good, so the cursor trails by a margin
+    # longer than any write transaction (clients may see a change twice, never miss one)
+    server_time = clock.utcnow() - timedelta(seconds=settings.status_since_margin_seconds)
+    if not ids:
+        return GenerationStatusListResponse(items=[], server_time=server_time)
+
+    query = select(*STATUS_COLUMNS).where(
+        Generation.user_id == user_id,
+        Generation.id.in_(ids),
+    )
+    if since:
+        # Timestamps are written in UTC (app/clock.py); a naive `since` is taken as UTC
+        since = since.astimezone(timezone.utc) if since.tzinfo else since.replace(tzinfo=timezone.utc)
+        query = query.where(Generation.updated_at > since)
+
+    rows = (await db.execute(query)).mappings().all()
+    return GenerationStatusListResponse(
+        items=[GenerationStatus.model_validate(dict(row)) for row in rows],
+        server_time=server_time,
+    )
+
+
+@router.get("/generations/status", response_model=GenerationStatusListResponse)
+async def get_generations_status(
+    ids: list[str] = Query(default=[]),
+    since: datetime | None = None,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Статусы нескольких генераций одним запросом: ?ids=a,b,c (или ?ids=a&ids=b).
+    С `since` возвращаются только изменившиеся после этого момента;
+    `server_time` из ответа передайте как `since` в следующем запросе.
+    """
+    return await _bulk_status(db, user_id, [i for v in ids for i in v.split(",")], since)
+
+
+@router.post("/generations/status", response_model=GenerationStatusListResponse)
+async def post_generations_status(
+    req: GenerationStatusRequest,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """То же, что GET /generations/status, для длинных списков id."""
+    return await _bulk_status(db, user_id, req.ids, req.since)
 
 
 # ── Status ──
+# Terminal responses never change: rendered once per (owner, id), revalidated without the DB
+terminal_responses = BodyCache(settings.terminal_cache_max_entries)
+generation_json = JsonView(GenerationResponse)
+
+
 @router.get("/generations/{generation_id}", response_model=GenerationResponse)
 async def get_generation(
     generation_id: str,
-    user: User = Depends(get_current_user),
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить статус генерации по ID."""
-    result = await db.execute(
-        select(Generation).where(
-            Generation.id == generation_id,
-            Generation.user_id == user.id,
-        )
-    )
-    gen = result.scalar_one_or_none()
-    if not gen:
+    """
+    Получить статус генерации по ID.
+    Ответ с ETag; завершённые генерации (succeeded / failed / cancelled)
+    кэшируются и отдаются без обращения к БД, пока пользователь недавно
+    проверен как активный. Для незавершённых —
+    `estimated_completion_at` и заголовок `Retry-After`.
+    """
+    user_id = user_id_from_token(credentials.credentials)
+    cache_key = (user_id, generation_id)
+    cached = terminal_responses.get(cache_key)
+    if cached and active_users.is_active(user_id):
+        return precomputed_response(request, cached, _terminal_cache_control())
+
+    user = await user_from_token(db, credentials.credentials)
+    if cached:
+        return precomputed_response(request, cached, _terminal_cache_control())
+    resp = await generation_response(db, user.id, generation_id)
+    if not resp:
         raise HTTPException(status_code=404, detail="Генерация не найдена")
-    return GenerationResponse.model_validate(gen)
+
+    if resp.status in TERMINAL_STATUSES:
+        rendered = PrecomputedBody.render(generation_json.dump(resp))
+        terminal_responses.put(cache_key, rendered)
+        return precomputed_response(request, rendered, _terminal_cache_control())
+    rendered = PrecomputedBody.render(generation_json.dump(resp), compress=False)
+    response = precomputed_response(request, rendered, "private, no-cache")
+    # Pollers come back around the estimated completion instead of every few seconds
+    response.headers["Retry-After"] = str(retry_after(resp.estimated_completion_at))
+    return response
+
+
+def _terminal_cache_control() -> str:
+    return f"private, max-age={settings.terminal_cache_max_age}, immutable"
 
 
 # ── List ──
+def encode_cursor(gen: Generation) -> str:
+    """Opaque keyset cursor for the position right after ``gen``."""
+    raw = json.dumps([gen.created_at.isoformat(), gen.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, gen_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(gen_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Неверный курсор (Invalid cursor)")
+
+
 @router.get("/generations", response_model=GenerationListResponse)
 async def list_generations(
     limit: int = 20,
     offset: int = 0,
     status: str | None = None,
-    user: User = Depends(get_current_user),
+    cursor: str | None = None,
+    user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Список генераций пользователя."""
-    query = select(Generation).where(Generation.user_id == user.id)
+    """
+    Список генераций пользователя (новые первыми).
+    Передайте `next_cursor` из ответа как `cursor` для следующей страницы;
+    `offset` оставлен для обратной совместимости.
+    """
+    # Page one (most list traffic) comes from this worker's recent-generations ring
+    page_one = not status and not cursor and not offset
+    if page_one:
+        cached = recent_generations.page(user_id, limit)
+        if cached:
+            items, total, has_more = cached
+            return generation_list_json.response({
+                "items": items,
+                "total": total,
+                "next_cursor": encode_cursor(items[-1]) if has_more and items else None,
+            })
+        version = recent_generations.version
+
+    # Plain row tuples, no ORM entities: serialized straight to JSON below
+    query = select(*RESPONSE_COLUMNS).where(Generation.user_id == user_id)
 
     if status:
         query = query.where(Generation.status == status)
 
-    query = query.order_by(desc(Generation.created_at)).limit(limit).offset(offset)
+    if cursor:
+        created_at, gen_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Generation.created_at < created_at,
+            and_(Generation.created_at == created_at, Generation.id < gen_id),
+        ))
+    elif offset:
+        query = query.offset(offset)
+
+    # One extra row tells whether another page exists (a ring fill reads the ring's size)
+    fetch = max(limit, recent_generations.size) if page_one else limit
+    query = query.order_by(desc(Generation.created_at), desc(Generation.id)).limit(fetch + 1)
     result = await db.execute(query)
-    items = result.scalars().all()
+    rows = result.all()
+    has_more = len(rows) > limit
+    items = rows[:limit]
 
-    # Count total
-    from sqlalchemy import func
-    count_q = select(func.count()).select_from(Generation).where(Generation.user_id == user.id)
-    if status:
-        count_q = count_q.where(Generation.status == status)
-    count_res = await db.execute(count_q)
-    total = count_res.scalar()
+    total = await count_generations(db, user_id, status)
+    if page_one:
+        recent_generations.fill(user_id, rows, total, version)
 
-    return GenerationListResponse(
-        items=[GenerationResponse.model_validate(g) for g in items],
-        total=total,
-    )
+    return generation_list_json.response({
+        "items": items,
+        "total": total,
+        "next_cursor": encode_cursor(items[-1]) if has_more and items else None,
+    })
 
 
 # ── Models (public) ──────────────────────────────────
+def _catalog_cache_control() -> str:
+    return (
+        f"public, max-age={settings.catalog_http_max_age}, "
+        f"stale-while-revalidate={settings.catalog_http_stale_while_revalidate}"
+    )
+
+
 @router.get("/models", response_model=list[AIModelResponse])
-async def list_models(
-    category: str | None = None,
-    db: AsyncSession = Depends(get_db),
-):
+async def list_models(request: Request, category: str | None = None):
     """Return all active AI models (public, no auth required)."""
-    query = select(AIModel).where(AIModel.is_active == True)
-    if category:
-        query = query.where(AIModel.category == category)
-    query = query.order_by(AIModel.name)
-    result = await db.execute(query)
-    return [AIModelResponse.model_validate(m) for m in result.scalars().all()]
+    rendered = (await catalog.current()).models_body(category)
+    return precomputed_response(request, rendered, _catalog_cache_control())
 
 
 # ── Presets (public) ──────────────────────────────────
 @router.get("/presets", response_model=list[PresetResponse])
-async def list_presets(
-    category: str | None = None,
-    db: AsyncSession = Depends(get_db),
-):
+async def list_presets(request: Request, category: str | None = None):
     """Return all active presets (public, no auth required)."""
-    query = select(Preset).where(Preset.is_active == True)
-    if category:
-        query = query.where(Preset.category == category)
-    query = query.order_by(Preset.name)
-    result = await db.execute(query)
-    return [PresetResponse.model_validate(p) for p in result.scalars().all()]
+    rendered = (await catalog.current()).presets_body(category)
+    return precomputed_response(request, rendered, _catalog_cache_control())
@@ -1,19 +1,18 @@
 """
 ReklamAI v2.0 — Webhook Routes
-Receives callbacks from KIE.ai when a generation is complete.
+Receives callbacks from KIE.ai when a generation is complete. Callbacks are
+acknowledged once stored; app/webhook_inbox.py applies them.
 """
 import hashlib
 import hmac
+import json
 from fastapi import APIRouter, Request, HTTPException
-from sqlalchemy import select, text
-from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timezone
 
 import logging
 
 from app.config import get_settings
 from app.database import async_session
-from app.models import Generation, CreditAccount, CreditTransaction
+from app.webhook_inbox import enqueue, webhook_inbox
 
 logger = logging.getLogger("uvicorn")
 router = APIRouter(prefix="/webhook", tags=["webhook"])
@@ -33,11 +32,12 @@ def _verify_webhook_signature(body_bytes: bytes, signature: str | None) -> bool:
     return hmac.compare_digest(expected, signature)
 
 
-@router.post("/kie")
+@router.post("/kie", status_code=202)
 async def kie_webhook(request: Request):
     """
     Вебхук от KIE.ai — вызывается когда генерация завершена.
-    Обновляет статус генерации и финализирует кредиты.
+    Проверяет подпись, сохраняет событие во входящую очередь и сразу отвечает 202;
+    статус генерации и кредиты обновляет воркер очереди (app/webhook_inbox.py).
     """
     body_bytes = await request.body()
 
@@ -47,15 +47,14 @@ async def kie_webhook(request: Request):
         raise HTTPException(status_code=403, detail="Invalid webhook signature")
 
     try:
-        import json
         body = json.loads(body_bytes)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON")
 
     task_id = body.get("task_id", "")
     status = body.get("status", "")
-    output = body.get("output", {})
-    error = body.get("error", "")
 
     logger.info(f"[WEBHOOK] Received: task_id={task_id}, status={status}")
 
@@ -63,68 +62,14 @@ async def kie_webhook(request: Request):
         raise HTTPException(status_code=400, detail="Missing task_id")
 
     async with async_session() as db:
-        # Find generation by provider_task_id
-        result = await db.execute(
-            select(Generation).where(Generation.provider_task_id == task_id)
+        accepted = await enqueue(db, str(task_id), str(status), body)
+    if not accepted:
+        # Inbox full: let KIE redeliver later rather than queue without bound
+        raise HTTPException(
+            status_code=503,
+            detail="Webhook inbox is full",
+            headers={"Retry-After": str(_settings.webhook_inbox_retry_after_seconds)},
         )
-        gen = result.scalar_one_or_none()
-
-        if not gen:
-            logger.warning(f"[WEBHOOK] Generation not found for task_id={task_id}")
-            return {"ok": False, "reason": "generation_not_found"}
-
-        # Update generation
-        now = datetime.now(timezone.utc)
-
-        if status == "completed" or status == "succeeded":
-            gen.status = "succeeded"
-            gen.completed_at = now
-            gen.provider_response = body
-
-            # Extract result URLs
-            if isinstance(output, dict):
-                gen.result_url = output.get("video_url", "") or output.get("image_url", "")
-                urls = output.get("urls", [])
-                if urls:
-                    gen.result_urls = urls
-                    gen.result_url = urls[0] if not gen.result_url else gen.result_url
-                gen.thumbnail_url = output.get("thumbnail_url", "")
-
-            # Finalize credits (refund difference if any)
-            gen.credits_final = gen.credits_reserved  # same cost for now
-
-        elif status == "failed" or status == "error":
-            gen.status = "failed"
-            gen.completed_at = now
-            gen.error_message = error or str(body)
-            gen.provider_response = body
-
-            # Refund credits
-            credit_result = await db.execute(
-                select(CreditAccount).where(CreditAccount.owner_id == gen.user_id)
-            )
-            account = credit_result.scalar_one_or_none()
-            if account and gen.credits_reserved > 0:
-                account.balance += gen.credits_reserved
-                account.total_spent -= gen.credits_reserved
-
-                refund_tx = CreditTransaction(
-                    account_id=account.id,
-                    amount=gen.credits_reserved,
-                    type="refund",
-                    generation_id=gen.id,
-                )
-                db.add(refund_tx)
-
-            gen.credits_final = 0
-
-        elif status == "processing":
-            gen.status = "processing"
-            progress = body.get("progress", 0)
-            if progress:
-                gen.progress = int(progress)
-
-        await db.commit()
 
-    logger.info(f"[WEBHOOK] Updated generation {gen.id} -> {gen.status}")
-    return {"ok": True, "generation_id": gen.id, "status": gen.status}
+    webhook_inbox.wake()
+    return {"ok": True, "queued": True}
@@ -0,0 +1,303 @@
+"""
+ReklamAI v2.0 — Fair-Share Scheduler
+Admission control for provider work: caps concurrently running generations
+per user and globally. Waiting jobs stay `queued` and are admitted
+FIFO within a user, round-robin across users.
+
+Each capacity lane (see app/lanes.py) has its own queue and concurrency
+limit, so a video backlog never sits in front of image jobs. Admission also
+consumes the lane's provider request budget and is refused while the lane is
+paused after a provider 429.
+
+A generation is "running" once admitted (started_at set) until it reaches a
+terminal status. Admissions older than the lease are not counted, so a run
+that died without finalizing cannot hold a slot forever.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, func, text, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.clock import utcnow
+from app.config import get_settings
+from app.lanes import lanes, lane_concurrency
+from app.metrics import metrics
+from app.models import Generation
+
+settings = get_settings()
+
+ACTIVE_STATUSES = ("queued", "processing")
+
+
+def user_order(first_seen: list[str], running_by_user: dict[str, int]) -> list[str]:
+    """Users in round order: fewer running jobs first, then oldest waiting head first."""
+    return sorted(first_seen, key=lambda u: running_by_user.get(u, 0))
+
+
+def round_robin_order(
+    pending: list[tuple[str, str]],
+    running_by_user: dict[str, int],
+) -> list[str]:
+    """
+    Order pending jobs for dispatch.
+
+    ``pending`` is a list of (generation_id, user_id) already sorted oldest
+    first. Round r holds every user's r-th waiting job; within a round, users
+    with fewer running jobs go first, then users whose oldest job waited longest.
+    """
+    queues: "OrderedDict[str, list[str]]" = OrderedDict()
+    for gen_id, user_id in pending:
+        queues.setdefault(user_id, []).append(gen_id)
+
+    # OrderedDict keeps first-seen order == oldest head first
+    users = user_order(list(queues.keys()), running_by_user)
+    order = []
+    depth = max((len(q) for q in queues.values()), default=0)
+    for r in range(depth):
+        for u in users:
+            if r < len(queues[u]):
+                order.append(queues[u][r])
+    return order
+
+
+def round_robin_position(
+    users: list[str],
+    queue_lengths: dict[str, int],
+    user_id: str,
+    index: int,
+) -> int:
+    """
+    1-based position in ``round_robin_order`` of ``user_id``'s job number
+    ``index`` (0-based), computed from queue lengths alone: every user
+    contributes up to ``index`` jobs to the earlier rounds, and users ahead of
+    ``user_id`` in round ``index`` contribute one more.
+    """
+    position = 1
+    ahead = True
+    for u in users:
+        if u == user_id:
+            ahead = False
+        length = queue_lengths.get(u, 0)
+        position += min(length, index)
+        if ahead and length > index:
+            position += 1
+    return position
+
+
+def admissible(
+    order: list[str],
+    owner: dict[str, str],
+    running_by_user: dict[str, int],
+    running_total: int,
+    per_user_cap: int,
+    global_cap: int,
+) -> list[str]:
+    """Return the prefix of ``order`` that fits into the free per-user and global slots."""
+    free = global_cap - running_total
+    taken: dict[str, int] = {}
+    admitted = []
+    for gen_id in order:
+        if free <= 0:
+            break
+        user_id = owner[gen_id]
+        if running_by_user.get(user_id, 0) + taken.get(user_id, 0) >= per_user_cap:
+            continue
+        taken[user_id] = taken.get(user_id, 0) + 1
+        admitted.append(gen_id)
+        free -= 1
+    return admitted
+
+
+def _lease_cutoff() -> datetime:
+    return utcnow() - timedelta(minutes=settings.admission_lease_minutes)
+
+
+async def _running(db: AsyncSession) -> tuple[dict[str, int], dict[str, int]]:
+    """Running generations counted (by user, by lane)."""
+    result = await db.execute(
+        select(Generation.user_id, Generation.lane, func.count())
+        .where(
+            Generation.status.in_(ACTIVE_STATUSES),
+            Generation.started_at.is_not(None),
+            Generation.started_at >= _lease_cutoff(),
+        )
+        .group_by(Generation.user_id, Generation.lane)
+    )
+    by_user: dict[str, int] = {}
+    by_lane: dict[str, int] = {}
+    for user_id, lane, count in result.all():
+        by_user[user_id] = by_user.get(user_id, 0) + count
+        by_lane[lane] = by_lane.get(lane, 0) + count
+    return by_user, by_lane
+
+
+async def _pending_heads(db: AsyncSession, lane: str, per_user: int) -> list[tuple[str, str]]:
+    """
+    The first ``per_user`` waiting jobs of every user in ``lane``, oldest first.
+    A user's later jobs can never fit under the per-user cap, so admission only
+    needs these rows instead of the whole lane backlog.
+    """
+    rank = func.row_number().over(
+        partition_by=Generation.user_id,
+        order_by=(Generation.created_at, Generation.id),
+    ).label("rank")
+    waiting = (
+        select(Generation.id, Generation.user_id, Generation.created_at, rank)
+        .where(
+            Generation.lane == lane,
+            Generation.status == "queued",
+            Generation.started_at.is_(None),
+        )
+        .subquery()
+    )
+    result = await db.execute(
+        select(waiting.c.id, waiting.c.user_id)
+        .where(waiting.c.rank <= per_user)
+        .order_by(waiting.c.created_at, waiting.c.id)
+    )
+    return [(gen_id, user_id) for gen_id, user_id in result.all()]
+
+
+async def _queue_lengths(db: AsyncSession, lane: str) -> dict[str, int]:
+    """Waiting jobs per user in ``lane``."""
+    result = await db.execute(
+        select(Generation.user_id, func.count())
+        .where(
+            Generation.lane == lane,
+            Generation.status == "queued",
+            Generation.started_at.is_(None),
+        )
+        .group_by(Generation.user_id)
+    )
+    return dict(result.all())
+
+
+async def _index_in_user_queue(db: AsyncSession, gen: Generation) -> int:
+    """How many of the owner's waiting jobs in the lane are older than ``gen``."""
+    return (await db.execute(
+        select(func.count())
+        .select_from(Generation)
+        .where(
+            Generation.lane == gen.lane,
+            Generation.user_id == gen.user_id,
+            Generation.status == "queued",
+            Generation.started_at.is_(None),
+            or_(
+                Generation.created_at < gen.created_at,
+                and_(Generation.created_at == gen.created_at, Generation.id < gen.id),
+            ),
+        )
+    )).scalar_one()
+
+
+async def _position(
+    db: AsyncSession,
+    gen,
+    heads: list[tuple[str, str]],
+    order: list[str],
+    running_by_user: dict[str, int],
+    lengths: dict[str, int],
+) -> int | None:
+    """Position of a waiting job; jobs past the loaded heads are counted, not listed."""
+    try:
+        return order.index(gen.id) + 1
+    except ValueError:
+        pass
+    if gen.user_id not in lengths:
+        return None
+    first_seen = list(OrderedDict.fromkeys(user_id for _, user_id in heads))
+    return round_robin_position(
+        user_order(first_seen, running_by_user),
+        lengths,
+        gen.user_id,
+        await _index_in_user_queue(db, gen),
+    )
+
+
+async def _lock_admission(db: AsyncSession) -> None:
+    """Serialize admission decisions across workers (PostgreSQL only)."""
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('reklamai:admission'))"))
+
+
+async def try_admit(db: AsyncSession, generation_id: str) -> dict:
+    """
+    Admit ``generation_id`` if it is within the free slots of its lane's
+    fair-share order and the lane has provider budget left.
+    Returns {"admitted": bool, "position": int | None, "lane": str}; position
+    is None when the generation is no longer waiting (finished, cancelled or missing).
+    """
+    await _lock_admission(db)
+
+    row = (await db.execute(
+        select(
+            Generation.id, Generation.user_id, Generation.status,
+            Generation.started_at, Generation.lane, Generation.created_at,
+        ).where(Generation.id == generation_id)
+    )).one_or_none()
+    if row is None or row.status not in ACTIVE_STATUSES:
+        # Gone or already finished — nothing to dispatch
+        return {"admitted": False, "position": None, "lane": row.lane if row else None}
+    lane = row.lane
+    if row.started_at is not None:
+        # Replayed after a successful admission
+        return {"admitted": True, "position": 0, "lane": lane}
+
+    running_by_user, running_by_lane = await _running(db)
+    heads = await _pending_heads(db, lane, settings.max_running_per_user)
+    lengths = await _queue_lengths(db, lane)
+    owner = dict(heads)
+    order = round_robin_order(heads, running_by_user)
+
+    running_total = sum(running_by_user.values())
+    lane_free = lane_concurrency(lane) - running_by_lane.get(lane, 0)
+    fits = admissible(
+        order,
+        owner,
+        running_by_user,
+        running_total,
+        settings.max_running_per_user,
+        min(settings.max_running_global, running_total + lane_free),
+    )
+
+    metrics.set_gauge("lane_depth", sum(lengths.values()), lane=lane)
+    metrics.set_gauge("lane_running", running_by_lane.get(lane, 0), lane=lane)
+
+    if generation_id in fits and lanes.try_dispatch(lane):
+        now = utcnow()
+        await db.execute(
+            update(Generation)
+            .where(Generation.id == generation_id, Generation.started_at.is_(None))
+            .values(started_at=now)
+        )
+        await db.commit()
+        created_at = row.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        metrics.observe("lane_wait_seconds", (now - created_at).total_seconds(), lane=lane)
+        return {"admitted": True, "position": 0, "lane": lane}
+
+    position = await _position(db, row, heads, order, running_by_user, lengths)
+    await db.commit()
+    return {"admitted": False, "position": position, "lane": lane}
+
+
+async def release_admission(db: AsyncSession, generation_id: str) -> None:
+    """Return an admitted but not yet dispatched generation to its queue (e.g. after a 429)."""
+    await db.execute(
+        update(Generation)
+        .where(Generation.id == generation_id, Generation.status == "queued")
+        .values(started_at=None)
+    )
+    await db.commit()
+
+
+async def queue_position(db: AsyncSession, gen: Generation) -> int | None:
+    """1-based position of a waiting generation in its lane's dispatch order (None once started)."""
+    if gen.status != "queued" or gen.started_at is not None:
+        return None
+    running_by_user, _ = await _running(db)
+    heads = await _pending_heads(db, gen.lane, settings.max_running_per_user)
+    order = round_robin_order(heads, running_by_user)
+    return await _position(db, gen, heads, order, running_by_user, await _queue_lengths(db, gen.lane))
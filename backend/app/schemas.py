@@ -61,6 +61,10 @@ class GenerateRequest(BaseModel):
     params: dict = {}
 
 
+class GenerateBatchRequest(BaseModel):
+    variants: List[GenerateRequest] = Field(..., min_length=1)
+
+
 class GenerationResponse(BaseModel):
     id: str
     status: str
@@ -77,13 +81,87 @@ class GenerationResponse(BaseModel):
     aspect_ratio: str = "16:9"
     created_at: datetime
     completed_at: Optional[datetime] = None
+    queue_position: Optional[int] = None  # 1-based, only while waiting for a slot
+    estimated_completion_at: Optional[datetime] = None  # queued / processing, from latency sketches
 
     model_config = {"from_attributes": True}
 
 
+class GenerationStatus(BaseModel):
+    """Compact status of one generation (status stream / bulk status)."""
+    id: str
+    status: str
+    progress: int = 0
+    result_url: str = ""
+    thumbnail_url: str = ""
+    error_message: str = ""
+
+    model_config = {"from_attributes": True}
+
+
+class GenerationStatusRequest(BaseModel):
+    ids: List[str]
+    since: Optional[datetime] = None
+
+
+class GenerationStatusListResponse(BaseModel):
+    items: List[GenerationStatus]
+    server_time: datetime  # pass as ?since= on the next poll
+
+
+class GenerationSearchResponse(BaseModel):
+    items: List[GenerationResponse]
+    next_cursor: Optional[str] = None
+    # First page only: {"status" | "model_slug" | "preset_slug": {value: count}}
+    facets: Optional[dict[str, dict[str, int]]] = None
+
+
+class SimilarGeneration(BaseModel):
+    id: str
+    prompt: str
+    model_slug: str = ""
+    result_url: str = ""
+    thumbnail_url: str = ""
+    created_at: datetime
+    score: float  # estimated Jaccard similarity of the prompts, 0..1
+
+
+class SimilarGenerationsResponse(BaseModel):
+    items: List[SimilarGeneration]
+
+
+class GenerationExportRow(BaseModel):
+    """One line of GET /api/generations/export (NDJSON) / one CSV row, in column order."""
+    id: str
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    status: str
+    model_slug: str = ""
+    preset_slug: str = ""
+    prompt: str = ""
+    negative_prompt: str = ""
+    aspect_ratio: str = ""
+    duration: Optional[int] = None
+    result_url: str = ""
+    result_urls: list = []
+    thumbnail_url: str = ""
+    error_message: str = ""
+    credits_reserved: float = 0.0
+    credits_final: float = 0.0
+
+    model_config = {"from_attributes": True}
+
+
+class GenerationBatchResponse(BaseModel):
+    ids: List[str]
+    items: List[GenerationResponse]
+    credits_reserved: float
+
+
 class GenerationListResponse(BaseModel):
     items: List[GenerationResponse]
     total: int
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
 
 
 # ═══════════════════════════════════════════════════
@@ -118,6 +196,12 @@ class PresetResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class CatalogReloadResponse(BaseModel):
+    version: int
+    models: int
+    presets: int
+
+
 # ═══════════════════════════════════════════════════
 # WEBHOOK (from KIE.ai)
 # ═══════════════════════════════════════════════════
@@ -0,0 +1,91 @@
+"""
+ReklamAI v2.0 — Generation History Search
+Full-text search on `Generation.prompt` plus filters (model, preset, model
+category, status, date range), keyset-paginated like the history list, with
+facet counts for the first page.
+
+The full-text index lives outside the ORM columns (DDL in app/models.py,
+migration 010): a generated `prompt_tsv` tsvector with a GIN index on
+PostgreSQL, an external-content FTS5 table on SQLite. Every search term is
+matched as a prefix and all terms must match.
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import ColumnElement, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Generation
+
+MAX_TERMS = 8
+FACETS = ("status", "model_slug", "preset_slug")
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    q: str = ""
+    model_slug: str | None = None
+    preset_slug: str | None = None
+    model_slugs: tuple[str, ...] | None = None  # resolved from a model category
+    status: str | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+
+
+def prompt_terms(q: str) -> list[str]:
+    """Search words of ``q`` (no query syntax reaches the FTS engine)."""
+    return [t.lower() for t in _TERM.findall(q or "")][:MAX_TERMS]
+
+
+def prompt_match(dialect: str, terms: list[str]) -> ColumnElement:
+    if dialect == "postgresql":
+        tsquery = " & ".join(f"{t}:*" for t in terms)
+        return literal_column("generations.prompt_tsv").op("@@")(func.to_tsquery("simple", tsquery))
+    match = " ".join(f'"{t}"*' for t in terms)
+    return literal_column("generations.rowid").in_(
+        select(literal_column("rowid"))
+        .select_from(text("generations_fts"))
+        .where(text("generations_fts MATCH :fts_query").bindparams(fts_query=match))
+    )
+
+
+def _utc(value: datetime) -> datetime:
+    # Timestamps are written in UTC (app/clock.py); a naive bound is taken as UTC
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def search_conditions(dialect: str, user_id: str, filters: SearchFilters) -> list[ColumnElement]:
+    conditions = [Generation.user_id == user_id]
+    terms = prompt_terms(filters.q)
+    if terms:
+        conditions.append(prompt_match(dialect, terms))
+    if filters.model_slug:
+        conditions.append(Generation.model_slug == filters.model_slug)
+    if filters.model_slugs is not None:
+        conditions.append(Generation.model_slug.in_(filters.model_slugs))
+    if filters.preset_slug:
+        conditions.append(Generation.preset_slug == filters.preset_slug)
+    if filters.status:
+        conditions.append(Generation.status == filters.status)
+    if filters.created_from:
+        conditions.append(Generation.created_at >= _utc(filters.created_from))
+    if filters.created_to:
+        conditions.append(Generation.created_at < _utc(filters.created_to))
+    return conditions
+
+
+async def facet_counts(db: AsyncSession, conditions: list[ColumnElement]) -> dict[str, dict[str, int]]:
+    """Per-value counts of each facet over everything the filters match."""
+    facets = {}
+    for name in FACETS:
+        column = getattr(Generation, name)
+        rows = (await db.execute(
+            select(column, func.count()).where(*conditions).group_by(column)
+        )).all()
+        counts: dict[str, int] = {}
+        for value, count in sorted(rows, key=lambda r: -r[1]):
+            counts[value or ""] = counts.get(value or "", 0) + count
+        facets[name] = counts
+    return facets
@@ -0,0 +1,32 @@
+"""
+ReklamAI v2.0 — Fast JSON Responses
+Opt-in path for hot list endpoints: rows (SQLAlchemy Row tuples, mappings or
+ORM objects) are validated once by a precompiled TypeAdapter and dumped to
+bytes by pydantic-core, skipping per-row model_validate and FastAPI's second
+validation + encoding pass through `response_model`.
+
+Keep `response_model=` on the route for the OpenAPI schema; returning the
+Response from `JsonView.response` bypasses it at runtime.
+"""
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class JsonView:
+    """Serializer for one response schema, built once at import time."""
+
+    def __init__(self, schema: Any):
+        self.adapter = TypeAdapter(schema)
+
+    def dump(self, data: Any) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(data, from_attributes=True))
+
+    def response(self, data: Any, status_code: int = 200, headers: dict | None = None) -> Response:
+        return Response(
+            content=self.dump(data),
+            status_code=status_code,
+            media_type="application/json",
+            headers=headers,
+        )
@@ -0,0 +1,154 @@
+"""
+ReklamAI v2.0 — Similar Prompts
+Per-user near-duplicate index over succeeded generations, so the studio can
+offer an existing result before the user spends credits on an almost
+identical prompt.
+
+Each prompt gets a 64-value MinHash signature over character 4-grams
+(256 bytes, stored in `generations.prompt_signature` at creation). A user's
+signatures are kept in memory as one (n, 64) uint32 matrix; the Jaccard
+estimate against a query is the share of equal positions, computed for all
+rows at once with NumPy — a few ms for 50k rows.
+
+Indexes load lazily, catch up incrementally (rows completed after the last
+load) when a `succeeded` event for the user arrives, and are evicted LRU
+above `similarity_index_max_users`.
+"""
+import re
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.events import GENERATION_CHANNEL
+from app.metrics import metrics
+from app.models import Generation
+from app.pubsub import pubsub
+
+settings = get_settings()
+
+NUM_PERM = 64
+SHINGLE = 4
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(0x5EED)  # fixed: signatures are persisted
+_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)[:, None]
+_WS = re.compile(r"\s+")
+
+
+def _shingles(prompt: str) -> set[str]:
+    text = _WS.sub(" ", prompt.lower()).strip()
+    if len(text) <= SHINGLE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(prompt: str) -> np.ndarray | None:
+    """MinHash of ``prompt`` as NUM_PERM uint32 values (None for an empty prompt)."""
+    shingles = _shingles(prompt or "")
+    if not shingles:
+        return None
+    x = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A * x + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def signature_bytes(prompt: str) -> bytes | None:
+    sig = signature(prompt)
+    return sig.tobytes() if sig is not None else None
+
+
+@dataclass
+class _UserIndex:
+    ids: list[str]
+    matrix: np.ndarray  # (n, NUM_PERM) uint32
+    loaded_until: datetime | None
+    stale: bool = False
+
+
+class SimilarityIndex:
+    """In-memory per-user MinHash matrices over succeeded generations."""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._users: OrderedDict[str, _UserIndex] = OrderedDict()
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def mark_stale(self) -> None:
+        """Top every index up on its next search (succeeded events may have been missed)."""
+        for index in self._users.values():
+            index.stale = True
+
+    def on_event(self, event: dict) -> None:
+        index = self._users.get(event.get("user_id"))
+        if index and event.get("status") == "succeeded":
+            index.stale = True
+
+    async def _rows(self, db: AsyncSession, user_id: str, since: datetime | None):
+        query = select(
+            Generation.id, Generation.prompt, Generation.prompt_signature, Generation.completed_at,
+        ).where(Generation.user_id == user_id, Generation.status == "succeeded")
+        if since is not None:
+            query = query.where(Generation.completed_at > since)
+        return (await db.execute(query.order_by(Generation.completed_at))).all()
+
+    async def _index(self, db: AsyncSession, user_id: str) -> _UserIndex:
+        index = self._users.get(user_id)
+        if index and not index.stale:
+            self._users.move_to_end(user_id)
+            return index
+
+        rows = await self._rows(db, user_id, index.loaded_until if index else None)
+        ids, sigs = [], []
+        for row in rows:
+            # Rows from before the signature column are hashed on load
+            sig = (
+                np.frombuffer(row.prompt_signature, dtype=np.uint32)
+                if row.prompt_signature else signature(row.prompt)
+            )
+            if sig is not None:
+                ids.append(row.id)
+                sigs.append(sig)
+        fresh = np.vstack(sigs) if sigs else np.empty((0, NUM_PERM), dtype=np.uint32)
+        loaded_until = rows[-1].completed_at if rows else (index.loaded_until if index else None)
+
+        if index:
+            index.ids.extend(ids)
+            index.matrix = np.vstack([index.matrix, fresh]) if ids else index.matrix
+            index.loaded_until, index.stale = loaded_until, False
+        else:
+            index = _UserIndex(ids=ids, matrix=fresh, loaded_until=loaded_until)
+        self._users[user_id] = index
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        metrics.set_gauge("similarity_index_users", len(self._users))
+        return index
+
+    async def search(
+        self, db: AsyncSession, user_id: str, prompt: str, k: int, min_score: float,
+    ) -> list[tuple[str, float]]:
+        """Top ``k`` (generation_id, estimated Jaccard) with score >= ``min_score``."""
+        query = signature(prompt)
+        if query is None:
+            return []
+        index = await self._index(db, user_id)
+        if not index.ids:
+            return []
+        scores = np.count_nonzero(index.matrix == query, axis=1) / NUM_PERM
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(index.ids[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+# Singleton
+similarity_index = SimilarityIndex(settings.similarity_index_max_users)
+pubsub.subscribe(GENERATION_CHANNEL, similarity_index.on_event)
+pubsub.on_gap(similarity_index.mark_stale)
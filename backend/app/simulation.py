@@ -0,0 +1,430 @@
+"""
+ReklamAI v2.0 — Pipeline Simulator
+Runs the real generation pipeline in-process on virtual time:
+
+- `create_generation` (the actual route function) for every arrival,
+- `run_generation_pipeline` on an in-memory Inngest step executor,
+- a fake KIE provider that completes tasks after sampled durations and
+  delivers (or loses) webhooks to the real /webhook/kie route,
+- the reconciler on its cron cadence.
+
+Only one simulated task runs at a time and every wait is a virtual-clock
+timer, so runs are deterministic for a given seed and 10 s poll sleeps cost
+nothing. The fakes are passed in — the route's `events` dependency, the
+`kie` argument of the pipeline and reconciler, `clock.use_clock` — so no live
+module is patched. Used by scripts/simulate_pipeline.py and
+tests/test_simulation.py.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, select, func
+
+from app import clock
+from app.catalog import catalog
+from app.database import engine, async_session
+from app.kie_client import KIERateLimited
+from app.lanes import lanes
+from app.lifecycle import TERMINAL_STATUSES
+from app.models import User, CreditAccount, CreditTransaction, AIModel, Generation
+from app.webhook_inbox import webhook_inbox
+
+logger = logging.getLogger("uvicorn")
+
+SIM_MODELS = [
+    # slug, category, price
+    ("sim-image", "image", 1.0),
+    ("sim-video", "video", 5.0),
+    ("sim-voice", "voice", 0.5),
+]
+
+
+@dataclass
+class SimConfig:
+    generations: int = 1000
+    users: int = 50
+    seed: int = 1
+    # Mean arrivals per virtual second; 0 submits everything at t=0
+    arrival_rate: float = 20.0
+    # Share of arrivals per model slug
+    model_mix: dict = field(default_factory=lambda: {"sim-image": 0.6, "sim-video": 0.3, "sim-voice": 0.1})
+    # Provider execution time per category: (median seconds, lognormal sigma)
+    durations: dict = field(default_factory=lambda: {
+        "image": (8.0, 0.4),
+        "video": (120.0, 0.6),
+        "voice": (15.0, 0.4),
+    })
+    failure_rate: float = 0.05
+    rate_limit_rate: float = 0.0  # chance a createTask call answers 429
+    webhook_loss_rate: float = 0.1  # chance a completion webhook never arrives
+    webhooks: bool = True
+    initial_balance: float = 10_000.0
+    step_retries: int = 3  # matches process-generation retries
+    reconcile_every: float = 300.0  # virtual seconds between reconciler ticks
+
+
+class VirtualClock:
+    """Clock whose time only moves when the simulator advances it."""
+
+    def __init__(self, start: datetime | None = None):
+        self.epoch = start or datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.t = 0.0
+
+    def now(self) -> datetime:
+        return self.epoch + timedelta(seconds=self.t)
+
+    def monotonic(self) -> float:
+        return self.t
+
+
+class SimStep:
+    """In-memory stand-in for the Inngest step API with per-run memoization."""
+
+    def __init__(self, sim: "Simulator", memo: dict):
+        self.sim = sim
+        self.memo = memo
+
+    async def run(self, step_id: str, handler, *args):
+        if step_id in self.memo:
+            return self.memo[step_id]
+        # Round-trip through JSON like the real executor does
+        output = json.loads(json.dumps(await handler(*args)))
+        self.memo[step_id] = output
+        return output
+
+    async def sleep(self, step_id: str, duration):
+        if step_id in self.memo:
+            return None
+        seconds = duration.total_seconds() if isinstance(duration, timedelta) else duration / 1000
+        self.memo[step_id] = None
+        await self.sim.wait(self.sim.clock.t + seconds)
+
+
+class _SimInngest:
+    """Event sender handed to the generate route; starts pipeline runs."""
+
+    def __init__(self, sim: "Simulator"):
+        self.sim = sim
+
+    async def send(self, events):
+        for ev in events if isinstance(events, list) else [events]:
+            self.sim.spawn(self.sim.clock.t, self.sim.run_pipeline(ev.data))
+        return []
+
+
+class FakeKIE:
+    """Deterministic provider: tasks finish after sampled durations."""
+
+    def __init__(self, sim: "Simulator"):
+        self.sim = sim
+        self.tasks: dict[str, dict] = {}
+        self.categories = {slug: category for slug, category, _ in SIM_MODELS}
+
+    async def submit_task(self, payload: dict) -> dict:
+        cfg, rng = self.sim.config, self.sim.rng
+        if rng.random() < cfg.rate_limit_rate:
+            raise KIERateLimited("rate limited", retry_after=10)
+
+        task_id = f"sim-task-{len(self.tasks) + 1}"
+        median, sigma = cfg.durations[self.categories.get(payload.get("model"), "image")]
+        done_at = self.sim.clock.t + rng.lognormvariate(0, sigma) * median
+        failed = rng.random() < cfg.failure_rate
+        self.tasks[task_id] = {"done_at": done_at, "failed": failed}
+
+        if cfg.webhooks and rng.random() >= cfg.webhook_loss_rate:
+            self.sim.spawn(done_at, self.sim.deliver_webhook(task_id, failed))
+        return {"code": 200, "data": {"taskId": task_id}}
+
+    async def get_task_status(self, task_id: str) -> dict:
+        task = self.tasks[task_id]
+        if self.sim.clock.t < task["done_at"]:
+            return {"code": 200, "data": {"taskId": task_id, "state": "generating"}}
+        if task["failed"]:
+            return {"code": 200, "data": {"taskId": task_id, "state": "fail", "failMsg": "simulated failure"}}
+        return {"code": 200, "data": {
+            "taskId": task_id,
+            "state": "success",
+            "resultJson": json.dumps({"resultUrls": [f"https://sim.cdn/{task_id}.png"]}),
+        }}
+
+    async def get_task_statuses(self, task_ids: list[str]) -> dict[str, dict]:
+        return {t: await self.get_task_status(t) for t in task_ids if t in self.tasks}
+
+
+class Simulator:
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.clock = VirtualClock()
+        self.kie = FakeKIE(self)
+        self.inngest = _SimInngest(self)
+        self._heap: list = []
+        self._seq = 0
+        self._baton = asyncio.Event()
+        self._tasks: set = set()
+        self.queries = 0
+        self.runs = {"finished": 0, "errored": 0, "step_state_bytes": []}
+        self.submitted: list[str] = []
+        self.rejected = 0
+        self.outstanding = 0
+
+    # ── Virtual-time scheduling ──
+    async def wait(self, at: float) -> None:
+        """Block the running task until virtual time ``at`` and hand control back."""
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (at, self._seq, fut))
+        self._seq += 1
+        self._baton.set()
+        await fut
+
+    def spawn(self, at: float, coro) -> None:
+        """Start ``coro`` at virtual time ``at`` (its timer is registered immediately)."""
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (at, self._seq, fut))
+        self._seq += 1
+
+        async def runner():
+            try:
+                await fut
+                await coro
+            finally:
+                self._baton.set()
+
+        task = asyncio.ensure_future(runner())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drive(self) -> None:
+        """Wake timers in virtual-time order, one task at a time."""
+        while self._heap:
+            at, _, fut = heapq.heappop(self._heap)
+            self.clock.t = max(self.clock.t, at)
+            self._baton.clear()
+            fut.set_result(None)
+            await self._baton.wait()
+
+    # ── Actors ──
+    async def submit(self, user_id: str, model_slug: str, n: int) -> None:
+        from fastapi import HTTPException
+        from app.routes.generate import create_generation
+        from app.schemas import GenerateRequest
+
+        async with async_session() as db:
+            try:
+                resp = await create_generation(
+                    GenerateRequest(prompt=f"sim prompt {n}", model_slug=model_slug),
+                    user_id=user_id,
+                    db=db,
+                    _rl=None,
+                    idempotency_key=None,
+                    events=self.inngest,
+                )
+            except HTTPException:
+                self.rejected += 1
+                return
+        self.submitted.append(resp.id)
+
+    async def run_pipeline(self, data: dict) -> None:
+        from app.inngest_client import run_generation_pipeline
+
+        self.outstanding += 1
+        memo: dict = {}
+        try:
+            for attempt in range(self.config.step_retries + 1):
+                try:
+                    result = await run_generation_pipeline(SimStep(self, memo), data, kie=self.kie)
+                except Exception:
+                    if attempt == self.config.step_retries:
+                        self.runs["errored"] += 1
+                        return
+                    # Inngest retry backoff
+                    await self.wait(self.clock.t + 10 * 2 ** attempt)
+                    continue
+                self.runs["finished"] += 1
+                self.runs["step_state_bytes"].append(result.get("step_state_bytes", 0))
+                return
+        finally:
+            self.outstanding -= 1
+
+    async def deliver_webhook(self, task_id: str, failed: bool) -> None:
+        body = {"task_id": task_id, "status": "failed" if failed else "completed"}
+        if failed:
+            body["error"] = "simulated failure"
+        else:
+            body["output"] = {"image_url": f"https://sim.cdn/{task_id}.png"}
+        await self._http.post("/webhook/kie", json=body)
+        # No lifespan here, so no inbox worker: apply the accepted callback right away
+        await webhook_inbox.drain(async_session)
+
+    async def reconcile_tick(self) -> None:
+        from app.reconciler import reconcile_stale_generations
+
+        await reconcile_stale_generations(async_session, kie=self.kie)
+        if self.outstanding or self._pending_arrivals():
+            self.spawn(self.clock.t + self.config.reconcile_every, self.reconcile_tick())
+        else:
+            # Final sweep once every run has ended and anything stuck is past its deadline
+            from app.reconciler import settings as reconcile_settings
+            deadline = max(
+                reconcile_settings.reconcile_max_age_minutes,
+                reconcile_settings.reconcile_queue_deadline_minutes,
+            ) * 60
+            self.spawn(self.clock.t + deadline, self._final_sweep())
+
+    async def _final_sweep(self) -> None:
+        from app.reconciler import reconcile_stale_generations
+        await reconcile_stale_generations(async_session, kie=self.kie)
+
+    def _pending_arrivals(self) -> bool:
+        return len(self.submitted) + self.rejected < self.config.generations
+
+    # ── Setup / report ──
+    async def _seed(self) -> list[str]:
+        async with async_session() as db:
+            for slug, category, price in SIM_MODELS:
+                exists = await db.execute(select(AIModel).where(AIModel.slug == slug))
+                if not exists.scalar_one_or_none():
+                    db.add(AIModel(
+                        name=slug, slug=slug, provider_model_id=slug,
+                        category=category, price_multiplier=price,
+                    ))
+            user_ids = []
+            for i in range(self.config.users):
+                user = User(email=f"sim-{self.config.seed}-{i}@sim.local", hashed_password="x")
+                db.add(user)
+                await db.flush()
+                db.add(CreditAccount(
+                    owner_id=user.id,
+                    balance=self.config.initial_balance,
+                    total_earned=self.config.initial_balance,
+                ))
+                user_ids.append(user.id)
+            await db.commit()
+        await catalog.reload()
+        return user_ids
+
+    def _schedule_arrivals(self, user_ids: list[str]) -> None:
+        slugs = list(self.config.model_mix)
+        weights = [self.config.model_mix[s] for s in slugs]
+        t = 0.0
+        for n in range(self.config.generations):
+            if self.config.arrival_rate > 0:
+                t += self.rng.expovariate(self.config.arrival_rate)
+            user_id = self.rng.choice(user_ids)
+            slug = self.rng.choices(slugs, weights)[0]
+            self.spawn(t, self.submit(user_id, slug, n))
+
+    async def _check_refunds(self, user_ids: list[str]) -> list[str]:
+        """Every credit must be either spent on a success, held by a live job, or refunded once."""
+        errors = []
+        async with async_session() as db:
+            gens = (await db.execute(
+                select(Generation).where(Generation.user_id.in_(user_ids))
+            )).scalars().all()
+            refunds = dict((await db.execute(
+                select(CreditTransaction.generation_id, func.count())
+                .where(CreditTransaction.type == "refund")
+                .group_by(CreditTransaction.generation_id)
+            )).all())
+            accounts = {
+                a.owner_id: a for a in (await db.execute(
+                    select(CreditAccount).where(CreditAccount.owner_id.in_(user_ids))
+                )).scalars().all()
+            }
+
+        expected_spend: dict[str, float] = {u: 0.0 for u in user_ids}
+        for g in gens:
+            n_refunds = refunds.get(g.id, 0)
+            if g.status == "failed" and g.credits_reserved > 0 and n_refunds != 1:
+                errors.append(f"{g.id}: failed with {n_refunds} refunds")
+            if g.status != "failed" and n_refunds:
+                errors.append(f"{g.id}: {g.status} but refunded")
+            if g.status == "succeeded":
+                expected_spend[g.user_id] += g.credits_final
+            elif g.status not in TERMINAL_STATUSES:
+                expected_spend[g.user_id] += g.credits_reserved
+
+        for user_id, account in accounts.items():
+            spent = self.config.initial_balance - account.balance
+            if abs(spent - expected_spend[user_id]) > 1e-6:
+                errors.append(f"user {user_id}: spent {spent}, expected {expected_spend[user_id]}")
+        return errors
+
+    async def _summary(self, user_ids: list[str], wall: float) -> dict:
+        async with async_session() as db:
+            by_status = dict((await db.execute(
+                select(Generation.status, func.count())
+                .where(Generation.user_id.in_(user_ids))
+                .group_by(Generation.status)
+            )).all())
+            done = (await db.execute(
+                select(Generation.created_at, Generation.completed_at)
+                .where(Generation.user_id.in_(user_ids), Generation.completed_at.is_not(None))
+            )).all()
+
+        latencies = sorted((c - s).total_seconds() for s, c in done)
+        makespan = max(
+            ((c.replace(tzinfo=timezone.utc) - self.clock.epoch).total_seconds() for _, c in done),
+            default=0.0,
+        )
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        state = self.runs["step_state_bytes"]
+        completed = by_status.get("succeeded", 0) + by_status.get("failed", 0)
+        return {
+            "submitted": len(self.submitted),
+            "rejected": self.rejected,
+            "by_status": by_status,
+            "makespan_virtual_s": round(makespan, 1),
+            "wall_seconds": round(wall, 2),
+            "completed_per_virtual_minute": round(completed / max(makespan / 60, 1e-9), 2),
+            "latency_p50_s": round(pct(0.5), 1),
+            "latency_p95_s": round(pct(0.95), 1),
+            "db_queries": self.queries,
+            "db_queries_per_generation": round(self.queries / max(len(self.submitted), 1), 1),
+            "runs_finished": self.runs["finished"],
+            "runs_errored": self.runs["errored"],
+            "step_state_bytes_mean": round(sum(state) / len(state), 1) if state else 0,
+            "step_state_bytes_max": max(state, default=0),
+            "refund_errors": await self._check_refunds(user_ids),
+        }
+
+    async def run(self) -> dict:
+        import httpx
+        from app.main import app
+
+        def count_query(*_args, **_kwargs):
+            self.queries += 1
+
+        previous_clock = clock.use_clock(self.clock)
+        previous_echo, engine.echo = engine.echo, False  # SQL echo would dominate the run
+        lanes.reset()
+        user_ids = await self._seed()
+        event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+        started = time.perf_counter()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://sim") as http:
+                self._http = http
+                self._schedule_arrivals(user_ids)
+                self.spawn(self.config.reconcile_every, self.reconcile_tick())
+                await self._drive()
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count_query)
+            clock.use_clock(previous_clock)
+            engine.echo = previous_echo
+            lanes.reset()
+        return await self._summary(user_ids, time.perf_counter() - started)
+
+
+async def simulate(config: SimConfig | None = None) -> dict:
+    """Run one simulation and return its report."""
+    return await Simulator(config or SimConfig()).run()
@@ -0,0 +1,257 @@
+"""
+ReklamAI v2.0 — Webhook Inbox
+KIE callbacks are acknowledged as soon as they are verified and stored:
+/webhook/kie inserts one `webhook_inbox` row and answers 202, and a worker
+applies the rows in batched transactions.
+
+Per batch, the callbacks of one task are coalesced before anything is
+written: the first terminal callback (completed / succeeded / failed /
+error) wins, otherwise only the latest `processing` update is applied. The
+inbox is bounded (`webhook_inbox_max_rows`); above it the route answers 503
+with Retry-After so KIE redelivers later instead of piling up rows.
+
+Every worker process runs the apply loop. It wakes on its own enqueues and
+every `webhook_inbox_poll_seconds` for rows accepted by other workers;
+batches are claimed with FOR UPDATE SKIP LOCKED, so workers never apply the
+same row twice.
+
+A callback can arrive before the pipeline has saved its generation's task
+id. Rows of an unknown task stay in the inbox and are retried with doubling
+delays (`webhook_inbox_unmatched_*`); only after the last attempt are they
+dropped.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.clock import utcnow
+from app.config import get_settings
+from app.events import publish_generation
+from app.lifecycle import TERMINAL_STATUSES, mark_failed, mark_succeeded, set_status
+from app.metrics import metrics
+from app.models import Generation, WebhookInboxItem
+
+settings = get_settings()
+logger = logging.getLogger("uvicorn")
+
+SUCCEEDED = ("completed", "succeeded")
+FAILED = ("failed", "error")
+
+
+async def enqueue(db: AsyncSession, task_id: str, status: str, body: dict) -> bool:
+    """Store one verified callback; False (nothing stored) when the inbox is full."""
+    depth = (await db.execute(
+        select(func.count()).select_from(
+            select(WebhookInboxItem.id).limit(settings.webhook_inbox_max_rows).subquery()
+        )
+    )).scalar_one()
+    if depth >= settings.webhook_inbox_max_rows:
+        metrics.inc("webhook_inbox_rejected")
+        return False
+    db.add(WebhookInboxItem(task_id=task_id, status=status, body=body))
+    await db.commit()
+    metrics.inc("webhook_inbox_enqueued")
+    return True
+
+
+def _due(now):
+    """Rows not waiting for a retry of an unknown task."""
+    return or_(WebhookInboxItem.retry_at.is_(None), WebhookInboxItem.retry_at <= now)
+
+
+def coalesce(items: list[WebhookInboxItem]) -> dict[str, WebhookInboxItem]:
+    """The one callback per task worth applying from ``items`` (arrival order)."""
+    latest: dict[str, WebhookInboxItem] = {}
+    for item in items:
+        current = latest.get(item.task_id)
+        if current is not None and current.status in SUCCEEDED + FAILED:
+            continue  # the first terminal callback wins, later ones are duplicates
+        if current is None or item.status in SUCCEEDED + FAILED or item.status == "processing":
+            latest[item.task_id] = item
+    return latest
+
+
+async def apply_callback(db: AsyncSession, gen: Generation, status: str, body: dict) -> bool:
+    """Apply one KIE callback to ``gen``; False when there was nothing to change."""
+    if gen.status in TERMINAL_STATUSES:
+        # Late or duplicate delivery — never finalize (or refund) twice
+        logger.info(f"[WEBHOOK] Generation {gen.id} already {gen.status}, ignoring")
+        return False
+
+    if status in SUCCEEDED:
+        output = body.get("output") or {}
+        result_url, result_urls, thumbnail_url = "", [], ""
+        if isinstance(output, dict):
+            result_url = output.get("video_url", "") or output.get("image_url", "")
+            result_urls = output.get("urls", []) or []
+            if result_urls and not result_url:
+                result_url = result_urls[0]
+            thumbnail_url = output.get("thumbnail_url", "")
+        await mark_succeeded(
+            db, gen,
+            result_url=result_url,
+            result_urls=result_urls,
+            thumbnail_url=thumbnail_url,
+            provider_response=body,
+        )
+    elif status in FAILED:
+        await mark_failed(db, gen, body.get("error") or str(body), provider_response=body)
+    elif status == "processing":
+        await set_status(db, gen, "processing")
+        progress = body.get("progress", 0)
+        if progress:
+            gen.progress = int(progress)
+    else:
+        return False
+    return True
+
+
+class WebhookInbox:
+    """Apply loop over the `webhook_inbox` table."""
+
+    def __init__(self, batch_size: int, poll_seconds: float):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def apply_batch(self, session_factory: async_sessionmaker, limit: int) -> int:
+        """Apply up to ``limit`` due callbacks in one transaction; returns rows taken (applied or deferred)."""
+        changed = []
+        deferred = dropped = 0
+        now = utcnow()
+        async with session_factory() as db:
+            items = (await db.execute(
+                select(WebhookInboxItem)
+                .where(_due(now))
+                .order_by(WebhookInboxItem.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            if not items:
+                return 0
+
+            latest = coalesce(items)
+            gens = {
+                g.provider_task_id: g
+                for g in (await db.execute(
+                    select(Generation)
+                    .where(Generation.provider_task_id.in_(latest))
+                    .order_by(Generation.id)  # stable lock order across workers
+                    .with_for_update()
+                )).scalars().all()
+            }
+            done = []
+            for task_id, item in latest.items():
+                gen = gens.get(task_id)
+                if gen is None:
+                    # The callback can beat save-task-id: keep the task's rows for a while
+                    waiting = [i for i in items if i.task_id == task_id]
+                    attempts = waiting[0].attempts  # the oldest row has waited longest
+                    if attempts + 1 < settings.webhook_inbox_unmatched_attempts:
+                        retry_at = now + timedelta(seconds=settings.webhook_inbox_unmatched_retry_seconds * 2 ** attempts)
+                        for i in waiting:
+                            i.attempts, i.retry_at = attempts + 1, retry_at
+                        deferred += len(waiting)
+                        continue
+                    logger.warning(f"[WEBHOOK] Generation not found for task_id={task_id}, dropping")
+                    dropped += len(waiting)
+                elif await apply_callback(db, gen, item.status, item.body or {}):
+                    changed.append(gen)
+                done.append(task_id)
+
+            await db.execute(delete(WebhookInboxItem).where(
+                WebhookInboxItem.id.in_([i.id for i in items if i.task_id in done])
+            ))
+            await db.commit()
+
+        await publish_generation(*changed)
+        for gen in changed:
+            logger.info(f"[WEBHOOK] Updated generation {gen.id} -> {gen.status}")
+        metrics.inc("webhook_inbox_applied", len(items) - deferred - dropped)
+        metrics.inc("webhook_inbox_coalesced", len(items) - len(latest))
+        if deferred:
+            metrics.inc("webhook_inbox_deferred", deferred)
+        if dropped:
+            metrics.inc("webhook_inbox_dropped", dropped)
+        return len(items)
+
+    async def _drop_head(self, session_factory: async_sessionmaker) -> int:
+        """Remove the oldest row after it failed on its own, so it cannot block the inbox."""
+        async with session_factory() as db:
+            item = (await db.execute(
+                select(WebhookInboxItem)
+                .where(_due(utcnow()))
+                .order_by(WebhookInboxItem.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).scalar_one_or_none()
+            if item is None:
+                return 0
+            logger.error(f"[WEBHOOK] Dropping callback {item.id} for task_id={item.task_id}: {item.body}")
+            await db.delete(item)
+            await db.commit()
+        metrics.inc("webhook_inbox_dropped")
+        return 1
+
+    async def drain(self, session_factory: async_sessionmaker) -> int:
+        """Apply everything queued now; returns rows consumed."""
+        consumed = 0
+        while not self._stopping:
+            try:
+                n = await self.apply_batch(session_factory, self.batch_size)
+            except DBAPIError:
+                raise  # database trouble: keep every row, the next round retries
+            except Exception as e:
+                logger.error(f"[WEBHOOK] Batch failed, retrying one by one: {e}")
+                try:
+                    n = await self.apply_batch(session_factory, 1)
+                except DBAPIError:
+                    raise
+                except Exception as e:
+                    logger.error(f"[WEBHOOK] Callback failed: {e}")
+                    n = await self._drop_head(session_factory)
+            if not n:
+                break
+            consumed += n
+        return consumed
+
+    async def _run(self, session_factory: async_sessionmaker) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                await self.drain(session_factory)
+            except Exception as e:
+                logger.error(f"[WEBHOOK] Inbox drain failed: {e}")
+
+    def start(self, session_factory: async_sessionmaker) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        """Finish the batch in flight, then stop; queued rows wait for the next start."""
+        if self._task is not None:
+            self._stopping = True
+            self.wake()
+            await self._task
+        self._task = None
+        self._stopping = False
+
+
+# Singleton
+webhook_inbox = WebhookInbox(settings.webhook_inbox_batch_size, settings.webhook_inbox_poll_seconds)
@@ -0,0 +1,33 @@
+"""Capacity lanes — generations.lane + scheduler index
+
+Revision ID: 002_generation_lanes
+Revises: 001_initial
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002_generation_lanes"
+down_revision: Union[str, None] = "001_initial"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "generations",
+        sa.Column("lane", sa.String(30), server_default="default"),
+    )
+    op.create_index(
+        "ix_generations_lane_status_created",
+        "generations",
+        ["lane", "status", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generations_lane_status_created", table_name="generations")
+    op.drop_column("generations", "lane")
@@ -0,0 +1,27 @@
+"""Reconciler — (status, created_at) index on generations
+
+Revision ID: 003_reconciler_index
+Revises: 002_generation_lanes
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "003_reconciler_index"
+down_revision: Union[str, None] = "002_generation_lanes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_generations_status_created",
+        "generations",
+        ["status", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generations_status_created", table_name="generations")
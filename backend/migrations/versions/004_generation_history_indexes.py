@@ -0,0 +1,34 @@
+"""History pages — (user_id, [status,] created_at DESC, id DESC) indexes on generations
+
+Revision ID: 004_generation_history_indexes
+Revises: 003_reconciler_index
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "004_generation_history_indexes"
+down_revision: Union[str, None] = "003_reconciler_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_generations_user_created",
+        "generations",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_generations_user_status_created",
+        "generations",
+        ["user_id", "status", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generations_user_status_created", table_name="generations")
+    op.drop_index("ix_generations_user_created", table_name="generations")
@@ -0,0 +1,35 @@
+"""Generation counters — per-user, per-status counts for list totals
+
+Revision ID: 005_generation_counters
+Revises: 004_generation_history_indexes
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "005_generation_counters"
+down_revision: Union[str, None] = "004_generation_history_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_counters",
+        sa.Column("user_id", sa.String(36), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("status", sa.String(30), primary_key=True),
+        sa.Column("count", sa.Integer, nullable=False, server_default="0"),
+    )
+    # Backfill from existing generations
+    op.execute(
+        "INSERT INTO generation_counters (user_id, status, count) "
+        "SELECT user_id, status, COUNT(*) FROM generations "
+        "WHERE status IS NOT NULL GROUP BY user_id, status"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("generation_counters")
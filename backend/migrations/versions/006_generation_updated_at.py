@@ -0,0 +1,30 @@
+"""Bulk status — generations.updated_at and (user_id, updated_at) index
+
+Revision ID: 006_generation_updated_at
+Revises: 005_generation_counters
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "006_generation_updated_at"
+down_revision: Union[str, None] = "005_generation_counters"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("generations", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    # Best guess at the last change of existing rows
+    op.execute(
+        "UPDATE generations SET updated_at = COALESCE(completed_at, started_at, created_at)"
+    )
+    op.create_index("ix_generations_user_updated", "generations", ["user_id", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generations_user_updated", table_name="generations")
+    op.drop_column("generations", "updated_at")
@@ -0,0 +1,41 @@
+"""Result cache — identical deterministic generation requests
+
+Revision ID: 008_result_cache
+Revises: 007_idempotency_keys
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008_result_cache"
+down_revision: Union[str, None] = "007_idempotency_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("generations", sa.Column("cache_key", sa.String(64), server_default=""))
+    op.create_table(
+        "result_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("model_slug", sa.String(100), server_default=""),
+        sa.Column("result_url", sa.Text, server_default=""),
+        sa.Column("result_urls", sa.JSON),
+        sa.Column("thumbnail_url", sa.Text, server_default=""),
+        sa.Column("hits", sa.Integer, server_default="0"),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("last_hit_at", sa.DateTime()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_result_cache_last_hit_at", "result_cache", ["last_hit_at"])
+    op.create_index("ix_result_cache_expires_at", "result_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_result_cache_expires_at", table_name="result_cache")
+    op.drop_index("ix_result_cache_last_hit_at", table_name="result_cache")
+    op.drop_table("result_cache")
+    op.drop_column("generations", "cache_key")
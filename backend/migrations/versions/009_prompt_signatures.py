@@ -0,0 +1,25 @@
+"""Similar prompts — MinHash signature of generations.prompt
+
+Revision ID: 009_prompt_signatures
+Revises: 008_result_cache
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009_prompt_signatures"
+down_revision: Union[str, None] = "008_result_cache"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows stay NULL: the index hashes their prompt when it loads them
+    op.add_column("generations", sa.Column("prompt_signature", sa.LargeBinary, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("generations", "prompt_signature")
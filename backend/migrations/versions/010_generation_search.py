@@ -0,0 +1,60 @@
+"""History search — full-text index on generations.prompt, (user_id, model_slug) index
+
+Revision ID: 010_generation_search
+Revises: 009_prompt_signatures
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "010_generation_search"
+down_revision: Union[str, None] = "009_prompt_signatures"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same statements as app/models.py runs after create_all
+PG_PROMPT_TSV_DDL = (
+    "ALTER TABLE generations ADD COLUMN IF NOT EXISTS prompt_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(prompt, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_generations_prompt_tsv ON generations USING gin (prompt_tsv)",
+)
+SQLITE_PROMPT_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(prompt, content='generations')",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_ai AFTER INSERT ON generations BEGIN "
+    "INSERT INTO generations_fts(rowid, prompt) VALUES (new.rowid, new.prompt); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_ad AFTER DELETE ON generations BEGIN "
+    "INSERT INTO generations_fts(generations_fts, rowid, prompt) VALUES ('delete', old.rowid, old.prompt); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_au AFTER UPDATE OF prompt ON generations BEGIN "
+    "INSERT INTO generations_fts(generations_fts, rowid, prompt) VALUES ('delete', old.rowid, old.prompt); "
+    "INSERT INTO generations_fts(rowid, prompt) VALUES (new.rowid, new.prompt); END",
+)
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_generations_user_model_created",
+        "generations",
+        ["user_id", "model_slug", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        for ddl in PG_PROMPT_TSV_DDL:
+            op.execute(ddl)
+    else:
+        for ddl in SQLITE_PROMPT_FTS_DDL:
+            op.execute(ddl)
+        # Index the prompts that already exist
+        op.execute("INSERT INTO generations_fts(generations_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_generations_prompt_tsv")
+        op.execute("ALTER TABLE generations DROP COLUMN IF EXISTS prompt_tsv")
+    else:
+        op.execute("DROP TABLE IF EXISTS generations_fts")
+        for trigger in ("generations_fts_ai", "generations_fts_ad", "generations_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_index("ix_generations_user_model_created", table_name="generations")
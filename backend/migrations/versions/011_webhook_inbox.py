@@ -0,0 +1,33 @@
+"""Webhook inbox — KIE callbacks acknowledged before they are applied
+
+Revision ID: 011_webhook_inbox
+Revises: 010_generation_search
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "011_webhook_inbox"
+down_revision: Union[str, None] = "010_generation_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "webhook_inbox",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("task_id", sa.String(200), nullable=False),
+        sa.Column("status", sa.String(30), server_default=""),
+        sa.Column("body", sa.JSON),
+        sa.Column("received_at", sa.DateTime()),
+    )
+    op.create_index("ix_webhook_inbox_task_id", "webhook_inbox", ["task_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_inbox_task_id", table_name="webhook_inbox")
+    op.drop_table("webhook_inbox")
@@ -0,0 +1,28 @@
+"""Completion estimates — (model_slug, status, completed_at) index on generations
+
+Revision ID: 012_latency_seed_index
+Revises: 011_webhook_inbox
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012_latency_seed_index"
+down_revision: Union[str, None] = "011_webhook_inbox"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_generations_model_status_completed",
+        "generations",
+        ["model_slug", "status", sa.text("completed_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generations_model_status_completed", table_name="generations")
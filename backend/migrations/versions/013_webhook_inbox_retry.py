@@ -0,0 +1,26 @@
+"""Webhook inbox — retry callbacks that arrive before their generation's task id
+
+Revision ID: 013_webhook_inbox_retry
+Revises: 012_latency_seed_index
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013_webhook_inbox_retry"
+down_revision: Union[str, None] = "012_latency_seed_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("webhook_inbox", sa.Column("attempts", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("webhook_inbox", sa.Column("retry_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("webhook_inbox", "retry_at")
+    op.drop_column("webhook_inbox", "attempts")
@@ -0,0 +1,125 @@
+"""
+ReklamAI v2.0 — Credit Reservation Benchmark
+Concurrent generation requests against ONE credit account, comparing the
+database work of create_generation before and after the conditional debit:
+
+    locked    SELECT ... FOR UPDATE, balance check in Python, ORM writes,
+              flush, ledger link UPDATE, commit, refresh
+    atomic    UPDATE ... WHERE balance >= cost RETURNING id, then the
+              generation + ledger inserts in one flush, commit
+
+Row-lock contention only shows on PostgreSQL:
+
+    DATABASE_URL=postgresql+asyncpg://... python scripts/bench_credit_reservation.py --requests 2000 --concurrency 32
+
+On the default in-memory SQLite all sessions share one connection, so it
+measures round trips only (run with --concurrency 1).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("DEBUG", "1")
+os.environ.setdefault("KIE_API_KEY", "bench")
+
+from sqlalchemy import select, update  # noqa: E402
+
+from app.database import engine, Base, async_session  # noqa: E402
+from app.lifecycle import record_created  # noqa: E402
+from app.models import User, CreditAccount, CreditTransaction, Generation, gen_uuid  # noqa: E402
+from app.routes.generate import reserve_credits  # noqa: E402
+
+COST = 1.0
+
+
+async def locked(user_id: str) -> None:
+    async with async_session() as db:
+        account = (await db.execute(
+            select(CreditAccount).where(CreditAccount.owner_id == user_id).with_for_update()
+        )).scalar_one()
+        if account.balance < COST:
+            raise RuntimeError("insufficient credits")
+        account.balance -= COST
+        account.total_spent += COST
+        tx = CreditTransaction(account_id=account.id, amount=-COST, type="reserve")
+        db.add(tx)
+        generation = Generation(user_id=user_id, prompt="bench", credits_reserved=COST)
+        db.add(generation)
+        await db.flush()
+        await record_created(db, generation)
+        tx.generation_id = generation.id
+        await db.commit()
+        await db.refresh(generation)
+
+
+async def atomic(user_id: str) -> None:
+    async with async_session() as db:
+        account_id = await reserve_credits(db, user_id, COST)
+        generation = Generation(id=gen_uuid(), user_id=user_id, prompt="bench", credits_reserved=COST)
+        db.add(generation)
+        db.add(CreditTransaction(account_id=account_id, amount=-COST, type="reserve", generation_id=generation.id))
+        await db.flush()
+        await record_created(db, generation)
+        await db.commit()
+
+
+async def run(path, user_id: str, requests: int, concurrency: int) -> dict:
+    async with async_session() as db:
+        await db.execute(update(CreditAccount).where(CreditAccount.owner_id == user_id).values(balance=requests * COST))
+        await db.commit()
+
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            await path(user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    async with async_session() as db:
+        balance = (await db.execute(
+            select(CreditAccount.balance).where(CreditAccount.owner_id == user_id)
+        )).scalar_one()
+    return {"requests_per_s": round(requests / elapsed), "final_balance": balance}
+
+
+async def main(args):
+    engine.echo = False
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        user = User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        db.add(CreditAccount(owner_id=user.id, balance=0.0))
+        await db.commit()
+
+    before = await run(locked, user.id, args.requests, args.concurrency)
+    after = await run(atomic, user.id, args.requests, args.concurrency)
+    print(json.dumps({
+        "dialect": engine.dialect.name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "locked": before,
+        "atomic": after,
+        "speedup": round(after["requests_per_s"] / before["requests_per_s"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark credit reservation on one account")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""
+ReklamAI v2.0 — Generation Read Benchmark
+Compares the history-page read before (full entities, heavy JSON columns
+included) and after (slim projection, heavy columns deferred): bytes fetched
+from the database and materialization cost per row, on in-memory SQLite.
+
+    python scripts/bench_generation_reads.py --rows 2000 --page 100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("DEBUG", "1")
+os.environ.setdefault("KIE_API_KEY", "bench")
+
+from sqlalchemy import desc, select  # noqa: E402
+from sqlalchemy.orm import load_only, undefer  # noqa: E402
+
+from app.database import engine, Base, async_session  # noqa: E402
+from app.models import User, Generation  # noqa: E402
+from app.routes.generate import RESPONSE_COLUMNS  # noqa: E402
+from app.schemas import GenerationResponse  # noqa: E402
+
+
+def provider_body(i: int) -> dict:
+    """A KIE recordInfo-sized payload."""
+    return {
+        "code": 200,
+        "data": {
+            "taskId": f"task-{i}",
+            "state": "success",
+            "resultJson": json.dumps({"resultUrls": [f"https://cdn.example.com/{i}/{n}.png" for n in range(4)]}),
+            "param": json.dumps({"prompt": "x" * 1500, "aspect_ratio": "16:9"}),
+            "costTime": 41234,
+            "consumeCredits": 12,
+        },
+    }
+
+
+async def seed(rows: int) -> str:
+    async with async_session() as db:
+        user = User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        db.add_all([
+            Generation(
+                user_id=user.id,
+                status="succeeded",
+                prompt=f"prompt {i}",
+                result_url=f"https://cdn.example.com/{i}/0.png",
+                result_urls=[f"https://cdn.example.com/{i}/{n}.png" for n in range(4)],
+                params={"seed": i, "strength": 0.7, "style": "cinematic", "loras": ["a", "b"]},
+                provider_response=provider_body(i),
+            )
+            for i in range(rows)
+        ])
+        await db.commit()
+        return user.id
+
+
+def page_query(user_id: str, page: int, slim: bool):
+    query = select(Generation).where(Generation.user_id == user_id)
+    if slim:
+        query = query.options(load_only(*RESPONSE_COLUMNS))
+    else:
+        query = query.options(undefer(Generation.params), undefer(Generation.provider_response))
+    return query.order_by(desc(Generation.created_at), desc(Generation.id)).limit(page)
+
+
+async def measure(user_id: str, page: int, repeat: int, slim: bool) -> dict:
+    # Bytes: raw column values as the driver hands them over
+    async with engine.connect() as conn:
+        rows = (await conn.execute(page_query(user_id, page, slim))).all()
+        fetched = sum(len(str(v)) for row in rows for v in row if v is not None)
+        columns = len(rows[0]) if rows else 0
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        async with async_session() as db:
+            gens = (await db.execute(page_query(user_id, page, slim))).scalars().all()
+            [GenerationResponse.model_validate(g) for g in gens]
+    elapsed = time.perf_counter() - started
+    materialized = repeat * len(rows)
+    return {
+        "columns": columns,
+        "bytes_per_page": fetched,
+        "bytes_per_row": round(fetched / max(len(rows), 1)),
+        "us_per_row": round(elapsed / max(materialized, 1) * 1e6, 2),
+    }
+
+
+async def main(args):
+    engine.echo = False
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user_id = await seed(args.rows)
+
+    before = await measure(user_id, args.page, args.repeat, slim=False)
+    after = await measure(user_id, args.page, args.repeat, slim=True)
+    print(json.dumps({
+        "rows": args.rows,
+        "page": args.page,
+        "before": before,
+        "after": after,
+        "bytes_saved": f"{1 - after['bytes_per_page'] / before['bytes_per_page']:.0%}",
+        "speedup": round(before["us_per_row"] / after["us_per_row"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generation history reads")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+"""
+ReklamAI v2.0 — List Serialization Benchmark
+Rows per second for a /api/generations page, from query to JSON bytes:
+
+    standard  ORM entities -> model_validate per row -> response_model
+              re-validation -> jsonable dict -> json.dumps (FastAPI default)
+    fast      Row tuples -> one precompiled TypeAdapter pass -> bytes (JsonView)
+
+    python scripts/bench_json_serialization.py --pages 20 100 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("DEBUG", "1")
+os.environ.setdefault("KIE_API_KEY", "bench")
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import desc, select  # noqa: E402
+from sqlalchemy.orm import load_only  # noqa: E402
+
+from app.database import engine, Base, async_session  # noqa: E402
+from app.models import User, Generation  # noqa: E402
+from app.routes.generate import RESPONSE_COLUMNS, generation_list_json  # noqa: E402
+from app.schemas import GenerationListResponse, GenerationResponse  # noqa: E402
+
+_response_model = TypeAdapter(GenerationListResponse)
+
+
+async def seed(rows: int) -> str:
+    async with async_session() as db:
+        user = User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        db.add_all([
+            Generation(
+                user_id=user.id,
+                status="succeeded",
+                prompt=f"cinematic product shot, variant {i}",
+                result_url=f"https://cdn.example.com/{i}/0.png",
+                result_urls=[f"https://cdn.example.com/{i}/{n}.png" for n in range(4)],
+                credits_reserved=12.0,
+                credits_final=12.0,
+            )
+            for i in range(rows)
+        ])
+        await db.commit()
+        return user.id
+
+
+def order(query, page: int):
+    return query.order_by(desc(Generation.created_at), desc(Generation.id)).limit(page)
+
+
+async def standard(user_id: str, page: int) -> bytes:
+    async with async_session() as db:
+        query = select(Generation).options(load_only(*RESPONSE_COLUMNS)).where(Generation.user_id == user_id)
+        gens = (await db.execute(order(query, page))).scalars().all()
+    resp = GenerationListResponse(
+        items=[GenerationResponse.model_validate(g) for g in gens], total=len(gens),
+    )
+    value = _response_model.validate_python(resp)
+    return json.dumps(_response_model.dump_python(value, mode="json")).encode()
+
+
+async def fast(user_id: str, page: int) -> bytes:
+    async with async_session() as db:
+        query = select(*RESPONSE_COLUMNS).where(Generation.user_id == user_id)
+        rows = (await db.execute(order(query, page))).all()
+    return generation_list_json.dump({"items": rows, "total": len(rows), "next_cursor": None})
+
+
+async def rows_per_second(path, user_id: str, page: int, min_rows: int) -> int:
+    repeat = max(min_rows // page, 3)
+    await path(user_id, page)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await path(user_id, page)
+    return round(repeat * page / (time.perf_counter() - started))
+
+
+async def main(args):
+    engine.echo = False
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user_id = await seed(max(args.pages))
+
+    assert json.loads(await standard(user_id, 20)) == json.loads(await fast(user_id, 20))
+
+    report = {}
+    for page in args.pages:
+        before = await rows_per_second(standard, user_id, page, args.min_rows)
+        after = await rows_per_second(fast, user_id, page, args.min_rows)
+        report[page] = {"standard_rows_per_s": before, "fast_rows_per_s": after, "speedup": round(after / before, 2)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list serialization paths")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 1000])
+    parser.add_argument("--min-rows", type=int, default=20000, help="rows serialized per measurement")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""
+ReklamAI v2.0 — Similar Prompt Benchmark
+Signature cost per prompt and top-k query latency for one user's index.
+
+    python scripts/bench_similarity.py --rows 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("KIE_API_KEY", "bench")
+
+import numpy as np  # noqa: E402
+
+from app.similarity import SimilarityIndex, _UserIndex, signature  # noqa: E402
+
+WORDS = (
+    "red blue neon sneaker bottle perfume watch podium studio light shadow beach city night "
+    "sunrise drone macro closeup product minimal marble wood gold smoke water splash cinematic"
+).split()
+
+
+def prompt(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+
+
+async def main(args):
+    rng = random.Random(1)
+    prompts = [prompt(rng) for _ in range(args.rows)]
+
+    started = time.perf_counter()
+    matrix = np.vstack([signature(p) for p in prompts])
+    hashing_us = (time.perf_counter() - started) / args.rows * 1e6
+
+    index = SimilarityIndex(max_users=1)
+    index._users["bench"] = _UserIndex(ids=[str(i) for i in range(args.rows)], matrix=matrix, loaded_until=None)
+
+    queries = [prompt(rng) for _ in range(args.queries)]
+    started = time.perf_counter()
+    for q in queries:
+        await index.search(None, "bench", q, args.k, 0.0)
+    query_ms = (time.perf_counter() - started) / args.queries * 1e3
+
+    print(json.dumps({
+        "rows": args.rows,
+        "index_bytes": matrix.nbytes,
+        "signature_us_per_prompt": round(hashing_us, 1),
+        "query_ms": round(query_ms, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the similar-prompt index")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
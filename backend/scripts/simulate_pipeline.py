@@ -0,0 +1,59 @@
+"""
+ReklamAI v2.0 — Pipeline Simulation
+Runs the generation pipeline on virtual time against an in-memory SQLite
+database and prints throughput, latency, DB query and refund figures.
+
+    python scripts/simulate_pipeline.py --generations 1000 --users 50 --rate 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("DEBUG", "1")
+os.environ.setdefault("KIE_API_KEY", "simulated")
+
+from app.database import engine, Base  # noqa: E402
+from app.simulation import SimConfig, simulate  # noqa: E402
+
+
+def parse_args() -> SimConfig:
+    parser = argparse.ArgumentParser(description="Simulate the generation pipeline on virtual time")
+    parser.add_argument("--generations", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per virtual second (0 = all at once)")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--webhook-loss-rate", type=float, default=0.1)
+    parser.add_argument("--no-webhooks", action="store_true")
+    args = parser.parse_args()
+    return SimConfig(
+        generations=args.generations,
+        users=args.users,
+        seed=args.seed,
+        arrival_rate=args.rate,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        webhook_loss_rate=args.webhook_loss_rate,
+        webhooks=not args.no_webhooks,
+    )
+
+
+async def main(config: SimConfig):
+    engine.echo = False
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    report = await simulate(config)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,65 @@
+"""
+ReklamAI v2.0 — Test Fixtures
+Every test runs against a fresh SQLite in-memory schema and empty
+per-worker caches.
+"""
+import os
+
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+
+# Force SQLite for tests BEFORE importing app
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
+os.environ["JWT_SECRET"] = "test-secret"
+os.environ["KIE_API_KEY"] = "test-kie-key"
+os.environ["KIE_BASE_URL"] = "https://mock-kie.example.com"
+os.environ["INNGEST_DEV"] = "1"
+
+from app.main import app  # noqa: E402
+from app.auth import active_users  # noqa: E402
+from app.catalog import catalog  # noqa: E402
+from app.database import engine, Base  # noqa: E402
+from app.lanes import lanes  # noqa: E402
+from app.latency import latency  # noqa: E402
+from app.recent import recent_generations  # noqa: E402
+from app.similarity import similarity_index  # noqa: E402
+
+
+def reset_caches() -> None:
+    catalog.clear()
+    latency.clear()
+    lanes.reset()
+    recent_generations.clear()
+    similarity_index.clear()
+    active_users.clear()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def setup_db():
+    """Create tables before each test, drop after."""
+    reset_caches()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    reset_caches()
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Async HTTP client for testing."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def auth_headers(client: AsyncClient, email: str) -> dict:
+    """Register a user and return Authorization headers."""
+    reg = await client.post("/auth/register", json={
+        "email": email,
+        "password": "password123",
+        "full_name": "Test User",
+    })
+    token = reg.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -2,37 +2,10 @@
 ReklamAI v2.0 — API Tests
 Tests all endpoints using FastAPI TestClient + SQLite in-memory DB.
 """
-import os
 import pytest
-import pytest_asyncio
-from httpx import AsyncClient, ASGITransport
+from httpx import AsyncClient
 
-# Force SQLite for tests BEFORE importing app
-os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
-os.environ["INNGEST_DEV"] = "1"
-os.environ["JWT_SECRET"] = "test-secret"
-os.environ["KIE_API_KEY"] = "test-key"
-
-from app.main import app  # noqa: E402
-from app.database import engine, Base  # noqa: E402
-
-
-@pytest_asyncio.fixture(autouse=True)
-async def setup_db():
-    """Create tables before each test, drop after."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    yield
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture
-async def client():
-    """Async HTTP client for testing."""
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as ac:
-        yield ac
+from tests.conftest import auth_headers
 
 
 # ════════════════════════════════════════════════
@@ -53,6 +26,16 @@ async def test_health(client: AsyncClient):
     assert res.json()["status"] == "healthy"
 
 
+@pytest.mark.asyncio
+async def test_metrics(client: AsyncClient):
+    from app.metrics import metrics
+    metrics.inc("test_requests", route="/x")
+
+    res = await client.get("/metrics")
+    assert res.status_code == 200
+    assert 'test_requests_total{route="/x"}' in res.text
+
+
 # ════════════════════════════════════════════════
 # AUTH: Register
 # ════════════════════════════════════════════════
@@ -186,17 +169,6 @@ async def test_generations_list_empty(client: AsyncClient):
 # ════════════════════════════════════════════════
 # Helper: register + get auth headers
 # ════════════════════════════════════════════════
-async def auth_headers(client: AsyncClient, email: str = "user@example.com") -> dict:
-    """Register a user and return Authorization headers."""
-    reg = await client.post("/auth/register", json={
-        "email": email,
-        "password": "password123",
-        "full_name": "Test User",
-    })
-    token = reg.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
-
-
 # ════════════════════════════════════════════════
 # GENERATIONS: Status filter
 # ════════════════════════════════════════════════
@@ -216,6 +188,240 @@ async def test_generations_status_filter(client: AsyncClient):
     assert res.json()["total"] == 0
 
 
+async def add_generations(email: str, statuses: list[str]) -> list[str]:
+    """Insert generations for ``email``'s user, one second apart, oldest first."""
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select
+    from app.database import async_session
+    from app.models import User, Generation
+    from app.lifecycle import record_created
+
+    base = datetime.now(timezone.utc) - timedelta(hours=1)
+    async with async_session() as db:
+        user = (await db.execute(select(User).where(User.email == email))).scalar_one()
+        gens = [
+            Generation(user_id=user.id, status=s, created_at=base + timedelta(seconds=i // 2))
+            for i, s in enumerate(statuses)
+        ]
+        db.add_all(gens)
+        await db.flush()
+        for gen in gens:
+            await record_created(db, gen)
+        await db.commit()
+        return [g.id for g in gens]
+
+
+@pytest.mark.asyncio
+async def test_generations_cursor_pagination(client: AsyncClient):
+    headers = await auth_headers(client, "pages@example.com")
+    # Pairs share a created_at, so the id tiebreak is exercised
+    await add_generations("pages@example.com", ["succeeded", "failed"] * 5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        data = (await client.get("/api/generations", params=params, headers=headers)).json()
+        assert data["total"] == 10
+        seen += [g["id"] for g in data["items"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    offset_ids = [
+        g["id"] for g in (await client.get("/api/generations?limit=10", headers=headers)).json()["items"]
+    ]
+    assert seen == offset_ids
+    assert len(set(seen)) == 10
+
+    failed = (await client.get("/api/generations?status=failed&limit=2", headers=headers)).json()
+    rest = (await client.get(
+        "/api/generations", params={"status": "failed", "limit": 5, "cursor": failed["next_cursor"]},
+        headers=headers,
+    )).json()
+    assert len(failed["items"]) + len(rest["items"]) == 5
+    assert rest["next_cursor"] is None
+    assert {g["status"] for g in failed["items"] + rest["items"]} == {"failed"}
+
+    # Offset mode still works
+    page2 = (await client.get("/api/generations?limit=3&offset=3", headers=headers)).json()
+    assert [g["id"] for g in page2["items"]] == offset_ids[3:6]
+
+
+@pytest.mark.asyncio
+async def test_generation_reads_skip_heavy_columns(client: AsyncClient):
+    from sqlalchemy import event
+    from app.database import engine
+
+    headers = await auth_headers(client, "slim@example.com")
+    gen_id = (await add_generations("slim@example.com", ["succeeded"]))[0]
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        if "FROM generations" in statement:
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        assert (await client.get("/api/generations", headers=headers)).status_code == 200
+        assert (await client.get(f"/api/generations/{gen_id}", headers=headers)).status_code == 200
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert statements
+    assert not [s for s in statements if "provider_response" in s or "generations.params" in s]
+
+
+@pytest.mark.asyncio
+async def test_generation_list_fast_json_matches_detail(client: AsyncClient):
+    headers = await auth_headers(client, "fastjson@example.com")
+    gen_id = (await add_generations("fastjson@example.com", ["succeeded"]))[0]
+
+    listed = (await client.get("/api/generations", headers=headers)).json()
+    detail = (await client.get(f"/api/generations/{gen_id}", headers=headers)).json()
+    assert listed["items"] == [detail]
+    assert listed["total"] == 1 and listed["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_terminal_generation_revalidates_without_db(client: AsyncClient):
+    from sqlalchemy import event
+    from app.database import engine
+
+    headers = await auth_headers(client, "etag@example.com")
+    done_id, queued_id = await add_generations("etag@example.com", ["succeeded", "queued"])
+
+    first = await client.get(f"/api/generations/{done_id}", headers=headers)
+    assert first.status_code == 200
+    assert "immutable" in first.headers["cache-control"]
+    etag = first.headers["etag"]
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        again = await client.get(f"/api/generations/{done_id}", headers={**headers, "If-None-Match": etag})
+        cached = await client.get(f"/api/generations/{done_id}", headers=headers)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    assert again.status_code == 304 and again.content == b""
+    assert cached.status_code == 200 and cached.json() == first.json()
+    assert statements == []
+
+    # Another user's token never reaches the cached body
+    other = await auth_headers(client, "etag-other@example.com")
+    assert (await client.get(f"/api/generations/{done_id}", headers=other)).status_code == 404
+
+    # Still running: validator only, the client must revalidate
+    running = await client.get(f"/api/generations/{queued_id}", headers=headers)
+    assert running.status_code == 200
+    assert running.headers["cache-control"] == "private, no-cache"
+    assert running.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_terminal_cache_locks_out_deactivated_users(client: AsyncClient):
+    from unittest.mock import patch
+    from sqlalchemy import update
+    from app.database import async_session
+    from app.models import User
+
+    headers = await auth_headers(client, "gone@example.com")
+    done_id = (await add_generations("gone@example.com", ["succeeded"]))[0]
+    assert (await client.get(f"/api/generations/{done_id}", headers=headers)).status_code == 200
+
+    # Deactivated by another worker / an admin script: nothing evicts this worker's cache
+    async with async_session() as db:
+        await db.execute(update(User).where(User.email == "gone@example.com").values(is_active=False))
+        await db.commit()
+    assert (await client.get(f"/api/generations/{done_id}", headers=headers)).status_code == 200  # within the TTL
+
+    with patch("app.auth.clock.monotonic", return_value=10**9):
+        res = await client.get(f"/api/generations/{done_id}", headers=headers)
+    assert res.status_code == 403
+    # Refused once, refused until the user is loaded as active again
+    assert (await client.get(f"/api/generations/{done_id}", headers=headers)).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_cached_reads_leave_request_session_unopened(client: AsyncClient):
+    from app.metrics import metrics
+
+    headers = await auth_headers(client, "lazy@example.com")
+    gen_id = (await add_generations("lazy@example.com", ["succeeded"]))[0]
+    await client.get("/api/generations", headers=headers)
+    await client.get(f"/api/generations/{gen_id}", headers=headers)
+
+    unused = metrics.counter("db_request_sessions", used="false")
+    used = metrics.counter("db_request_sessions", used="true")
+    checkouts = metrics.counter("db_pool_checkouts")
+    assert (await client.get("/api/generations", headers=headers)).status_code == 200
+    assert (await client.get(f"/api/generations/{gen_id}", headers=headers)).status_code == 200
+
+    # Ring and terminal-response hits: the list's user lookup runs on its request session,
+    # the terminal response never opens one; one pooled connection in total
+    assert metrics.counter("db_request_sessions", used="false") == unused + 1
+    assert metrics.counter("db_request_sessions", used="true") == used + 1
+    assert metrics.counter("db_pool_checkouts") == checkouts + 1
+    assert metrics.gauge("db_pool_checked_out") == 0
+
+    # A route that reads the DB shares the request session with the user lookup
+    checkouts = metrics.counter("db_pool_checkouts")
+    assert (await client.get("/api/credits", headers=headers)).status_code == 200
+    assert metrics.counter("db_pool_checkouts") == checkouts + 1
+    assert "db_pool_hold_seconds_count" in (await client.get("/metrics")).text
+
+
+@pytest.mark.asyncio
+async def test_generations_bad_cursor(client: AsyncClient):
+    headers = await auth_headers(client, "badcursor@example.com")
+    res = await client.get("/api/generations?cursor=not-a-cursor", headers=headers)
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_generations_bulk_status(client: AsyncClient):
+    headers = await auth_headers(client, "bulk@example.com")
+    ids = await add_generations("bulk@example.com", ["queued", "processing", "succeeded"])
+    other_headers = await auth_headers(client, "bulk-other@example.com")
+    foreign = await add_generations("bulk-other@example.com", ["queued"])
+
+    res = await client.get(f"/api/generations/status?ids={','.join(ids + foreign)}", headers=headers)
+    assert res.status_code == 200
+    body = res.json()
+    assert {i["id"]: i["status"] for i in body["items"]} == dict(zip(ids, ["queued", "processing", "succeeded"]))
+    assert set(body["items"][0]) == {"id", "status", "progress", "result_url", "thumbnail_url", "error_message"}
+
+    # Only rows changed after `since`
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app.database import async_session
+    from app.models import Generation
+    from app.lifecycle import set_status
+    from app.routes.generate import settings as generate_settings
+    margin = timedelta(seconds=generate_settings.status_since_margin_seconds)
+    server_time = datetime.fromisoformat(body["server_time"])
+    async with async_session() as db:
+        await db.execute(update(Generation).where(Generation.id.in_(ids)).values(updated_at=server_time - margin))
+        await set_status(db, await db.get(Generation, ids[1]), "failed")
+        # Flushed just before the first poll read, committed only after it
+        gen = await db.get(Generation, ids[2])
+        gen.progress, gen.updated_at = 100, server_time + margin - timedelta(seconds=1)
+        await db.commit()
+    res = await client.post(
+        "/api/generations/status", headers=headers,
+        json={"ids": ids, "since": body["server_time"]},
+    )
+    assert sorted((i["id"], i["status"]) for i in res.json()["items"]) == sorted([
+        (ids[1], "failed"), (ids[2], "succeeded"),
+    ])
+
+    res = await client.post("/api/generations/status", headers=other_headers, json={"ids": ["x"] * 2 + [str(n) for n in range(400)]})
+    assert res.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_generations_no_auth(client: AsyncClient):
     res = await client.get("/api/generations")
@@ -0,0 +1,171 @@
+"""
+ReklamAI v2.0 — Catalog Tests
+In-memory model / preset snapshot: zero-query reads, change-driven reloads,
+precomputed HTTP responses and the admin reload endpoint.
+"""
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app.database import engine, async_session
+from app.models import AIModel, Preset, User
+from app.catalog import catalog, catalog_changed
+from sqlalchemy import event, select
+
+
+async def add_models():
+    async with async_session() as db:
+        db.add_all([
+            AIModel(name="Zeta", slug="zeta", category="image", price_multiplier=2.0, provider_model_id="zeta-v1"),
+            AIModel(name="Alpha", slug="alpha", category="video", price_multiplier=4.0),
+            AIModel(name="Off", slug="off", category="image", is_active=False),
+            Preset(name="Promo", slug="promo", category="video"),
+        ])
+        await db.commit()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *_args, **_kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self)
+
+
+@pytest.mark.asyncio
+async def test_catalog_reads_make_no_queries(client: AsyncClient):
+    await add_models()
+    await catalog.reload()
+
+    with QueryCounter() as queries:
+        models = (await client.get("/api/models")).json()
+        unknown = (await client.get("/api/models", params={"category": "nope"})).json()
+        video = (await client.get("/api/models", params={"category": "video"})).json()
+        presets = (await client.get("/api/presets")).json()
+
+    assert queries.count == 0
+    assert [m["slug"] for m in models] == ["alpha", "zeta"]  # active only, by name
+    assert [m["slug"] for m in video] == ["alpha"]
+    assert unknown == []
+    assert [p["slug"] for p in presets] == ["promo"]
+
+
+@pytest.mark.asyncio
+async def test_catalog_etag_and_304(client: AsyncClient):
+    await add_models()
+    await catalog.reload()
+
+    res = await client.get("/api/models", headers={"Accept-Encoding": "identity"})
+    etag = res.headers["etag"]
+    assert res.headers["cache-control"] == "public, max-age=60, stale-while-revalidate=600"
+    assert "content-encoding" not in res.headers
+
+    again = await client.get("/api/models", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    # A catalog change produces a new representation
+    async with async_session() as db:
+        db.add(AIModel(name="Beta", slug="beta", category="image"))
+        await db.commit()
+    await catalog_changed()
+    changed = await client.get("/api/models", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_catalog_precompressed_variants():
+    from app.http_cache import PrecomputedBody
+    import gzip
+
+    rendered = PrecomputedBody.render(b'{"x": "' + b"a" * 1000 + b'"}')
+    body, encoding, etag = rendered.variant("gzip, deflate")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == rendered.body
+    assert etag == f'"{rendered.etag}-gzip"'
+    assert rendered.matches(etag)
+    assert rendered.variant("gzip;q=0")[1] is None
+    if rendered.br is not None:
+        assert rendered.variant("br, gzip")[1] == "br"
+
+
+@pytest.mark.asyncio
+async def test_catalog_change_invalidates_snapshot():
+    await catalog.reload()
+    assert await catalog.model("zeta") is None
+
+    await add_models()
+    assert await catalog.model("zeta") is None  # still the old snapshot
+
+    version = catalog.version
+    await catalog_changed()
+    assert (await catalog.model("zeta")).price_multiplier == 2.0
+    assert catalog.version == version + 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_expires_without_notification():
+    await catalog.reload()
+    await add_models()
+    with patch("app.catalog.settings.catalog_max_age_seconds", 1), \
+            patch("app.catalog.clock.monotonic", return_value=10**9):
+        assert await catalog.model("alpha") is not None
+
+
+@pytest.mark.asyncio
+async def test_admin_reload_requires_admin(client: AsyncClient):
+    reg = await client.post("/auth/register", json={"email": "cat@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+
+    assert (await client.post("/api/admin/catalog/reload", headers=headers)).status_code == 403
+
+    async with async_session() as db:
+        user = (await db.execute(select(User).where(User.email == "cat@test.com"))).scalar_one()
+        user.role = "admin"
+        await db.commit()
+    await add_models()
+
+    res = await client.post("/api/admin/catalog/reload", headers=headers)
+    assert res.status_code == 200
+    assert res.json()["models"] == 2
+    assert res.json()["presets"] == 1
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_generate_uses_catalog_model(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    await add_models()
+    reg = await client.post("/auth/register", json={"email": "gen@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+
+    res = await client.post("/api/generate", headers=headers, json={"prompt": "x", "model_slug": "zeta"})
+
+    assert res.status_code == 201
+    assert res.json()["credits_reserved"] == 2.0
+    event_data = mock_inngest.send.call_args[0][0].data
+    assert event_data["payload"]["model"] == "zeta-v1"
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_generate_rejects_unknown_and_inactive_models(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    await add_models()
+    reg = await client.post("/auth/register", json={"email": "unknown@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+
+    for slug in ("no-such-model", "off"):
+        res = await client.post("/api/generate", headers=headers, json={"prompt": "x", "model_slug": slug})
+        assert res.status_code == 400
+        assert slug in res.json()["detail"]
+
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == 50.0
+    mock_inngest.send.assert_not_called()
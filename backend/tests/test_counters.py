@@ -0,0 +1,66 @@
+"""
+ReklamAI v2.0 — Generation Counter Tests
+Counters follow inserts and status transitions; the repair job fixes drift.
+"""
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app.database import async_session
+from app.models import Generation, GenerationCounter
+from app.counters import count_generations, rebuild_generation_counters
+from app.lifecycle import mark_failed, mark_succeeded, set_status
+from sqlalchemy import select
+
+
+async def counters(user_id: str) -> dict:
+    async with async_session() as db:
+        rows = (await db.execute(
+            select(GenerationCounter).where(GenerationCounter.user_id == user_id)
+        )).scalars().all()
+        return {c.status: c.count for c in rows if c.count}
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_counters_follow_lifecycle(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    reg = await client.post("/auth/register", json={"email": "count@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+    user_id = reg.json()["user"]["id"]
+
+    ids = [(await client.post("/api/generate", headers=headers, json={"prompt": str(i)})).json()["id"]
+           for i in range(3)]
+    assert await counters(user_id) == {"queued": 3}
+
+    async with async_session() as db:
+        gens = [await db.get(Generation, gen_id) for gen_id in ids]
+        await set_status(db, gens[0], "processing")
+        await mark_succeeded(db, gens[0], result_url="https://cdn/x.png")
+        await mark_failed(db, gens[1], "boom")
+        await db.commit()
+
+    assert await counters(user_id) == {"queued": 1, "succeeded": 1, "failed": 1}
+    res = await client.get("/api/generations?status=failed", headers=headers)
+    assert res.json()["total"] == 1
+    res = await client.get("/api/generations", headers=headers)
+    assert res.json()["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_rebuild_fixes_drift():
+    from app.models import User
+    async with async_session() as db:
+        db.add(User(id="u1", email="u1@test.com", hashed_password="x"))
+        db.add_all([Generation(user_id="u1", status="succeeded") for _ in range(4)])
+        db.add(GenerationCounter(user_id="u1", status="queued", count=7))
+        await db.commit()
+
+    stats = await rebuild_generation_counters(async_session)
+
+    assert stats == {"checked": 1, "corrected": 2}
+    assert await counters("u1") == {"succeeded": 4}
+    async with async_session() as db:
+        assert await count_generations(db, "u1") == 4
+
+    assert (await rebuild_generation_counters(async_session))["corrected"] == 0
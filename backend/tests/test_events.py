@@ -0,0 +1,214 @@
+"""
+ReklamAI v2.0 — Generation Event Stream Tests
+Writers publish status events; the hub fans them out to the owner's streams.
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app.events import GENERATION_CHANNEL, GenerationStreams, stream_events, streams
+from app.pubsub import pubsub
+
+
+def parse(chunk: str) -> dict:
+    return json.loads(chunk.split("data: ", 1)[1])
+
+
+def test_hub_routes_by_user_and_drops_oldest():
+    hub = GenerationStreams(queue_size=2)
+    mine, other = hub.open("u1"), hub.open("u2")
+    for i in range(3):
+        hub.dispatch({"user_id": "u1", "id": f"g{i}"})
+
+    assert [mine.get_nowait()["id"] for _ in range(mine.qsize())] == ["g1", "g2"]
+    assert other.empty()
+    hub.close("u1", mine)
+    hub.close("u2", other)
+    assert hub.connections == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_initial_state_then_live_events():
+    disconnected = asyncio.Event()
+
+    async def is_disconnected():
+        return disconnected.is_set()
+
+    body = stream_events("u1", [{"user_id": "u1", "id": "g1", "status": "queued"}], is_disconnected)
+    assert (await body.__anext__()).startswith("retry:")
+    assert parse(await body.__anext__()) == {"id": "g1", "status": "queued"}
+
+    await pubsub.publish(GENERATION_CHANNEL, {"user_id": "u2", "id": "x", "status": "failed"})
+    await pubsub.publish(GENERATION_CHANNEL, {"user_id": "u1", "id": "g1", "status": "processing"})
+    chunk = await body.__anext__()
+    assert chunk.startswith("event: generation\n")
+    assert parse(chunk) == {"id": "g1", "status": "processing"}
+
+    with patch("app.events.settings.stream_keepalive_seconds", 0.01):
+        assert await body.__anext__() == ": keepalive\n\n"
+
+    disconnected.set()
+    with pytest.raises(StopAsyncIteration):
+        await body.__anext__()
+    assert streams.connections == 0
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_writers_publish_status_changes(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    received = []
+    pubsub.subscribe(GENERATION_CHANNEL, received.append)
+    try:
+        reg = await client.post("/auth/register", json={"email": "sse@test.com", "password": "password123"})
+        headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+        gen = (await client.post("/api/generate", headers=headers, json={"prompt": "x"})).json()
+
+        from app.database import async_session
+        from app.models import Generation
+        async with async_session() as db:
+            row = await db.get(Generation, gen["id"])
+            row.provider_task_id = "sse-task"
+            await db.commit()
+        from app.webhook_inbox import webhook_inbox
+        await client.post("/webhook/kie", json={"task_id": "sse-task", "status": "processing", "progress": 40})
+        await webhook_inbox.drain(async_session)
+        await client.post("/webhook/kie", json={
+            "task_id": "sse-task", "status": "completed", "output": {"image_url": "https://cdn/r.png"},
+        })
+        await webhook_inbox.drain(async_session)
+    finally:
+        pubsub.unsubscribe(GENERATION_CHANNEL, received.append)
+
+    assert [(e["status"], e["progress"]) for e in received] == [
+        ("queued", 0), ("processing", 40), ("succeeded", 40),
+    ]
+    assert received[-1]["result_url"] == "https://cdn/r.png"
+    assert {e["user_id"] for e in received} == {reg.json()["user"]["id"]}
+
+
+@pytest.mark.asyncio
+async def test_stream_requires_token(client: AsyncClient):
+    assert (await client.get("/api/generations/stream")).status_code == 401
+    assert (await client.get("/api/generations/stream", headers={"Authorization": "Bearer bad"})).status_code == 401
+
+    # Tokens in the URL end up in access logs and are not accepted
+    reg = await client.post("/auth/register", json={"email": "url@test.com", "password": "password123"})
+    token = reg.json()["access_token"]
+    assert (await client.get(f"/api/generations/stream?token={token}")).status_code == 401
+
+
+class FakeDriver:
+    """The asyncpg connection under a fake PostgreSQL engine."""
+
+    def __init__(self):
+        self.listening: set[str] = set()
+        self.notified: list[tuple[str, str]] = []
+        self.on_terminate = None
+        self.closed = False
+
+    async def add_listener(self, channel, _callback):
+        self.listening.add(channel)
+
+    def add_termination_listener(self, callback):
+        self.on_terminate = callback
+
+    async def execute(self, query, *args):
+        if self.closed:
+            raise ConnectionError("connection is closed")
+        if args:
+            self.notified.append(args)
+
+    def terminate(self):
+        self.closed = True
+        self.on_terminate(self)
+
+
+class FakeConnection:
+    def __init__(self, driver: FakeDriver):
+        self.driver_connection = driver
+
+    async def get_raw_connection(self):
+        return self
+
+    async def close(self):
+        self.driver_connection.closed = True
+
+
+class FakeEngine:
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self):
+        self.drivers: list[FakeDriver] = []
+        self.failures = 0  # connect() attempts that raise before one succeeds
+
+    async def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        self.drivers.append(FakeDriver())
+        return FakeConnection(self.drivers[-1])
+
+
+@pytest.mark.asyncio
+async def test_publishes_share_one_connection():
+    fake = FakeEngine()
+    await pubsub.start(fake)
+    try:
+        listener = fake.drivers[0]
+        for i in range(3):
+            await pubsub.publish("reklamai_test", {"n": i})
+        assert len(fake.drivers) == 2  # LISTEN + one publisher, not one checkout per NOTIFY
+        assert [json.loads(m)["data"] for _, m in fake.drivers[1].notified] == [{"n": 0}, {"n": 1}, {"n": 2}]
+        assert listener.notified == []
+
+        # A broken publisher is replaced on the next publish
+        fake.drivers[1].closed = True
+        await pubsub.publish("reklamai_test", {"n": 3})
+        await pubsub.publish("reklamai_test", {"n": 4})
+        assert len(fake.drivers) == 3
+        assert [json.loads(m)["data"] for _, m in fake.drivers[2].notified] == [{"n": 4}]
+    finally:
+        await pubsub.stop()
+
+
+@pytest.mark.asyncio
+async def test_listener_reconnects_and_resets_caches_after_a_gap():
+    from app.recent import recent_generations
+
+    gaps = []
+    pubsub.on_gap(on_gap := lambda: gaps.append(recent_generations.version))
+    fake = FakeEngine()
+    disconnected = asyncio.Event()
+
+    async def is_disconnected():
+        return disconnected.is_set()
+
+    with patch("app.pubsub.settings.pubsub_reconnect_min_seconds", 0.01):
+        await pubsub.start(fake)
+        try:
+            assert GENERATION_CHANNEL in fake.drivers[0].listening
+            body = stream_events("u1", [], is_disconnected)
+            await body.__anext__()  # retry hint
+            version = recent_generations.version
+
+            fake.failures = 2
+            fake.drivers[0].terminate()
+            with pytest.raises(StopAsyncIteration):
+                await asyncio.wait_for(body.__anext__(), 1)  # stream ended: client resyncs
+            for _ in range(100):
+                if len(gaps) == 2:
+                    break
+                await asyncio.sleep(0.01)
+
+            # Cleared on loss and again once listening resumes, after two failed attempts
+            assert len(gaps) == 2 and recent_generations.version > version
+            assert GENERATION_CHANNEL in fake.drivers[-1].listening
+            assert not fake.drivers[-1].closed
+        finally:
+            await pubsub.stop()
+            pubsub._gap_callbacks.remove(on_gap)
+    assert streams.connections == 0
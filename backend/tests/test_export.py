@@ -0,0 +1,88 @@
+"""
+ReklamAI v2.0 — History Export Tests
+GET /api/generations/export: NDJSON and CSV bodies, filters, and chunked
+streaming from the server-side cursor.
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from httpx import AsyncClient
+
+from app import clock
+from app.database import async_session
+from app.export import EXPORT_FIELDS, export_body, export_query
+from app.models import Generation
+
+
+async def setup_history(client: AsyncClient) -> tuple[dict, str, list[str]]:
+    reg = (await client.post("/auth/register", json={"email": "agency@example.com", "password": "password123"})).json()
+    user_id = reg["user"]["id"]
+    base = clock.utcnow() - timedelta(days=5)
+    async with async_session() as db:
+        gens = [
+            Generation(
+                user_id=user_id, prompt=f"banner {i}", model_slug="flux", created_at=base + timedelta(days=i),
+                status="succeeded" if i % 2 else "failed", result_urls=[f"https://cdn/{i}.png"],
+                credits_reserved=2.0, credits_final=2.0 if i % 2 else 0.0,
+            )
+            for i in range(5)
+        ]
+        gens.append(Generation(user_id=user_id, prompt="=HYPERLINK(\"x\")", created_at=base - timedelta(days=1)))
+        db.add_all(gens)
+        db.add(Generation(user_id="someone-else", prompt="not mine"))
+        await db.commit()
+    return {"Authorization": f"Bearer {reg['access_token']}"}, user_id, [g.id for g in gens]
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_with_filters(client: AsyncClient):
+    headers, _, ids = await setup_history(client)
+
+    res = await client.get("/api/generations/export", headers=headers)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in res.headers["content-disposition"]
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["id"] for r in rows] == [*reversed(ids[:5]), ids[5]]
+    assert list(rows[0]) == list(EXPORT_FIELDS)
+    assert rows[0]["result_urls"] == ["https://cdn/4.png"] and rows[0]["credits_final"] == 0.0
+
+    failed = (await client.get("/api/generations/export?status=failed", headers=headers)).text.splitlines()
+    assert {json.loads(line)["status"] for line in failed} == {"failed"} and len(failed) == 3
+
+    created_from = (clock.utcnow() - timedelta(days=3, hours=1)).isoformat()
+    recent = (await client.get(
+        "/api/generations/export", params={"created_from": created_from}, headers=headers,
+    )).text.splitlines()
+    assert [json.loads(line)["prompt"] for line in recent] == ["banner 4", "banner 3", "banner 2"]
+
+    assert (await client.get("/api/generations/export?format=xlsx", headers=headers)).status_code == 400
+    assert (await client.get("/api/generations/export")).status_code in (401, 403)
+
+
+@pytest.mark.asyncio
+async def test_export_csv(client: AsyncClient):
+    headers, _, ids = await setup_history(client)
+
+    res = await client.get("/api/generations/export?format=csv", headers=headers)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert [r["id"] for r in rows] == [*reversed(ids[:5]), ids[5]]
+    assert rows[0]["result_urls"] == "https://cdn/4.png"
+    assert rows[1]["credits_final"] == "2.0"
+    # Formula-looking prompts stay text in spreadsheets
+    assert rows[-1]["prompt"] == "'=HYPERLINK(\"x\")"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_one_chunk_per_partition(client: AsyncClient):
+    _, user_id, ids = await setup_history(client)
+
+    query = export_query([Generation.user_id == user_id]).execution_options(yield_per=2)
+    chunks = [chunk async for chunk in export_body(query, "ndjson")]
+    assert len(chunks) == 3
+    assert sum(chunk.count(b"\n") for chunk in chunks) == len(ids)
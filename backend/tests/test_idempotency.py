@@ -0,0 +1,101 @@
+"""
+ReklamAI v2.0 — Idempotency Key Tests
+Retries with the same Idempotency-Key return the original generation
+without reserving credits or enqueueing again.
+"""
+from datetime import timedelta
+
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app import clock
+from app.database import async_session
+from app.idempotency import claim_key, purge_expired_keys
+from app.models import IdempotencyKey, User
+from sqlalchemy import select, update
+from tests.conftest import auth_headers
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_retry_returns_original_generation(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    headers = {**await auth_headers(client, "idem@test.com"), "Idempotency-Key": "order-1"}
+
+    first = await client.post("/api/generate", headers=headers, json={"prompt": "sneakers"})
+    retry = await client.post("/api/generate", headers=headers, json={"prompt": "sneakers"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == 49.0
+    assert (await client.get("/api/generations", headers=headers)).json()["total"] == 1
+    mock_inngest.send.assert_called_once()
+
+    # Same key, different body
+    res = await client.post("/api/generate", headers=headers, json={"prompt": "boots"})
+    assert res.status_code == 422
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_keys_are_per_user_and_optional(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    alice = await auth_headers(client, "alice@test.com")
+    bob = await auth_headers(client, "bob@test.com")
+
+    a = await client.post("/api/generate", headers={**alice, "Idempotency-Key": "k"}, json={"prompt": "x"})
+    b = await client.post("/api/generate", headers={**bob, "Idempotency-Key": "k"}, json={"prompt": "x"})
+    assert a.json()["id"] != b.json()["id"]
+
+    plain = [(await client.post("/api/generate", headers=alice, json={"prompt": "x"})).json()["id"] for _ in range(2)]
+    assert len(set(plain)) == 2
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_failure_after_reservation_rolls_back_the_request(mock_inngest, client: AsyncClient):
+    """Claim and debit roll back together; the retry with the same key charges once."""
+    from app.models import CreditTransaction, Generation
+    mock_inngest.send = AsyncMock()
+    headers = {**await auth_headers(client, "rollback@test.com"), "Idempotency-Key": "order-2"}
+
+    # Fails after the key is claimed and the credits are reserved
+    with patch("app.routes.generate.record_created", AsyncMock(side_effect=RuntimeError("counters down"))):
+        with pytest.raises(RuntimeError):
+            await client.post("/api/generate", headers=headers, json={"prompt": "sneakers"})
+
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == 50.0
+    async with async_session() as db:
+        assert (await db.execute(select(IdempotencyKey))).scalars().all() == []
+        assert (await db.execute(select(Generation))).scalars().all() == []
+        assert (await db.execute(select(CreditTransaction).where(CreditTransaction.type == "reserve"))).scalars().all() == []
+
+    res = await client.post("/api/generate", headers=headers, json={"prompt": "sneakers"})
+    assert res.status_code == 201
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == 49.0
+
+
+@pytest.mark.asyncio
+async def test_claim_conflicts_and_expiry():
+    async with async_session() as db:
+        db.add(User(id="u1", email="u1@test.com", hashed_password="x"))
+        await db.commit()
+
+    async with async_session() as db:
+        assert await claim_key(db, "u1", "k", "f", "g1")
+        await db.commit()
+    async with async_session() as db:
+        assert not await claim_key(db, "u1", "k", "f", "g2")
+
+    # An expired claim is taken over, then purged once expired again
+    async with async_session() as db:
+        await db.execute(update(IdempotencyKey).values(expires_at=clock.utcnow() - timedelta(seconds=1)))
+        assert await claim_key(db, "u1", "k", "f", "g3")
+        await db.commit()
+        key = (await db.execute(select(IdempotencyKey))).scalar_one()
+        assert key.generation_id == "g3"
+
+        await db.execute(update(IdempotencyKey).values(expires_at=clock.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+    assert await purge_expired_keys(async_session) == {"deleted": 1}
@@ -2,52 +2,29 @@
 ReklamAI v2.0 — KIE.ai Integration Tests
 Tests the generation flow, webhook processing, and KIE client with mocked external calls.
 """
-import os
 import pytest
 import pytest_asyncio
 from unittest.mock import patch, MagicMock, AsyncMock
-from httpx import AsyncClient, ASGITransport
+from httpx import AsyncClient
 
-# Force SQLite for tests BEFORE importing app
-os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
-os.environ["JWT_SECRET"] = "test-secret"
-os.environ["KIE_API_KEY"] = "test-kie-key"
-os.environ["KIE_BASE_URL"] = "https://mock-kie.example.com"
-os.environ["INNGEST_DEV"] = "1"
-
-from app.main import app  # noqa: E402
-from app.database import engine, Base, async_session  # noqa: E402
-from app.models import Generation, CreditAccount  # noqa: E402
-from sqlalchemy import select  # noqa: E402
+from app.database import async_session
+from app.models import Generation, CreditAccount
+from app.webhook_inbox import webhook_inbox
+from sqlalchemy import select
+from tests.conftest import auth_headers
 
 
 @pytest_asyncio.fixture(autouse=True)
-async def setup_db():
-    """Create tables before each test, drop after."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    yield
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture
-async def client():
-    """Async HTTP client for testing."""
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as ac:
-        yield ac
-
-
-async def auth_headers(client: AsyncClient, email: str = "kie@test.com") -> dict:
-    """Register a user and return Authorization headers."""
-    reg = await client.post("/auth/register", json={
-        "email": email,
-        "password": "password123",
-        "full_name": "KIE Test User",
-    })
-    token = reg.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+async def video_model(setup_db):
+    """The catalog model most tests generate with."""
+    from app.catalog import catalog
+    from app.models import AIModel
+    async with async_session() as db:
+        db.add(AIModel(
+            name="Kling v2", slug="kling-v2", provider_model_id="kling-v2", category="video", price_multiplier=5.0,
+        ))
+        await db.commit()
+    await catalog.reload()
 
 
 # ════════════════════════════════════════════════
@@ -110,6 +87,33 @@ async def test_create_generation_deducts_credits(mock_inngest, client: AsyncClie
     assert new_balance < initial_balance
 
 
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_reservation_stops_at_zero_and_links_ledger(mock_inngest, client: AsyncClient):
+    """The conditional debit never overdraws; each reserve row points at its generation."""
+    from sqlalchemy import select, update
+    from app.models import CreditTransaction
+    mock_inngest.send = AsyncMock()
+    headers = await auth_headers(client, "reserve@test.com")
+    async with async_session() as db:
+        await db.execute(update(CreditAccount).values(balance=3.0, total_spent=0.0))
+        await db.commit()
+
+    statuses = [
+        (await client.post("/api/generate", headers=headers, json={"prompt": str(i)})).status_code
+        for i in range(4)
+    ]
+    assert statuses == [201, 201, 201, 402]  # 1 credit each
+
+    credits = (await client.get("/api/credits", headers=headers)).json()
+    assert (credits["balance"], credits["total_spent"]) == (0.0, 3.0)
+    async with async_session() as db:
+        txs = (await db.execute(select(CreditTransaction).where(CreditTransaction.type == "reserve"))).scalars().all()
+    listed = (await client.get("/api/generations", headers=headers)).json()
+    assert listed["total"] == 3
+    assert {t.generation_id for t in txs} == {g["id"] for g in listed["items"]}
+
+
 @pytest.mark.asyncio
 async def test_create_generation_no_auth(client: AsyncClient):
     """Unauthenticated users cannot create generations."""
@@ -146,6 +150,90 @@ async def test_get_generation_not_found(client: AsyncClient):
     assert res.status_code == 404
 
 
+# ════════════════════════════════════════════════
+# GENERATION: Batch
+# ════════════════════════════════════════════════
+async def add_batch_models():
+    from app.models import AIModel
+    from app.catalog import catalog
+    async with async_session() as db:
+        db.add_all([
+            AIModel(name="Batch Image", slug="batch-img", provider_model_id="img-v1", category="image", price_multiplier=1.5),
+            AIModel(name="Batch Video", slug="batch-vid", provider_model_id="vid-v1", category="video", price_multiplier=4.0),
+        ])
+        await db.commit()
+    await catalog.reload()
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_create_generation_batch(mock_inngest, client: AsyncClient):
+    from app.catalog import catalog
+    from app.models import CreditTransaction
+    mock_inngest.send = AsyncMock()
+    await add_batch_models()
+    headers = await auth_headers(client, "batch@test.com")
+
+    variants = [
+        {"prompt": "Sale", "model_slug": "batch-img", "aspect_ratio": ratio}
+        for ratio in ("1:1", "9:16", "16:9")
+    ] + [{"prompt": "Sale", "model_slug": "batch-vid"}]
+    res = await client.post("/api/generate/batch", headers=headers, json={"variants": variants})
+
+    assert res.status_code == 201
+    data = res.json()
+    assert len(data["ids"]) == 4
+    assert data["credits_reserved"] == 1.5 * 3 + 4.0
+    assert [g["aspect_ratio"] for g in data["items"][:3]] == ["1:1", "9:16", "16:9"]
+    assert data["items"][3]["model_slug"] == "batch-vid"
+
+    # One send with every event
+    mock_inngest.send.assert_called_once()
+    events = mock_inngest.send.call_args[0][0]
+    assert [e.data["generation_id"] for e in events] == data["ids"]
+    assert events[3].data["payload"]["model"] == "vid-v1"
+
+    credits = (await client.get("/api/credits", headers=headers)).json()
+    assert credits["balance"] == 50.0 - data["credits_reserved"]
+    async with async_session() as db:
+        reserves = (await db.execute(
+            select(CreditTransaction).where(CreditTransaction.type == "reserve")
+        )).scalars().all()
+        assert sorted(t.generation_id for t in reserves) == sorted(data["ids"])
+
+    listed = (await client.get("/api/generations", headers=headers)).json()
+    assert listed["total"] == 4
+    catalog.clear()
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_create_generation_batch_is_all_or_nothing(mock_inngest, client: AsyncClient):
+    from app.catalog import catalog
+    mock_inngest.send = AsyncMock()
+    await add_batch_models()
+    headers = await auth_headers(client, "batch_fail@test.com")
+
+    # Unknown model in one variant rejects the whole batch
+    res = await client.post("/api/generate/batch", headers=headers, json={"variants": [
+        {"prompt": "ok", "model_slug": "batch-img"},
+        {"prompt": "bad", "model_slug": "no-such-model"},
+    ]})
+    assert res.status_code == 400
+    assert "1" in res.json()["detail"]
+
+    # Total above the balance (50 welcome credits) reserves nothing
+    res = await client.post("/api/generate/batch", headers=headers, json={
+        "variants": [{"prompt": "v", "model_slug": "batch-vid"}] * 13,
+    })
+    assert res.status_code == 402
+
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == 50.0
+    assert (await client.get("/api/generations", headers=headers)).json()["total"] == 0
+    mock_inngest.send.assert_not_called()
+    catalog.clear()
+
+
 # ════════════════════════════════════════════════
 # WEBHOOK: KIE.ai Callbacks
 # ════════════════════════════════════════════════
@@ -181,10 +269,9 @@ async def test_webhook_success(mock_inngest, client: AsyncClient):
             "urls": ["https://cdn.kie.ai/results/video_123.mp4"],
         },
     })
-    assert webhook_res.status_code == 200
-    data = webhook_res.json()
-    assert data["ok"] is True
-    assert data["status"] == "succeeded"
+    assert webhook_res.status_code == 202
+    assert webhook_res.json() == {"ok": True, "queued": True}
+    assert await webhook_inbox.drain(async_session) == 1
 
     # Verify generation was updated
     status_res = await client.get(f"/api/generations/{gen_id}", headers=headers)
@@ -232,8 +319,8 @@ async def test_webhook_failure_refunds_credits(mock_inngest, client: AsyncClient
         "status": "failed",
         "error": "Model overloaded, please retry",
     })
-    assert webhook_res.status_code == 200
-    assert webhook_res.json()["status"] == "failed"
+    assert webhook_res.status_code == 202
+    await webhook_inbox.drain(async_session)
 
     # Verify credits were refunded
     credits_res = await client.get("/api/credits", headers=headers)
@@ -272,8 +359,8 @@ async def test_webhook_processing_progress(mock_inngest, client: AsyncClient):
         "status": "processing",
         "progress": 45,
     })
-    assert webhook_res.status_code == 200
-    assert webhook_res.json()["status"] == "processing"
+    assert webhook_res.status_code == 202
+    await webhook_inbox.drain(async_session)
 
     # Verify progress
     status_res = await client.get(f"/api/generations/{gen_id}", headers=headers)
@@ -282,13 +369,18 @@ async def test_webhook_processing_progress(mock_inngest, client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_webhook_unknown_task(client: AsyncClient):
-    """Webhook with unknown task_id returns not found."""
+    """Webhook with unknown task_id is accepted, retried for a while, then dropped."""
+    from app.models import WebhookInboxItem
     res = await client.post("/webhook/kie", json={
         "task_id": "nonexistent-task-id",
         "status": "completed",
     })
-    assert res.status_code == 200
-    assert res.json()["ok"] is False
+    assert res.status_code == 202
+    with patch("app.webhook_inbox.settings.webhook_inbox_unmatched_retry_seconds", 0):
+        # Due again at once: every round is one attempt
+        assert await webhook_inbox.drain(async_session) == 8
+    async with async_session() as db:
+        assert (await db.execute(select(WebhookInboxItem))).scalars().all() == []
 
 
 @pytest.mark.asyncio
@@ -422,12 +514,13 @@ async def test_full_generation_flow(mock_inngest, client: AsyncClient):
     status_res = await client.get(f"/api/generations/{gen_id}", headers=headers)
     assert status_res.json()["status"] == "queued"
 
-    # 3. Simulate worker setting task_id
+    # 3. Simulate worker setting task_id (as the save-task-id step does)
+    from app.lifecycle import set_status
     async with async_session() as db:
         result = await db.execute(select(Generation).where(Generation.id == gen_id))
         gen = result.scalar_one()
         gen.provider_task_id = "kie-e2e-task"
-        gen.status = "processing"
+        await set_status(db, gen, "processing")
         gen.progress = 0
         await db.commit()
 
@@ -437,6 +530,7 @@ async def test_full_generation_flow(mock_inngest, client: AsyncClient):
         "status": "processing",
         "progress": 50,
     })
+    await webhook_inbox.drain(async_session)
 
     status_res = await client.get(f"/api/generations/{gen_id}", headers=headers)
     assert status_res.json()["status"] == "processing"
@@ -451,6 +545,7 @@ async def test_full_generation_flow(mock_inngest, client: AsyncClient):
             "thumbnail_url": "https://cdn.kie.ai/cat_tophat_thumb.jpg",
         },
     })
+    await webhook_inbox.drain(async_session)
 
     # 6. Verify final state
     final_res = await client.get(f"/api/generations/{gen_id}", headers=headers)
@@ -470,3 +565,165 @@ async def test_full_generation_flow(mock_inngest, client: AsyncClient):
 
     processing_res = await client.get("/api/generations?status=processing", headers=headers)
     assert processing_res.json()["total"] == 0
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_pipeline_failing_before_dispatch_frees_slot_and_refunds(mock_inngest, client: AsyncClient):
+    """A createTask error fails the admitted row at once instead of at the queue deadline."""
+    from app.inngest_client import run_generation_pipeline
+    from app.scheduler import _running
+    mock_inngest.send = AsyncMock()
+    headers = await auth_headers(client, "dispatch-fail@test.com")
+    before = (await client.get("/api/credits", headers=headers)).json()["balance"]
+    gen_id = (await client.post("/api/generate", headers=headers, json={"prompt": "x"})).json()["id"]
+
+    class FakeStep:
+        async def run(self, step_id, handler):
+            return await handler()
+
+        async def sleep(self, step_id, duration):
+            return None
+
+    with patch("app.kie_client.kie_client.submit_task", AsyncMock(side_effect=RuntimeError("KIE down"))):
+        with pytest.raises(Exception, match="KIE down"):
+            await run_generation_pipeline(FakeStep(), {"generation_id": gen_id, "payload": {}})
+
+    gen = (await client.get(f"/api/generations/{gen_id}", headers=headers)).json()
+    assert gen["status"] == "failed" and "KIE down" in gen["error_message"]
+    assert (await client.get("/api/credits", headers=headers)).json()["balance"] == before
+    async with async_session() as db:
+        running_by_user, _ = await _running(db)
+    assert running_by_user == {}
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_pipeline_does_not_revive_a_settled_generation(mock_inngest, client: AsyncClient):
+    """A row expired and refunded while createTask ran stays failed when the task id arrives."""
+    from app.inngest_client import run_generation_pipeline
+    from app.lifecycle import mark_failed
+    mock_inngest.send = AsyncMock()
+    headers = await auth_headers(client, "revive@test.com")
+    gen_id = (await client.post("/api/generate", headers=headers, json={"prompt": "x"})).json()["id"]
+
+    class FakeStep:
+        async def run(self, step_id, handler):
+            if step_id == "save-task-id":
+                async with async_session() as db:
+                    await mark_failed(db, await db.get(Generation, gen_id), "Expired")
+                    await db.commit()
+            return await handler()
+
+        async def sleep(self, step_id, duration):
+            return None
+
+    submit = AsyncMock(return_value={"code": 200, "data": {"taskId": "late-task"}})
+    with patch("app.kie_client.kie_client.submit_task", submit):
+        result = await run_generation_pipeline(FakeStep(), {"generation_id": gen_id, "payload": {}})
+
+    assert result["status"] == "skipped"
+    async with async_session() as db:
+        gen = await db.get(Generation, gen_id)
+    assert gen.status == "failed" and gen.provider_task_id in (None, "")
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stays_within_the_step_budget():
+    """A job that never gets a slot gives up within Inngest's per-run step limit."""
+    from app.inngest_client import INNGEST_MAX_STEPS, pipeline_step_budget, run_generation_pipeline
+    assert pipeline_step_budget() <= INNGEST_MAX_STEPS
+
+    class CountingStep:
+        def __init__(self):
+            self.steps, self.slept = 0, 0.0
+
+        async def run(self, step_id, handler):
+            self.steps += 1
+            return await handler()
+
+        async def sleep(self, step_id, duration):
+            self.steps += 1
+            self.slept += duration.total_seconds()
+
+    step = CountingStep()
+    waiting = AsyncMock(return_value={"admitted": False, "position": 3, "lane": "image"})
+    with patch("app.scheduler.try_admit", waiting):
+        with pytest.raises(Exception, match="not admitted in time"):
+            await run_generation_pipeline(step, {"generation_id": "gen-x", "payload": {}})
+    assert step.steps <= pipeline_step_budget()
+    assert step.slept >= 3.5 * 3600  # still covers hours of waiting
+
+
+# ════════════════════════════════════════════════
+# INNGEST: Compact step outputs
+# ════════════════════════════════════════════════
+def test_compact_task_status_processing_is_minimal():
+    """Non-terminal polls store only the state, not the recordInfo payload."""
+    from app.inngest_client import compact_task_status
+
+    out = compact_task_status({
+        "code": 200,
+        "data": {"taskId": "t1", "state": "generating", "param": "x" * 5000},
+    })
+    assert out == {"state": "processing"}
+
+
+def test_compact_task_status_success_extracts_urls():
+    from app.inngest_client import compact_task_status
+
+    out = compact_task_status({
+        "data": {
+            "state": "success",
+            "resultJson": '{"resultUrls": ["https://cdn/a.mp4", "https://cdn/b.mp4"]}',
+            "param": "x" * 5000,
+        },
+    })
+    assert out == {
+        "state": "succeeded",
+        "result_url": "https://cdn/a.mp4",
+        "result_urls": ["https://cdn/a.mp4", "https://cdn/b.mp4"],
+        "error": None,
+    }
+
+
+def test_compact_task_status_failure_keeps_error():
+    from app.inngest_client import compact_task_status
+
+    out = compact_task_status({"data": {"state": "fail", "failMsg": "NSFW"}})
+    assert out["state"] == "failed"
+    assert out["error"] == "NSFW"
+    assert out["result_urls"] == []
+
+
+def test_compact_create_result_drops_raw():
+    from app.inngest_client import compact_create_result
+
+    assert compact_create_result({"code": 200, "data": {"taskId": "abc"}}) == {
+        "task_id": "abc",
+        "error": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_step_state_meter_counts_bytes():
+    from app.inngest_client import StepStateMeter
+    from app.metrics import metrics
+
+    class FakeStep:
+        async def run(self, step_id, handler):
+            return await handler()
+
+    async def handler():
+        return {"state": "processing"}
+
+    meter = StepStateMeter()
+    await meter.run(FakeStep(), "check-0", handler)
+    await meter.run(FakeStep(), "check-1", handler)
+    assert meter.steps == 2
+    assert meter.bytes == 2 * len('{"state":"processing"}')
+
+    before = metrics.summary("inngest_step_state_bytes", fn="test")["count"]
+    report = meter.report("test")
+    assert report["step_state_bytes"] == meter.bytes
+    assert metrics.summary("inngest_step_state_bytes", fn="test")["count"] == before + 1
@@ -0,0 +1,109 @@
+"""
+ReklamAI v2.0 — Completion Estimate Tests
+Quantile sketch accuracy, per-model seeding and feeding, and the
+estimated_completion_at / Retry-After hints of GET /api/generations/{id}.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+
+from app import clock
+from app.database import async_session
+from app.latency import QuantileSketch, latency
+from app.lifecycle import mark_succeeded
+from app.models import Generation
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 0.8) for _ in range(5000)]
+    sketch = QuantileSketch(relative_accuracy=0.02)
+    for v in values:
+        sketch.add(v)
+    values.sort()
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert abs(sketch.quantile(q) - exact) / exact < 0.05
+    assert len(sketch.buckets) < 400
+
+    # Knowing a run already took longer than most moves its median up
+    assert sketch.conditional_median(1) == pytest.approx(sketch.quantile(0.5), rel=0.05)
+    assert sketch.conditional_median(sketch.quantile(0.9)) > sketch.quantile(0.9)
+    assert sketch.conditional_median(values[-1] * 2) is None
+
+
+async def add_history(user_id: str, model_slug: str, runs: list[float]) -> None:
+    now = clock.utcnow()
+    async with async_session() as db:
+        for i, seconds in enumerate(runs):
+            started = now - timedelta(hours=1, minutes=i)
+            db.add(Generation(
+                user_id=user_id, model_slug=model_slug, status="succeeded",
+                created_at=started - timedelta(seconds=2), started_at=started,
+                completed_at=started + timedelta(seconds=seconds),
+            ))
+        await db.commit()
+
+
+async def add_generation(user_id: str, model_slug: str, **values) -> Generation:
+    async with async_session() as db:
+        gen = Generation(user_id=user_id, model_slug=model_slug, **values)
+        db.add(gen)
+        await db.commit()
+        return gen
+
+
+@pytest.mark.asyncio
+async def test_running_generation_gets_eta_and_retry_after(client: AsyncClient):
+    reg = (await client.post("/auth/register", json={"email": "eta@example.com", "password": "password123"})).json()
+    headers = {"Authorization": f"Bearer {reg['access_token']}"}
+    user_id = reg["user"]["id"]
+    await add_history(user_id, "veo", [30.0] * 25)
+
+    started = clock.utcnow() - timedelta(seconds=10)
+    running = await add_generation(user_id, "veo", status="processing", started_at=started)
+    res = await client.get(f"/api/generations/{running.id}", headers=headers)
+    assert res.status_code == 200
+    eta = datetime.fromisoformat(res.json()["estimated_completion_at"])
+    assert abs((eta - started).total_seconds() - 30) < 2
+    assert 15 <= int(res.headers["retry-after"]) <= 22
+
+    # The estimate is anchored on the start: unchanged body, so revalidation still hits
+    again = await client.get(f"/api/generations/{running.id}", headers={**headers, "If-None-Match": res.headers["etag"]})
+    assert again.status_code == 304
+    assert "retry-after" in again.headers
+
+    # Queued: expected wait plus the median run
+    queued = await add_generation(user_id, "veo", status="queued")
+    eta = datetime.fromisoformat((await client.get(f"/api/generations/{queued.id}", headers=headers)).json()[
+        "estimated_completion_at"])
+    assert 30 <= (eta - queued.created_at).total_seconds() <= 35
+
+    # No history for the model: no estimate, default poll interval
+    unknown = await add_generation(user_id, "new-model", status="processing", started_at=started)
+    res = await client.get(f"/api/generations/{unknown.id}", headers=headers)
+    assert res.json()["estimated_completion_at"] is None
+    assert res.headers["retry-after"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_succeeded_generations_feed_the_sketch(client: AsyncClient):
+    reg = (await client.post("/auth/register", json={"email": "feed@example.com", "password": "password123"})).json()
+    user_id = reg["user"]["id"]
+    async with async_session() as db:
+        probe = Generation(user_id=user_id, model_slug="flux", status="queued")
+        await latency.estimate(db, probe)  # seeds the (empty) sketch
+    queue, run = latency._models["flux"]
+    assert run.count == 0
+
+    gen = await add_generation(
+        user_id, "flux", status="processing", started_at=clock.utcnow() - timedelta(seconds=12),
+    )
+    async with async_session() as db:
+        gen = await db.get(Generation, gen.id)
+        await mark_succeeded(db, gen, result_url="https://cdn/a.png")
+        await db.commit()
+    assert run.count == 1
+    assert run.quantile(0.5) == pytest.approx(12, rel=0.05)
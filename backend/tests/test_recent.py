@@ -0,0 +1,148 @@
+"""
+ReklamAI v2.0 — Recent Generations Tests
+Page one of GET /api/generations from the per-user ring: fill, write-through
+from publish_generation, and invalidation by other workers' events.
+"""
+from datetime import timedelta
+
+import pytest
+from httpx import AsyncClient
+
+from app import clock
+from app.database import engine, async_session
+from app.events import GENERATION_CHANNEL, publish_generation, status_event
+from app.lifecycle import mark_succeeded, record_created, set_status
+from app.models import Generation
+from app.pubsub import pubsub
+from sqlalchemy import event, select
+
+
+async def register(client: AsyncClient, email: str) -> tuple[dict, str]:
+    reg = (await client.post("/auth/register", json={"email": email, "password": "password123"})).json()
+    return {"Authorization": f"Bearer {reg['access_token']}"}, reg["user"]["id"]
+
+
+async def add_generations(user_id: str, count: int) -> list[Generation]:
+    base = clock.utcnow() - timedelta(seconds=count)
+    async with async_session() as db:
+        gens = [
+            Generation(user_id=user_id, prompt=f"prompt {i}", created_at=base + timedelta(seconds=i))
+            for i in range(count)
+        ]
+        db.add_all(gens)
+        await db.flush()
+        for gen in gens:
+            await record_created(db, gen)
+        await db.commit()
+    await publish_generation(*gens)
+    return gens
+
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self.capture)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self.capture)
+
+    def capture(self, conn, cursor, statement, *args):
+        if "generation" in statement:
+            self.statements.append(statement)
+
+
+@pytest.mark.asyncio
+async def test_page_one_served_from_ring_after_first_read(client: AsyncClient):
+    headers, user_id = await register(client, "ring@example.com")
+    await add_generations(user_id, 25)
+
+    first = (await client.get("/api/generations?limit=5", headers=headers)).json()
+    with StatementLog() as log:
+        again = (await client.get("/api/generations?limit=5", headers=headers)).json()
+        full = (await client.get("/api/generations", headers=headers)).json()
+    assert log.statements == []
+    assert again == first
+    assert full["total"] == 25 and len(full["items"]) == 20 and full["next_cursor"]
+
+    # The cursor from the ring continues exactly where page one stopped
+    rest = (await client.get("/api/generations", params={"cursor": full["next_cursor"]}, headers=headers)).json()
+    assert [g["prompt"] for g in full["items"] + rest["items"]] == [f"prompt {i}" for i in range(24, -1, -1)]
+
+    # Filters and larger pages still go to the database
+    with StatementLog() as log:
+        await client.get("/api/generations?status=queued", headers=headers)
+        await client.get("/api/generations?limit=50", headers=headers)
+    assert log.statements
+
+
+@pytest.mark.asyncio
+async def test_writes_go_through_to_the_ring(client: AsyncClient):
+    headers, user_id = await register(client, "through@example.com")
+    await add_generations(user_id, 3)
+    await client.get("/api/generations", headers=headers)
+
+    new = (await add_generations(user_id, 1))[0]
+    async with async_session() as db:
+        gen = await db.get(Generation, new.id)
+        await set_status(db, gen, "processing")
+        await mark_succeeded(db, gen, result_url="https://cdn/new.png", result_urls=[])
+        await db.commit()
+    await publish_generation(gen)
+
+    with StatementLog() as log:
+        data = (await client.get("/api/generations", headers=headers)).json()
+    assert log.statements == []
+    assert data["total"] == 4
+    assert data["items"][0]["id"] == new.id
+    assert data["items"][0]["status"] == "succeeded"
+    assert data["items"][0]["result_url"] == "https://cdn/new.png"
+
+
+@pytest.mark.asyncio
+async def test_foreign_event_invalidates_the_ring(client: AsyncClient):
+    headers, user_id = await register(client, "foreign@example.com")
+    gens = await add_generations(user_id, 2)
+    await client.get("/api/generations", headers=headers)
+
+    # Another worker finished a generation: only its NOTIFY arrives here
+    async with async_session() as db:
+        gen = (await db.execute(select(Generation).where(Generation.id == gens[0].id))).scalar_one()
+        gen.status, gen.progress = "failed", 100
+        await db.commit()
+    await pubsub._deliver(GENERATION_CHANNEL, status_event(gen))
+
+    with StatementLog() as log:
+        data = (await client.get("/api/generations", headers=headers)).json()
+    assert log.statements
+    assert {g["id"]: g["status"] for g in data["items"]}[gen.id] == "failed"
+
+    # The reload is cached again; another user's events leave it alone
+    await pubsub._deliver(GENERATION_CHANNEL, {"user_id": "someone-else", "id": "x", "status": "failed"})
+    with StatementLog() as log:
+        await client.get("/api/generations", headers=headers)
+    assert log.statements == []
+
+
+def test_fill_read_before_a_change_is_discarded():
+    from app.recent import RecentGenerations
+    ring = RecentGenerations(size=5, max_users=2)
+
+    # The list query ran while a generation was committed and published; no ring yet
+    version = ring.version
+    ring.write(Generation(id="g1", user_id="u1"))
+    ring.on_event({"user_id": "u2", "id": "g2", "status": "failed"})
+    ring.fill("u1", [], 0, version)
+    ring.fill("u2", [], 0, version)
+    ring.fill("u3", [], 0, version)
+    assert ring.page("u1", 5) is None and ring.page("u2", 5) is None
+    assert ring.page("u3", 5) == ([], 0, False)  # nothing changed for u3
+
+    # Stamps evicted from the LRU still count, conservatively
+    version = ring.version
+    for user_id in ("u4", "u5", "u6"):
+        ring.on_event({"user_id": user_id, "id": "x", "status": "queued"})
+    ring.fill("u4", [], 0, version)
+    assert ring.page("u4", 5) is None
@@ -0,0 +1,173 @@
+"""
+ReklamAI v2.0 — Reconciler Tests
+Stuck generations are finalized, failed or expired, with exactly-once refunds.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from app.database import async_session
+from app.models import User, CreditAccount, CreditTransaction, Generation
+from app.reconciler import reconcile_stale_generations
+from sqlalchemy import select
+
+
+class FakeKIE:
+    """Answers recordInfo lookups from a dict of task_id -> raw response."""
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.calls = []
+
+    async def get_task_statuses(self, task_ids):
+        self.calls.append(list(task_ids))
+        return {t: self.responses[t] for t in task_ids if t in self.responses}
+
+
+async def make_user(balance: float = 40.0) -> str:
+    async with async_session() as db:
+        user = User(email="rec@test.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        db.add(CreditAccount(owner_id=user.id, balance=balance, total_earned=50, total_spent=10))
+        await db.commit()
+        return user.id
+
+
+async def make_gen(
+    user_id: str, age_minutes: int, task_id: str = "", status: str = "processing",
+    started_minutes_ago: int | None = None,
+) -> str:
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        gen = Generation(
+            user_id=user_id,
+            status=status,
+            provider_task_id=task_id,
+            credits_reserved=5.0,
+            created_at=now - timedelta(minutes=age_minutes),
+            started_at=now - timedelta(minutes=started_minutes_ago) if started_minutes_ago is not None else None,
+        )
+        db.add(gen)
+        await db.commit()
+        return gen.id
+
+
+async def load(gen_id: str) -> Generation:
+    async with async_session() as db:
+        return await db.get(Generation, gen_id)
+
+
+async def balance(user_id: str) -> float:
+    async with async_session() as db:
+        res = await db.execute(select(CreditAccount).where(CreditAccount.owner_id == user_id))
+        return res.scalar_one().balance
+
+
+@pytest.mark.asyncio
+async def test_reconciler_finalizes_lost_webhook():
+    uid = await make_user()
+    gen_id = await make_gen(uid, 30, task_id="t-ok")
+    kie = FakeKIE({"t-ok": {"data": {
+        "state": "success", "resultJson": '{"resultUrls": ["https://cdn/x.png"]}',
+    }}})
+
+    stats = await reconcile_stale_generations(async_session, kie=kie)
+
+    gen = await load(gen_id)
+    assert gen.status == "succeeded"
+    assert gen.result_url == "https://cdn/x.png"
+    assert stats["succeeded"] == 1
+    assert await balance(uid) == 40.0  # no refund
+
+
+@pytest.mark.asyncio
+async def test_reconciler_refunds_provider_failure_once():
+    uid = await make_user()
+    gen_id = await make_gen(uid, 30, task_id="t-bad")
+    kie = FakeKIE({"t-bad": {"data": {"state": "fail", "failMsg": "boom"}}})
+
+    await reconcile_stale_generations(async_session, kie=kie)
+    await reconcile_stale_generations(async_session, kie=kie)
+
+    gen = await load(gen_id)
+    assert gen.status == "failed"
+    assert gen.error_message == "boom"
+    assert await balance(uid) == 45.0
+    async with async_session() as db:
+        refunds = await db.execute(
+            select(CreditTransaction).where(CreditTransaction.type == "refund")
+        )
+        assert len(refunds.scalars().all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_reconciler_expires_never_started():
+    uid = await make_user()
+    old = await make_gen(uid, 300, status="queued")
+    young = await make_gen(uid, 30, status="queued")
+
+    await reconcile_stale_generations(async_session, kie=FakeKIE({}))
+
+    assert (await load(old)).status == "failed"
+    assert "Expired" in (await load(old)).error_message
+    assert (await load(young)).status == "queued"
+    assert await balance(uid) == 45.0
+
+
+@pytest.mark.asyncio
+async def test_reconciler_keeps_admitted_jobs_past_the_queue_deadline():
+    uid = await make_user()
+    # Waited past the deadline for a slot, now inside createTask
+    admitted = await make_gen(uid, 300, status="queued", started_minutes_ago=1)
+    lapsed = await make_gen(uid, 300, status="queued", started_minutes_ago=60)
+
+    await reconcile_stale_generations(async_session, kie=FakeKIE({}))
+
+    assert (await load(admitted)).status == "queued"
+    assert (await load(lapsed)).status == "failed"
+    assert await balance(uid) == 45.0
+
+
+@pytest.mark.asyncio
+async def test_reconciler_leaves_fresh_and_running():
+    uid = await make_user()
+    fresh = await make_gen(uid, 1, task_id="t-fresh")
+    running = await make_gen(uid, 30, task_id="t-run")
+    kie = FakeKIE({"t-run": {"data": {"state": "generating"}}})
+
+    await reconcile_stale_generations(async_session, kie=kie)
+
+    assert (await load(fresh)).status == "processing"
+    assert (await load(running)).status == "processing"
+    assert kie.calls == [["t-run"]]
+
+
+@pytest.mark.asyncio
+async def test_reconciler_max_age_counts_from_dispatch():
+    uid = await make_user()
+    # Waited ~3h for admission, dispatched 20 minutes ago: still running at KIE
+    late = await make_gen(uid, 190, task_id="t-late", started_minutes_ago=20)
+    hung = await make_gen(uid, 190, task_id="t-hung", started_minutes_ago=150)
+    kie = FakeKIE({t: {"data": {"state": "generating"}} for t in ("t-late", "t-hung")})
+
+    await reconcile_stale_generations(async_session, kie=kie)
+
+    assert (await load(late)).status == "processing"
+    assert (await load(hung)).status == "failed"
+    assert await balance(uid) == 45.0
+
+
+@pytest.mark.asyncio
+async def test_reconciler_scans_in_batches():
+    uid = await make_user(balance=0)
+    ids = [await make_gen(uid, 300 + i, status="queued") for i in range(5)]
+
+    with patch("app.reconciler.settings.reconcile_batch_size", 2):
+        stats = await reconcile_stale_generations(async_session, kie=FakeKIE({}))
+
+    assert stats["scanned"] == 5
+    assert stats["failed"] == 5
+    for gen_id in ids:
+        assert (await load(gen_id)).status == "failed"
+    assert await balance(uid) == 25.0
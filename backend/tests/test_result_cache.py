@@ -0,0 +1,92 @@
+"""
+ReklamAI v2.0 — Result Cache Tests
+Identical seeded requests to an opted-in model complete from the cache.
+"""
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app import clock
+from app.catalog import catalog
+from app.database import async_session
+from app.models import AIModel, Generation, ResultCacheEntry
+from app.result_cache import prune_result_cache
+from sqlalchemy import select, update
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def cache_models(setup_db):
+    """One model opted in to the result cache, one not."""
+    async with async_session() as db:
+        db.add_all([
+            AIModel(name="Cached", slug="cached-img", provider_model_id="img-v1",
+                    category="image", config={"result_cache": {"ttl_hours": 1}}),
+            AIModel(name="Plain", slug="plain-img", provider_model_id="img-v2", category="image"),
+        ])
+        await db.commit()
+    await catalog.reload()
+
+
+async def complete(gen_id: str, url: str) -> None:
+    from app.lifecycle import mark_succeeded
+    async with async_session() as db:
+        await mark_succeeded(db, await db.get(Generation, gen_id), result_url=url)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_identical_seeded_request_hits_cache(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    reg = await client.post("/auth/register", json={"email": "cache@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+    body = {"prompt": "red sneaker", "model_slug": "cached-img", "params": {"seed": 7}}
+
+    first = (await client.post("/api/generate", headers=headers, json=body)).json()
+    assert mock_inngest.send.call_count == 1
+    assert mock_inngest.send.call_args[0][0].data["payload"]["input"]["seed"] == 7
+    await complete(first["id"], "https://cdn/sneaker.png")
+
+    second = await client.post("/api/generate", headers=headers, json=body)
+    assert second.status_code == 201
+    assert second.json()["status"] == "succeeded"
+    assert second.json()["result_url"] == "https://cdn/sneaker.png"
+    assert mock_inngest.send.call_count == 1  # no provider task
+
+    # No seed, different seed, or a model without the rule: provider as usual
+    for variant in (
+        {**body, "params": {}},
+        {**body, "params": {"seed": 8}},
+        {**body, "model_slug": "plain-img"},
+    ):
+        assert (await client.post("/api/generate", headers=headers, json=variant)).json()["status"] == "queued"
+    assert mock_inngest.send.call_count == 4
+
+    async with async_session() as db:
+        entry = (await db.execute(select(ResultCacheEntry))).scalar_one()
+        assert entry.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_prune_drops_expired_and_evicts_least_recent():
+    now = clock.utcnow()
+    async with async_session() as db:
+        db.add_all([
+            ResultCacheEntry(key=f"k{i}", result_url=f"u{i}", last_hit_at=now - timedelta(minutes=10 - i),
+                             expires_at=now + timedelta(hours=1))
+            for i in range(4)
+        ])
+        await db.execute(update(ResultCacheEntry).where(ResultCacheEntry.key == "k3").values(
+            expires_at=now - timedelta(seconds=1),
+        ))
+        await db.commit()
+
+    with patch("app.result_cache.settings.result_cache_max_entries", 2):
+        assert await prune_result_cache(async_session) == {"expired": 1, "evicted": 1}
+
+    async with async_session() as db:
+        keys = (await db.execute(select(ResultCacheEntry.key).order_by(ResultCacheEntry.key))).scalars().all()
+    assert keys == ["k1", "k2"]
@@ -0,0 +1,196 @@
+"""
+ReklamAI v2.0 — Fair-Share Scheduler Tests
+Round-robin ordering, per-user / global caps, capacity lanes and queue positions.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app.database import async_session
+from app.models import User, Generation
+from app.scheduler import (
+    round_robin_order, round_robin_position, user_order, admissible, try_admit, release_admission,
+)
+from app.lanes import lanes, lane_for_model
+
+
+async def make_queue(jobs: list[str], lane: str = "image") -> list[str]:
+    """Insert one queued generation per entry (entry = user id), oldest first."""
+    base = datetime.now(timezone.utc) - timedelta(minutes=5)
+    ids = []
+    async with async_session() as db:
+        for uid in sorted(set(jobs)):
+            if not await db.get(User, uid):
+                db.add(User(id=uid, email=f"{uid}@test.com", hashed_password="x"))
+        for i, uid in enumerate(jobs):
+            gen = Generation(
+                user_id=uid, status="queued", lane=lane, created_at=base + timedelta(seconds=i),
+            )
+            db.add(gen)
+            await db.flush()
+            ids.append(gen.id)
+        await db.commit()
+    return ids
+
+
+# ════════════════════════════════════════════════
+# ORDERING
+# ════════════════════════════════════════════════
+def test_round_robin_interleaves_users():
+    pending = [("a1", "A"), ("a2", "A"), ("a3", "A"), ("b1", "B"), ("c1", "C"), ("b2", "B")]
+    assert round_robin_order(pending, {}) == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+
+def test_round_robin_prefers_users_with_fewer_running():
+    pending = [("a1", "A"), ("b1", "B")]
+    assert round_robin_order(pending, {"A": 1}) == ["b1", "a1"]
+
+
+def test_round_robin_position_matches_order():
+    pending = [("a1", "A"), ("a2", "A"), ("a3", "A"), ("b1", "B"), ("c1", "C"), ("b2", "B")]
+    running = {"C": 1}
+    order = round_robin_order(pending, running)
+    users = user_order(["A", "B", "C"], running)
+    lengths = {"A": 3, "B": 2, "C": 1}
+    for gen_id, user_id in pending:
+        index = [g for g, u in pending if u == user_id].index(gen_id)
+        assert round_robin_position(users, lengths, user_id, index) == order.index(gen_id) + 1
+
+
+def test_admissible_respects_caps():
+    order = ["a1", "b1", "a2", "b2", "a3"]
+    owner = {"a1": "A", "a2": "A", "a3": "A", "b1": "B", "b2": "B"}
+    # A already runs one job; per-user cap 2, global cap 4 with 1 running
+    assert admissible(order, owner, {"A": 1}, 1, 2, 4) == ["a1", "b1", "b2"]
+
+
+# ════════════════════════════════════════════════
+# ADMISSION
+# ════════════════════════════════════════════════
+@pytest.mark.asyncio
+async def test_power_user_cannot_starve_others():
+    """50 jobs from one user must not block another user's first job."""
+    ids = await make_queue(["power"] * 50 + ["light"])
+    light_job = ids[-1]
+
+    with patch("app.scheduler.settings.max_running_per_user", 2), \
+            patch("app.scheduler.settings.max_running_global", 3):
+        async with async_session() as db:
+            assert (await try_admit(db, ids[0]))["admitted"] is True
+        async with async_session() as db:
+            assert (await try_admit(db, ids[1]))["admitted"] is True
+        async with async_session() as db:
+            # Per-user cap reached
+            res = await try_admit(db, ids[2])
+            assert res["admitted"] is False
+            assert res["position"] > 1
+        async with async_session() as db:
+            assert (await try_admit(db, light_job))["admitted"] is True
+
+
+@pytest.mark.asyncio
+async def test_position_deep_in_queue():
+    """Jobs past the admissible heads still get their exact round-robin position."""
+    ids = await make_queue(["A"] * 6 + ["B"] * 2)
+    with patch("app.scheduler.settings.max_running_per_user", 1), \
+            patch("app.scheduler.settings.max_running_global", 1):
+        async with async_session() as db:
+            assert (await try_admit(db, ids[0]))["admitted"] is True
+        async with async_session() as db:
+            # B (nothing running) leads each round: b1, a2, b2, a3, a4, a5, a6
+            assert (await try_admit(db, ids[7]))["position"] == 3
+        async with async_session() as db:
+            assert (await try_admit(db, ids[5]))["position"] == 7
+
+
+@pytest.mark.asyncio
+async def test_finished_generation_is_not_admitted():
+    ids = await make_queue(["u1"])
+    async with async_session() as db:
+        gen = await db.get(Generation, ids[0])
+        gen.status = "cancelled"
+        await db.commit()
+    async with async_session() as db:
+        res = await try_admit(db, ids[0])
+        assert res["admitted"] is False
+        assert res["position"] is None
+
+
+# ════════════════════════════════════════════════
+# LANES
+# ════════════════════════════════════════════════
+def test_lane_for_model():
+    from app.models import AIModel
+    assert lane_for_model(AIModel(category="video", config={})) == "video"
+    assert lane_for_model(AIModel(category="image", config={"capacity_group": "hd"})) == "hd"
+    assert lane_for_model(None) == "default"
+
+
+@pytest.mark.asyncio
+async def test_video_backlog_does_not_block_images():
+    videos = await make_queue(["v1", "v2", "v3"], lane="video")
+    images = await make_queue(["i1"], lane="image")
+
+    with patch("app.scheduler.settings.max_running_per_user", 5), \
+            patch("app.scheduler.settings.max_running_global", 10), \
+            patch.dict("app.lanes.settings.lane_concurrency", {"video": 2, "image": 2}):
+        for gen_id in videos[:2]:
+            async with async_session() as db:
+                assert (await try_admit(db, gen_id))["admitted"] is True
+        async with async_session() as db:
+            assert (await try_admit(db, videos[2]))["admitted"] is False
+        async with async_session() as db:
+            assert (await try_admit(db, images[0]))["admitted"] is True
+
+
+@pytest.mark.asyncio
+async def test_paused_lane_only_blocks_itself():
+    video = (await make_queue(["v1"], lane="video"))[0]
+    image = (await make_queue(["i1"], lane="image"))[0]
+    lanes.pause("video", 60)
+
+    async with async_session() as db:
+        res = await try_admit(db, video)
+        assert res["admitted"] is False
+        assert res["position"] == 1
+    async with async_session() as db:
+        assert (await try_admit(db, image))["admitted"] is True
+
+    from app.metrics import metrics
+    assert metrics.gauge("lane_depth", lane="video") == 1
+
+
+@pytest.mark.asyncio
+async def test_lane_rate_budget_and_release():
+    ids = await make_queue(["a", "b"], lane="text")
+    with patch.dict("app.lanes.settings.lane_rate_per_minute", {"text": 1}):
+        async with async_session() as db:
+            assert (await try_admit(db, ids[0]))["admitted"] is True
+        async with async_session() as db:
+            # Budget spent for this minute
+            assert (await try_admit(db, ids[1]))["admitted"] is False
+
+    async with async_session() as db:
+        await release_admission(db, ids[0])
+        gen = await db.get(Generation, ids[0])
+        assert gen.started_at is None
+
+
+@pytest.mark.asyncio
+@patch("app.routes.generate.inngest_client")
+async def test_generation_response_has_queue_position(mock_inngest, client: AsyncClient):
+    mock_inngest.send = AsyncMock()
+    reg = await client.post("/auth/register", json={
+        "email": "queue@test.com",
+        "password": "password123",
+    })
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+
+    first = await client.post("/api/generate", headers=headers, json={"prompt": "one"})
+    second = await client.post("/api/generate", headers=headers, json={"prompt": "two"})
+    assert first.json()["queue_position"] == 1
+    assert second.json()["queue_position"] == 2
+
+    res = await client.get(f"/api/generations/{second.json()['id']}", headers=headers)
+    assert res.json()["queue_position"] == 2
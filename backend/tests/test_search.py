@@ -0,0 +1,64 @@
+"""
+ReklamAI v2.0 — History Search Tests
+Full-text prompt search with filters, keyset pages and facets (SQLite FTS5).
+"""
+from datetime import timedelta
+
+import pytest
+from httpx import AsyncClient
+
+from app import clock
+from app.catalog import catalog
+from app.database import async_session
+from app.models import AIModel, Generation, User
+from app.search import prompt_terms
+from sqlalchemy import select
+
+
+def test_prompt_terms_drop_query_syntax():
+    assert prompt_terms('Red "sneaker" OR -boots*') == ["red", "sneaker", "or", "boots"]
+
+
+@pytest.mark.asyncio
+async def test_search_filters_pages_and_facets(client: AsyncClient):
+    reg = await client.post("/auth/register", json={"email": "search@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+    base = clock.utcnow() - timedelta(days=1)
+    async with async_session() as db:
+        user_id = (await db.execute(select(User.id))).scalar_one()
+        db.add_all([
+            AIModel(name="Img", slug="img", category="image"),
+            AIModel(name="Vid", slug="vid", category="video"),
+        ])
+        rows = [
+            ("Red sneakers on a podium", "img", "succeeded"),
+            ("Sneaker unboxing video", "vid", "succeeded"),
+            ("Perfume bottle splash", "img", "failed"),
+            ("Running sneakers, neon city", "img", "failed"),
+        ]
+        db.add_all([
+            Generation(user_id=user_id, prompt=p, model_slug=m, status=s, created_at=base + timedelta(minutes=i))
+            for i, (p, m, s) in enumerate(rows)
+        ])
+        await db.commit()
+    await catalog.reload()
+
+    async def search(**params):
+        res = await client.get("/api/generations/search", headers=headers, params=params)
+        assert res.status_code == 200
+        return res.json()
+
+    page = await search(q="sneak", limit=2)
+    assert [i["prompt"] for i in page["items"]] == ["Running sneakers, neon city", "Sneaker unboxing video"]
+    assert page["facets"]["status"] == {"succeeded": 2, "failed": 1}
+    assert page["facets"]["model_slug"] == {"img": 2, "vid": 1}
+
+    rest = await search(q="sneak", limit=2, cursor=page["next_cursor"])
+    assert [i["prompt"] for i in rest["items"]] == ["Red sneakers on a podium"]
+    assert rest["next_cursor"] is None and rest["facets"] is None
+
+    assert [i["prompt"] for i in (await search(q="sneakers", category="image", status="succeeded"))["items"]] == [
+        "Red sneakers on a podium",
+    ]
+    assert len((await search(created_from=(base + timedelta(minutes=2)).isoformat()))["items"]) == 2
+    assert (await search(q="boots"))["items"] == []
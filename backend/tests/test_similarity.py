@@ -0,0 +1,63 @@
+"""
+ReklamAI v2.0 — Similar Prompt Tests
+MinHash signatures, the per-user index and GET /api/generations/similar.
+"""
+
+import pytest
+from httpx import AsyncClient
+
+from app import clock
+from app.database import async_session
+from app.events import publish_generation
+from app.models import Generation, User
+from app.similarity import signature, signature_bytes
+from sqlalchemy import select
+
+
+def test_signature_estimates_prompt_overlap():
+    base = signature("A red sneaker on a white podium, studio light")
+    near = signature("a red sneaker on a white podium, soft studio light")
+    far = signature("Drone shot of a mountain lake at sunrise")
+    assert (base == near).mean() > 0.5 > (base == far).mean()
+    assert signature("   ") is None
+    assert len(signature_bytes("x")) == 64 * 4
+
+
+async def add_succeeded(user_id: str, prompts: list[str]) -> list[Generation]:
+    async with async_session() as db:
+        gens = [
+            Generation(user_id=user_id, prompt=p, status="succeeded", result_url=f"https://cdn/{i}.png",
+                       completed_at=clock.utcnow(), prompt_signature=signature_bytes(p) if i % 2 else None)
+            for i, p in enumerate(prompts)
+        ]
+        db.add_all(gens)
+        await db.commit()
+        return gens
+
+
+@pytest.mark.asyncio
+async def test_similar_endpoint_ranks_and_catches_up(client: AsyncClient):
+    reg = await client.post("/auth/register", json={"email": "sim@test.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {reg.json()['access_token']}"}
+    async with async_session() as db:
+        user_id = (await db.execute(select(User.id))).scalar_one()
+    await add_succeeded(user_id, [
+        "red sneaker on a white podium, studio light",
+        "red sneaker on a white podium, neon light",
+        "mountain lake at sunrise, drone shot",
+    ])
+    query = {"prompt": "red sneaker on a white podium, studio lights"}
+
+    items = (await client.get("/api/generations/similar", headers=headers, params=query)).json()["items"]
+    assert [i["prompt"] for i in items] == [
+        "red sneaker on a white podium, studio light",
+        "red sneaker on a white podium, neon light",
+    ]
+    assert items[0]["score"] > items[1]["score"]
+
+    # A new success reaches the loaded index through the status event
+    [gen] = await add_succeeded(user_id, ["red sneaker on a white podium, studio lights"])
+    await publish_generation(gen)
+    items = (await client.get("/api/generations/similar", headers=headers, params=query)).json()["items"]
+    assert items[0]["id"] == gen.id and items[0]["score"] == 1.0
+    assert len(items) == 3
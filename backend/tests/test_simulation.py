@@ -0,0 +1,45 @@
+"""
+ReklamAI v2.0 — Pipeline Simulation Tests
+The virtual-time harness drives every generation to a terminal state,
+keeps credits consistent and is reproducible for a given seed.
+"""
+import pytest
+
+from app.database import engine, Base
+from app.simulation import SimConfig, simulate
+
+
+def small(**overrides) -> SimConfig:
+    return SimConfig(generations=30, users=4, **overrides)
+
+
+@pytest.mark.asyncio
+async def test_simulation_settles_every_generation():
+    report = await simulate(small(failure_rate=0.2, webhook_loss_rate=0.5))
+
+    assert report["submitted"] == 30
+    assert sum(report["by_status"].values()) == 30
+    assert set(report["by_status"]) <= {"succeeded", "failed"}
+    assert report["runs_finished"] + report["runs_errored"] == 30
+    assert report["refund_errors"] == []
+    assert report["db_queries"] > 0
+
+
+@pytest.mark.asyncio
+async def test_simulation_survives_rate_limits_and_lost_webhooks():
+    report = await simulate(small(rate_limit_rate=0.3, webhooks=False))
+
+    assert sum(report["by_status"].values()) == 30
+    assert report["refund_errors"] == []
+
+
+@pytest.mark.asyncio
+async def test_simulation_is_deterministic():
+    first = await simulate(small(seed=7))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    second = await simulate(small(seed=7))
+
+    for key in ("by_status", "makespan_virtual_s", "latency_p50_s", "latency_p95_s", "db_queries"):
+        assert first[key] == second[key]
@@ -0,0 +1,132 @@
+"""
+ReklamAI v2.0 — Webhook Inbox Tests
+Fast 202 acknowledgement, coalescing batch apply, the bounded inbox and the
+background apply loop.
+"""
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.database import async_session
+from app.events import GENERATION_CHANNEL
+from app.models import Generation, WebhookInboxItem
+from app.pubsub import pubsub
+from app.webhook_inbox import settings as inbox_settings, webhook_inbox
+from sqlalchemy import func, select
+
+
+async def add_task(task_id: str, status: str = "processing") -> str:
+    async with async_session() as db:
+        gen = Generation(user_id="u-1", provider_task_id=task_id, status=status, credits_reserved=3.0)
+        db.add(gen)
+        await db.commit()
+        return gen.id
+
+
+async def inbox_depth() -> int:
+    async with async_session() as db:
+        return (await db.execute(select(func.count()).select_from(WebhookInboxItem))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_callbacks_are_acked_then_applied_coalesced(client: AsyncClient):
+    busy = await add_task("task-busy")
+    done = await add_task("task-done")
+
+    for progress in (10, 30, 70):
+        res = await client.post("/webhook/kie", json={"task_id": "task-busy", "status": "processing", "progress": progress})
+        assert res.status_code == 202
+    await client.post("/webhook/kie", json={"task_id": "task-done", "status": "processing", "progress": 90})
+    for _ in range(2):  # redelivered completion
+        await client.post("/webhook/kie", json={
+            "task_id": "task-done", "status": "completed", "output": {"image_url": "https://cdn/done.png"},
+        })
+
+    # Nothing is applied before the worker runs
+    async with async_session() as db:
+        assert (await db.get(Generation, busy)).progress == 0
+    assert await inbox_depth() == 6
+
+    received = []
+    pubsub.subscribe(GENERATION_CHANNEL, received.append)
+    try:
+        assert await webhook_inbox.drain(async_session) == 6
+    finally:
+        pubsub.unsubscribe(GENERATION_CHANNEL, received.append)
+
+    # One write and one event per task: the latest progress, the first completion
+    assert sorted((e["id"], e["status"], e["progress"]) for e in received) == sorted([
+        (busy, "processing", 70), (done, "succeeded", 0),
+    ])
+    async with async_session() as db:
+        finished = await db.get(Generation, done)
+        assert finished.result_url == "https://cdn/done.png"
+        assert finished.credits_final == 3.0
+    assert await inbox_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_full_inbox_asks_provider_to_retry(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(inbox_settings, "webhook_inbox_max_rows", 2)
+    for i in range(2):
+        await add_task(f"t{i}")
+        assert (await client.post("/webhook/kie", json={"task_id": f"t{i}", "status": "processing"})).status_code == 202
+
+    res = await client.post("/webhook/kie", json={"task_id": "t2", "status": "completed"})
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == str(inbox_settings.webhook_inbox_retry_after_seconds)
+    assert await inbox_depth() == 2
+
+    await webhook_inbox.drain(async_session)
+    assert (await client.post("/webhook/kie", json={"task_id": "t2", "status": "completed"})).status_code == 202
+
+
+@pytest.mark.asyncio
+async def test_worker_applies_accepted_callbacks(client: AsyncClient):
+    gen_id = await add_task("task-live")
+    applied = asyncio.Event()
+    # Wait for the worker's event, not by polling: tests share one SQLite connection
+    pubsub.subscribe(GENERATION_CHANNEL, on_applied := lambda e: applied.set())
+    # Accepted before the worker starts (as after a restart); its wake-up is already pending
+    await client.post("/webhook/kie", json={"task_id": "task-live", "status": "failed", "error": "boom"})
+    webhook_inbox.start(async_session)
+    try:
+        await asyncio.wait_for(applied.wait(), 2)
+    finally:
+        await webhook_inbox.stop()
+        pubsub.unsubscribe(GENERATION_CHANNEL, on_applied)
+
+    async with async_session() as db:
+        gen = await db.get(Generation, gen_id)
+    assert gen.status == "failed" and gen.error_message == "boom"
+    assert await inbox_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_callback_before_task_id_is_kept_and_retried(client: AsyncClient):
+    from datetime import timedelta
+    from sqlalchemy import update
+    from app import clock
+
+    # KIE answered faster than save-task-id committed
+    await client.post("/webhook/kie", json={"task_id": "task-early", "status": "processing", "progress": 20})
+    await client.post("/webhook/kie", json={
+        "task_id": "task-early", "status": "completed", "output": {"image_url": "https://cdn/early.png"},
+    })
+    assert await webhook_inbox.drain(async_session) == 2
+    assert await webhook_inbox.drain(async_session) == 0  # waiting for the retry
+    async with async_session() as db:
+        waiting = (await db.execute(select(WebhookInboxItem))).scalars().all()
+    assert [(i.attempts, i.retry_at is not None) for i in waiting] == [(1, True), (1, True)]
+
+    gen_id = await add_task("task-early")
+    async with async_session() as db:
+        await db.execute(update(WebhookInboxItem).values(retry_at=clock.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+    assert await webhook_inbox.drain(async_session) == 2
+
+    async with async_session() as db:
+        gen = await db.get(Generation, gen_id)
+    assert gen.status == "succeeded" and gen.result_url == "https://cdn/early.png"
+    assert await inbox_depth() == 0
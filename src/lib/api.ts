@@ -103,6 +103,7 @@ export interface GenerationItem {
 export interface GenerationList {
     items: GenerationItem[];
     total: number;
+    next_cursor?: string | null;
 }
 
 export interface AIModelItem {
@@ -148,10 +149,17 @@ export const creditsApi = {
     getBalance: () => apiFetch<CreditBalance>('/api/credits'),
 };
 
+export interface GenerationBatch {
+    ids: string[];
+    items: GenerationItem[];
+    credits_reserved: number;
+}
+
 // ── Generations API ──
 export interface GenerationListParams {
     limit?: number;
     offset?: number;
+    cursor?: string;  // next_cursor of the previous page; takes precedence over offset
     status?: string;
 }
 
@@ -162,18 +170,168 @@ export const generationsApi = {
             body: JSON.stringify(req),
         }),
 
+    createBatch: (variants: GenerateRequest[]) =>
+        apiFetch<GenerationBatch>('/api/generate/batch', {
+            method: 'POST',
+            body: JSON.stringify({ variants }),
+        }),
+
     get: (id: string) => apiFetch<GenerationItem>(`/api/generations/${id}`),
 
     list: (params: GenerationListParams = {}) => {
-        const { limit = 20, offset = 0, status } = params;
+        const { limit = 20, offset = 0, cursor, status } = params;
         const qs = new URLSearchParams();
         qs.set('limit', String(limit));
-        qs.set('offset', String(offset));
+        if (cursor) qs.set('cursor', cursor);
+        else qs.set('offset', String(offset));
         if (status) qs.set('status', status);
         return apiFetch<GenerationList>(`/api/generations?${qs.toString()}`);
     },
+
+    /** Full-text history search; `facets` come with the first page only. */
+    search: (params: GenerationSearchParams = {}) => {
+        const qs = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== '') qs.set(key, String(value));
+        });
+        return apiFetch<GenerationSearchResult>(`/api/generations/search?${qs.toString()}`);
+    },
+
+    /** Past successful generations with a near-identical prompt (best first). */
+    similar: (prompt: string, k = 5) =>
+        apiFetch<{ items: SimilarGeneration[] }>(
+            `/api/generations/similar?${new URLSearchParams({ prompt, k: String(k) }).toString()}`,
+        ),
+
+    /** Whole history as a file (streamed by the server); filters as in search. */
+    export: async (params: GenerationExportParams = {}): Promise<Blob> => {
+        const qs = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== '') qs.set(key, String(value));
+        });
+        const token = getToken();
+        const res = await fetch(`${API_BASE}/api/generations/export?${qs.toString()}`, {
+            headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
+        if (!res.ok) {
+            const error: any = new Error(`API error ${res.status}`);
+            error.status = res.status;
+            throw error;
+        }
+        return res.blob();
+    },
+
+    /** Compact status of many generations; pass `server_time` back as `since`. */
+    statuses: (ids: string[], since?: string) =>
+        apiFetch<GenerationStatusList>('/api/generations/status', {
+            method: 'POST',
+            body: JSON.stringify({ ids, since }),
+        }),
 };
 
+// ── Status stream (Server-Sent Events) ──
+export interface GenerationStatusEvent {
+    id: string;
+    status: string;
+    progress: number;
+    result_url: string;
+    thumbnail_url: string;
+    error_message: string;
+}
+
+export interface GenerationSearchParams {
+    q?: string;
+    model_slug?: string;
+    preset_slug?: string;
+    category?: string;
+    status?: string;
+    created_from?: string;
+    created_to?: string;
+    limit?: number;
+    cursor?: string;
+}
+
+export interface GenerationExportParams {
+    format?: 'ndjson' | 'csv';
+    status?: string;
+    created_from?: string;
+    created_to?: string;
+}
+
+export interface GenerationSearchResult {
+    items: GenerationItem[];
+    next_cursor: string | null;
+    facets: Record<'status' | 'model_slug' | 'preset_slug', Record<string, number>> | null;
+}
+
+export interface SimilarGeneration {
+    id: string;
+    prompt: string;
+    model_slug: string;
+    result_url: string;
+    thumbnail_url: string;
+    created_at: string;
+    score: number;
+}
+
+export interface GenerationStatusList {
+    items: GenerationStatusEvent[];
+    server_time: string;
+}
+
+/**
+ * Subscribe to status changes of the current user's generations.
+ * The SSE stream is read with fetch so the token goes in the Authorization
+ * header and never in the URL, where access and proxy logs would keep it.
+ * Reconnects after the server's `retry:` hint; returns a function that closes the stream.
+ */
+export function streamGenerations(onEvent: (event: GenerationStatusEvent) => void): () => void {
+    const controller = new AbortController();
+    let retryMs = 3000;
+
+    // Resolves true when the stream ended and should be reopened
+    async function read(): Promise<boolean> {
+        const token = getToken();
+        if (!token) return false;
+        const res = await fetch(`${API_BASE}/api/generations/stream`, {
+            headers: { Authorization: `Bearer ${token}`, Accept: 'text/event-stream' },
+            signal: controller.signal,
+        });
+        if (res.status === 401 || res.status === 403) return false;
+        if (!res.ok || !res.body) return true;
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) return true;
+            buffer += value;
+            let end: number;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                let name = 'message';
+                const data: string[] = [];
+                for (const line of frame.split('\n')) {
+                    if (line.startsWith('retry:')) retryMs = Number(line.slice(6)) || retryMs;
+                    else if (line.startsWith('event:')) name = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+                }
+                if (name === 'generation' && data.length) onEvent(JSON.parse(data.join('\n')));
+            }
+        }
+    }
+
+    (async () => {
+        while (!controller.signal.aborted) {
+            const reconnect = await read().catch(() => true);
+            if (!reconnect || controller.signal.aborted) return;
+            await new Promise((resolve) => setTimeout(resolve, retryMs));
+        }
+    })();
+    return () => controller.abort();
+}
+
 // ── Models API ──
 export const modelsApi = {
     list: () => apiFetch<AIModelItem[]>('/api/models'),
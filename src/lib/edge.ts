@@ -30,6 +30,11 @@ export interface GenerateParams {
     referenceVideoPath?: string;
     params?: Record<string, any>;
   };
+  /**
+   * Created once per submit by the caller and reused for every retry of that
+   * submit, so a double-click or a retried request returns the original generation.
+   */
+  idempotencyKey: string;
 }
 
 export interface GenerateResponse {
@@ -98,6 +103,7 @@ export async function generate(params: GenerateParams): Promise<GenerateResponse
   try {
     const data = await apiFetch<any>('/api/generate', {
       method: 'POST',
+      headers: { 'Idempotency-Key': params.idempotencyKey },
       body: JSON.stringify({
         prompt: params.prompt,
         preset_slug: params.presetKey,
@@ -1,5 +1,5 @@
 import * as React from "react";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate, useSearchParams } from "react-router-dom";
 import {
   Image,
@@ -119,6 +119,14 @@ export default function CreatePage() {
   const [boards, setBoards] = useState<any[]>([]);
   const [availableModels, setAvailableModels] = useState<DatabaseModel[]>([]);
   const [modelsLoading, setModelsLoading] = useState(false);
+  // Idempotency-Key of the submit in progress: kept until it is accepted, so a
+  // double-click or a retry after an error never creates (and charges) twice
+  const submitKey = useRef<string | null>(null);
+
+  // Different inputs are a different submit
+  useEffect(() => {
+    submitKey.current = null;
+  }, [selectedPreset, prompt, selectedModel, aspectRatio, currentBoardId, referenceAsset, startFrameAsset]);
 
   // Load boards from API (only on mount)
   useEffect(() => {
@@ -230,6 +238,8 @@ export default function CreatePage() {
   const handleGenerate = async () => {
     if (!activePreset || !prompt.trim() || isGenerating) return;
 
+    if (!submitKey.current) submitKey.current = crypto.randomUUID();
+    const idempotencyKey = submitKey.current;
     setIsGenerating(true);
 
     try {
@@ -270,7 +280,9 @@ export default function CreatePage() {
         modelKey,
         prompt,
         input: Object.keys(input).length > 0 ? input : undefined,
+        idempotencyKey,
       });
+      submitKey.current = null;
 
       // Navigate to progress with generation ID
       navigate("/progress", {
@@ -1,5 +1,5 @@
 import * as React from "react";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useLocation, useNavigate, Link } from "react-router-dom";
 import {
   CheckCircle2,
@@ -18,8 +18,7 @@ import { Card, CardContent } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { ProgressBar } from "@/components/ui/status";
 import { cn } from "@/lib/utils";
-import { getStatus } from "@/lib/edge";
-import { generationsApi } from "@/lib/api";
+import { generationsApi, streamGenerations } from "@/lib/api";
 import { useAuth } from "@/lib/AuthContext";
 import { useTranslation } from "@/i18n";
 
@@ -237,6 +236,12 @@ export default function ProgressPage() {
   const { user } = useAuth();
   const [generations, setGenerations] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  // Ids shown on this page; the stream carries every generation of the user
+  const trackedIds = useRef<Set<string>>(new Set());
+
+  useEffect(() => {
+    trackedIds.current = new Set(generations.map((g) => g.id));
+  }, [generations]);
 
   // Load active generations from API
   useEffect(() => {
@@ -258,35 +263,21 @@ export default function ProgressPage() {
 
     loadGenerations();
 
-    // Poll for status updates every 2 seconds
-    const interval = setInterval(async () => {
-      setGenerations((prev) => {
-        const activeGens = prev.filter((g) => g.status === 'queued' || g.status === 'processing');
-        if (activeGens.length === 0) return prev;
-
-        // Poll each active generation (fire-and-forget, update via state callback)
-        activeGens.forEach(async (gen) => {
-          try {
-            const status = await getStatus(gen.id);
-            setGenerations((current) =>
-              current.map((g) =>
-                g.id === gen.id
-                  ? { ...g, status: status.status, progress: status.progress, signedPreviewUrl: status.signedPreviewUrl }
-                  : g
-              )
-            );
-            if (status.status === 'succeeded' && status.signedPreviewUrl) {
-              navigate(`/result/${gen.id}`, { state: { url: status.signedPreviewUrl } });
-            }
-          } catch (error) {
-            console.error(`[ProgressPage] Error polling ${gen.id}:`, error);
-          }
-        });
-        return prev;
-      });
-    }, 2000);
+    // Status changes are pushed by the server instead of polled
+    const close = streamGenerations((event) => {
+      setGenerations((current) =>
+        current.map((g) =>
+          g.id === event.id
+            ? { ...g, status: event.status, progress: event.progress, signedPreviewUrl: event.result_url }
+            : g
+        )
+      );
+      if (event.status === 'succeeded' && event.result_url && trackedIds.current.has(event.id)) {
+        navigate(`/result/${event.id}`, { state: { url: event.result_url } });
+      }
+    });
 
-    return () => clearInterval(interval);
+    return close;
   }, [user, navigate]);
 
   // Handle new generation from Create page
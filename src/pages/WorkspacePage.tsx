@@ -61,7 +61,7 @@ import {
 import { cn } from "@/lib/utils";
 import { useTranslation } from "@/i18n";
 import { loadModelsByModality, DatabaseModel } from "@/lib/models";
-import { generate, getStatus, uploadFile } from "@/lib/edge";
+import { generate, getStatus, uploadFile, type UploadFileParams } from "@/lib/edge";
 import { useAuth } from "@/lib/AuthContext";
 import { AuthModal } from "@/components/AuthModal";
 import { Sheet, SheetContent, SheetTrigger } from "@/components/ui/sheet";
@@ -125,6 +125,15 @@ export default function WorkspacePage() {
   const [referenceFile, setReferenceFile] = useState<File | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const refFileInputRef = useRef<HTMLInputElement>(null);
+  // The submit in progress: its Idempotency-Key and uploaded paths are kept until
+  // it is accepted, so a double-click or a retry after an error sends the same
+  // request and never creates (and charges) twice
+  const pendingSubmit = useRef<{ key: string; uploads: Map<File, string> } | null>(null);
+
+  // Different inputs are a different submit
+  useEffect(() => {
+    pendingSubmit.current = null;
+  }, [selectedMode, prompt, selectedModel, aspectRatio, duration, uploadedFile, uploadedImage, referenceFile]);
 
   // Persist prompt with debounce to avoid input lag
   const debouncedPrompt = useDebounce(prompt, 1000);
@@ -198,6 +207,18 @@ export default function WorkspacePage() {
       return;
     }
 
+    if (!pendingSubmit.current) pendingSubmit.current = { key: crypto.randomUUID(), uploads: new Map() };
+    const submit = pendingSubmit.current;
+
+    // Upload each file once per submit so a retry carries the same paths
+    const uploadOnce = async (file: File, purpose: UploadFileParams['purpose']) => {
+      const cached = submit.uploads.get(file);
+      if (cached) return cached;
+      const uploadResult = await uploadFile({ file, purpose });
+      if (uploadResult.path) submit.uploads.set(file, uploadResult.path);
+      return uploadResult.path;
+    };
+
     setCanvasState("generating");
     setProgress(0);
     setCurrentStepIndex(0);
@@ -233,17 +254,14 @@ export default function WorkspacePage() {
       // Handle Image Uploads
       if (uploadedFile) {
         console.log('[WorkspacePage] Uploading start frame/image...');
-        const uploadResult = await uploadFile({
-          file: uploadedFile,
-          purpose: selectedMode === 'video' ? 'startFrame' : 'referenceImage'
-        });
-        if (uploadResult.path) {
+        const path = await uploadOnce(uploadedFile, selectedMode === 'video' ? 'startFrame' : 'referenceImage');
+        if (path) {
           // Add to inputs
           if (!generateParams.input) generateParams.input = {};
           if (selectedMode === 'video') {
-            generateParams.input.startFramePath = uploadResult.path;
+            generateParams.input.startFramePath = path;
           } else {
-            generateParams.input.referenceImagePath = uploadResult.path;
+            generateParams.input.referenceImagePath = path;
           }
         }
       } else if (uploadedImage && uploadedImage.startsWith('http')) {
@@ -259,19 +277,18 @@ export default function WorkspacePage() {
       // Handle Reference Image Uploads (separate from main input)
       if (referenceFile) {
         console.log('[WorkspacePage] Uploading reference image...');
-        const uploadResult = await uploadFile({
-          file: referenceFile,
-          purpose: 'referenceImage'
-        });
-        if (uploadResult.path) {
+        const path = await uploadOnce(referenceFile, 'referenceImage');
+        if (path) {
           if (!generateParams.input) generateParams.input = {};
-          generateParams.input.referenceImagePath = uploadResult.path;
+          generateParams.input.referenceImagePath = path;
         }
       }
 
       // Call generate API
       console.log('[WorkspacePage] Calling generate API with params:', generateParams);
-      const generateResult = await generate(generateParams);
+      const generateResult = await generate({ ...generateParams, idempotencyKey: submit.key });
+      // Accepted: the next click (re-run, variation) is a new submit
+      if (pendingSubmit.current === submit) pendingSubmit.current = null;
 
       console.log('[WorkspacePage] Generate result:', generateResult);
       setCurrentGenerationId(generateResult.generationId);